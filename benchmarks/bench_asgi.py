@@ -0,0 +1,183 @@
+"""
+Benchmark: public read throughput under concurrent slow clients, WSGI vs ASGI.
+
+Starts the app twice through gunicorn.conf.py on a fresh seeded SQLite file:
+  * wsgi  - sync workers running the DRF views (current Procfile default)
+  * asgi  - uvicorn workers running restaurant/async_views.py
+
+In each run ``--slow`` clients trickle their request headers one line every
+``--slow-delay`` seconds (mobile clients on a bad network), while ``--fast``
+clients hammer the hot endpoints for ``--duration`` seconds. A sync worker is
+held by a slow client until its request is complete; an event loop is not.
+
+    python benchmarks/bench_asgi.py [--workers 2] [--slow 8] [--fast 16] [--duration 10]
+
+Use ``--slow 0`` for the raw per-request cost of each mode without slow clients.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+PATHS = [
+    '/api/dishes/',
+    '/api/menu-overview/',
+    '/api/homepage-stats/',
+    '/api/check-user-type/',
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data[9:12]
+
+
+async def slow_client(port, delay, stop):
+    """Send one header line every ``delay`` seconds, then read the response; repeat."""
+    headers = ['Host: localhost', 'User-Agent: slow', 'Accept: application/json',
+               'Accept-Language: ar', 'Connection: close']
+    while not stop.is_set():
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'GET /api/menu-overview/ HTTP/1.1\r\n')
+            for header in headers:
+                await asyncio.sleep(delay)
+                writer.write(f'{header}\r\n'.encode())
+                await writer.drain()
+            writer.write(b'\r\n')
+            await reader.read()
+            writer.close()
+        except OSError:
+            await asyncio.sleep(delay)
+
+
+async def fast_client(port, n, stop, latencies, errors):
+    i = n
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(fetch(port, PATHS[i % len(PATHS)]), 30)
+        except (OSError, asyncio.TimeoutError):
+            status = b'ERR'
+        if status == b'200':
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(status)
+        i += 1
+
+
+async def load(port, args):
+    stop = asyncio.Event()
+    latencies, errors = [], []
+    tasks = [asyncio.create_task(slow_client(port, args.slow_delay, stop)) for _ in range(args.slow)]
+    # Give the slow clients time to occupy workers first
+    await asyncio.sleep(args.slow_delay / 2)
+    tasks += [
+        asyncio.create_task(fast_client(port, n, stop, latencies, errors))
+        for n in range(args.fast)
+    ]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.wait(tasks, timeout=args.slow_delay * 10)
+    for task in tasks:
+        task.cancel()
+    return latencies, errors
+
+
+async def warm_up(port, args):
+    """Fast load only, results discarded: gets every worker past its first requests."""
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(fast_client(port, n, stop, [], [])) for n in range(args.fast)]
+    await asyncio.sleep(args.warmup)
+    stop.set()
+    await asyncio.wait(tasks)
+
+
+def wait_for_server(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def run(mode, env, args, log):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers), '--log-level', 'warning'],
+        cwd=BASE_DIR,
+        env={**env, 'SERVER_MODE': mode},
+        stdout=log,
+        stderr=log,
+    )
+    try:
+        wait_for_server(port)
+        asyncio.run(warm_up(port, args))
+        latencies, errors = asyncio.run(load(port, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+    ok = len(latencies)
+    if ok:
+        quantiles = statistics.quantiles(latencies, n=100)
+        p50, p99 = quantiles[49] * 1000, quantiles[98] * 1000
+    else:
+        p50 = p99 = float('nan')
+    print(f"{mode:<6} {ok / args.duration:10.1f} req/s  p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  {len(errors):5d} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers in both modes')
+    parser.add_argument('--slow', type=int, default=8, help='Concurrent slow clients')
+    parser.add_argument('--slow-delay', type=float, default=1.0, help='Seconds between header lines')
+    parser.add_argument('--fast', type=int, default=16, help='Concurrent fast clients')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=3.0, help='Seconds of unmeasured fast load first')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench-asgi-')
+    env = {
+        **os.environ,
+        'DATABASE_URL': f'sqlite:///{tmp}/bench.sqlite3',
+        'DEBUG': 'false',
+        'IMAGE_PIPELINE_WORKERS': '0',
+    }
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'], cwd=BASE_DIR, env=env, check=True)
+    # Run from tmp: dish images are written relative to the working directory
+    subprocess.run([sys.executable, BASE_DIR / 'populate_data.py'], cwd=tmp, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    print(f"{args.workers} workers, {args.slow} slow clients ({args.slow_delay}s/header line), "
+          f"{args.fast} fast clients, {args.duration}s")
+    with open(f'{tmp}/server.log', 'w') as log:
+        for mode in ('wsgi', 'asgi'):
+            run(mode, env, args, log)
+    print(f"server output: {tmp}/server.log")
+
+
+if __name__ == '__main__':
+    main()
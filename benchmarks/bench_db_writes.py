@@ -0,0 +1,135 @@
+"""
+Benchmark: concurrent write throughput of the order path.
+
+Each worker process (standing in for a gunicorn worker) repeatedly runs the
+same writes as _create_order_from_stripe_session: one Order, its OrderItems,
+a stock decrement per dish and a customer Notification, in one transaction.
+
+Compared configurations, each in a fresh database:
+  * sqlite-default  - plain SQLite file (rollback journal, no pragmas)
+  * sqlite-tuned    - WAL, synchronous=NORMAL, busy_timeout, mmap (project/database.py)
+  * postgres        - only when BENCH_POSTGRES_URL is set (uses DB_POOL if set)
+
+    python benchmarks/bench_db_writes.py [--workers 8] [--orders 200]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def run_worker(args):
+    """Runs inside a configured subprocess: migrate, seed, then hammer the order path."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+    import logging
+    import multiprocessing
+
+    import django
+    django.setup()
+    logging.disable(logging.CRITICAL)
+
+    from decimal import Decimal
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import OperationalError, connections, transaction
+    from django.db.models import F
+    from restaurant.models import Category, Customer, Dish, Notification, Order, OrderItem
+
+    call_command('migrate', verbosity=0)
+    category = Category.objects.create(name='Bench')
+    dish_ids = [
+        Dish.objects.create(
+            name=f'Dish {i}', description='', price=Decimal('9.99'),
+            category=category, stock_quantity=10 ** 9
+        ).id
+        for i in range(20)
+    ]
+    customer_ids = [
+        Customer.objects.create(
+            user=User.objects.create(username=f'bench{i}'), phone='', address=''
+        ).id
+        for i in range(args.workers)
+    ]
+    connections.close_all()
+
+    def place_orders(worker, results):
+        customer = Customer.objects.select_related('user').get(id=customer_ids[worker])
+        done = failed = 0
+        for n in range(args.orders):
+            items = [dish_ids[(worker + n + k) % len(dish_ids)] for k in range(3)]
+            try:
+                with transaction.atomic():
+                    order = Order.objects.create(
+                        customer=customer, total_amount=Decimal('29.97'),
+                        delivery_address='bench', payment_status='paid'
+                    )
+                    OrderItem.objects.bulk_create([
+                        OrderItem(order=order, dish_id=dish_id, quantity=1, price=Decimal('9.99'))
+                        for dish_id in items
+                    ])
+                    Dish.objects.filter(id__in=items).update(stock_quantity=F('stock_quantity') - 1)
+                    Notification.objects.create(
+                        user=customer.user, title='Order Received',
+                        message=f'Order #{order.id}', notification_type='order_placed'
+                    )
+                done += 1
+            except OperationalError:
+                failed += 1
+        connections.close_all()
+        results.put((done, failed))
+
+    # fork, so each process inherits the configured Django state like a gunicorn worker
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=place_orders, args=(i, results)) for i in range(args.workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    counts = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    done = sum(c[0] for c in counts)
+    failed = sum(c[1] for c in counts)
+    print(f"{done / elapsed:10.1f} orders/s  {done:6d} ok  {failed:5d} locked/failed  {elapsed:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--orders', type=int, default=200, help='Orders per worker')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    tmp = tempfile.mkdtemp(prefix='bench-db-')
+    configs = [
+        ('sqlite-default', {'DATABASE_URL': f'sqlite:///{tmp}/default.sqlite3', 'SQLITE_TUNING': 'false'}),
+        ('sqlite-tuned', {'DATABASE_URL': f'sqlite:///{tmp}/tuned.sqlite3', 'SQLITE_TUNING': 'true'}),
+    ]
+    if os.getenv('BENCH_POSTGRES_URL'):
+        configs.append(('postgres', {'DATABASE_URL': os.environ['BENCH_POSTGRES_URL']}))
+
+    print(f"{args.workers} workers x {args.orders} orders")
+    for label, env in configs:
+        print(f"{label:<16}", end='', flush=True)
+        subprocess.run(
+            [sys.executable, __file__, '--worker', '--workers', str(args.workers), '--orders', str(args.orders)],
+            env={**os.environ, **env},
+            check=True,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Micro-benchmark: per-dish cost of resolving the image URL in DishSerializer.
+
+Compares the previous get_image (``obj.image.url`` evaluated up to three times
+per dish) with the URL stored on save. No database access is needed.
+
+    python benchmarks/bench_image_urls.py [--dishes 500] [--storage cloudinary|local]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Setup Django
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+os.environ.setdefault('CLOUDINARY_CLOUD_NAME', 'bench')
+os.environ.setdefault('CLOUDINARY_API_KEY', 'bench')
+os.environ.setdefault('CLOUDINARY_API_SECRET', 'bench')
+
+import django
+django.setup()
+
+from django.test import RequestFactory
+from restaurant.models import Category, Dish
+from restaurant.serializers import DishSerializer
+
+
+def legacy_get_image(obj, request):
+    """DishSerializer.get_image before the URL was stored on the row."""
+    if obj.image and hasattr(obj.image, 'url'):
+        if obj.image.url.startswith('http'):
+            return obj.image.url
+        if request:
+            return request.build_absolute_uri(obj.image.url)
+        return obj.image.url
+    return None
+
+
+def build_dishes(count, storage):
+    field = Dish._meta.get_field('image')
+    field.storage = storage
+    category = Category(id=1, name='Bench')
+    dishes = []
+    for i in range(count):
+        dish = Dish(id=i + 1, name=f'Dish {i}', price=10, category=category,
+                    image=f'dishes/dish_{i}.jpg')
+        dish.image_url = storage.url(dish.image.name)
+        dishes.append(dish)
+    return dishes
+
+
+def timed(label, func, dishes, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for dish in dishes:
+            func(dish)
+    elapsed = time.perf_counter() - start
+    per_dish = elapsed / (rounds * len(dishes)) * 1e6
+    print(f"{label:<28} {per_dish:8.2f} us/dish")
+    return per_dish
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--storage', choices=['cloudinary', 'local'], default='cloudinary')
+    args = parser.parse_args()
+
+    if args.storage == 'cloudinary':
+        from cloudinary_storage.storage import MediaCloudinaryStorage
+        storage = MediaCloudinaryStorage()
+    else:
+        from django.core.files.storage import FileSystemStorage
+        storage = FileSystemStorage()
+
+    dishes = build_dishes(args.dishes, storage)
+    request = RequestFactory().get('/api/dishes/', HTTP_HOST='localhost')
+    serializer = DishSerializer(context={'request': request})
+
+    print(f"{args.dishes} dishes x {args.rounds} rounds, {args.storage} storage")
+    before = timed('before (image.url x3)', lambda d: legacy_get_image(d, request), dishes, args.rounds)
+    after = timed('after (stored image_url)', serializer.get_image, dishes, args.rounds)
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark: the index advisor on the reviews and daily-orders queries.
+
+Seeds a fresh SQLite file with ``--ratings`` ratings over ``--dishes`` dishes
+and ``--orders`` orders over a year, removes the (dish, created_at) rating
+index to get the tree as it was before the advisor, then
+  * runs the reviews query (a dish's ratings, newest first) and the daily
+    paid-order count (``order_date__date``) with the slow-query recorder on,
+    and prints what ``index_advisor`` proposes for them;
+  * times each query before and after: the reviews query without and with
+    the proposed index, the daily count with ``__date`` and with
+    restaurant.utils.on_day's range.
+
+    python benchmarks/bench_indexes.py [--dishes 200] [--ratings 200000] [--orders 100000]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=200)
+    parser.add_argument('--ratings', type=int, default=200000)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=300)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench-indexes-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/bench.sqlite3'
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+    import logging
+
+    import django
+    django.setup()
+    logging.disable(logging.CRITICAL)
+
+    from decimal import Decimal
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import override_settings
+    from django.utils import timezone
+    from restaurant import slow_queries
+    from restaurant.index_advisor import advise, candidate_rows
+    from restaurant.models import Category, Customer, Dish, DishRating, Order
+    from restaurant.profiling import explain
+    from restaurant.utils import on_day
+
+    call_command('migrate', verbosity=0)
+    category = Category.objects.create(name='Mains', slug='mains')
+    Dish.objects.bulk_create([
+        Dish(name=f'Dish {i}', slug=f'dish-{i}', price=10, description='', category=category) for i in range(args.dishes)
+    ])
+    dish_ids = list(Dish.objects.values_list('pk', flat=True))
+    customer = Customer.objects.create(user=User.objects.create(username='bench'), phone='', address='')
+    DishRating.objects.bulk_create([
+        DishRating(dish_id=random.choice(dish_ids), customer=customer, rating=random.randint(1, 5))
+        for _ in range(args.ratings)
+    ], batch_size=5000)
+    Order.objects.bulk_create([
+        Order(customer=customer, total_amount=Decimal('20.00'), delivery_address='bench',
+              payment_status='paid' if random.random() < 0.7 else 'pending')
+        for _ in range(args.orders)
+    ], batch_size=5000)
+    # auto_now_add stamped everything now: spread the rows over the past year
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE restaurant_dishrating SET created_at = datetime('now', printf('-%d minutes', abs(random()) % 525600))")
+        cursor.execute("UPDATE restaurant_order SET order_date = datetime('now', printf('-%d minutes', abs(random()) % 525600))")
+        cursor.execute('ANALYZE')
+
+    index = next(index for index in DishRating._meta.indexes if index.fields == ['dish', 'created_at'])
+    with connection.schema_editor() as editor:
+        editor.remove_index(DishRating, index)
+
+    day = timezone.now().date() - datetime.timedelta(days=30)
+    picks = [random.choice(dish_ids) for _ in range(args.queries)]
+
+    def reviews():
+        for dish_id in picks:
+            list(DishRating.objects.filter(dish_id=dish_id).order_by('-created_at'))
+
+    def daily_by_date():
+        for _ in range(args.queries // 10):
+            Order.objects.filter(order_date__date=day, payment_status='paid').count()
+
+    def daily_by_range():
+        for _ in range(args.queries // 10):
+            Order.objects.filter(**on_day('order_date', day), payment_status='paid').count()
+
+    def timed(workload, calls):
+        start = time.perf_counter()
+        workload()
+        return (time.perf_counter() - start) / calls * 1e3
+
+    def plan(queryset):
+        sql, params = queryset.query.sql_with_params()
+        return ' / '.join(line.split(' ', 3)[-1] for line in explain('default', sql, params))
+
+    with override_settings(SLOW_QUERY_MS=0):
+        slow_queries.install(connection)
+        reviews()
+        daily_by_date()
+        slow_queries.uninstall(connection)
+        slow_queries.recorder.flush()
+    proposals, advice = advise(candidate_rows())
+    print(f'{args.ratings} ratings over {args.dishes} dishes, {args.orders} orders over a year')
+    print('index_advisor:')
+    for proposal in proposals:
+        print(f"  propose {proposal.table} ({', '.join(proposal.columns)}), {proposal.calls} calls, {proposal.total_ms:.1f} ms")
+    for (table, predicate), note in advice.items():
+        print(f'  {table}.{predicate} {note}')
+
+    reviews_query = DishRating.objects.filter(dish_id=picks[0]).order_by('-created_at')
+    before = timed(reviews, len(picks)), plan(reviews_query)
+    with connection.schema_editor() as editor:
+        for proposal in proposals:
+            editor.add_index(proposal.model, proposal.index())
+    after = timed(reviews, len(picks)), plan(reviews_query)
+    print(f"\n{'query':<34}{'ms/query':>10}  plan")
+    print(f"{'reviews, no index':<34}{before[0]:>10.3f}  {before[1]}")
+    print(f"{'reviews, advised index':<34}{after[0]:>10.3f}  {after[1]}")
+
+    calls = args.queries // 10
+    by_date = timed(daily_by_date, calls), plan(Order.objects.filter(order_date__date=day, payment_status='paid'))
+    by_range = timed(daily_by_range, calls), plan(Order.objects.filter(**on_day('order_date', day), payment_status='paid'))
+    print(f"{'daily paid orders, __date':<34}{by_date[0]:>10.3f}  {by_date[1]}")
+    print(f"{'daily paid orders, on_day range':<34}{by_range[0]:>10.3f}  {by_range[1]}")
+    print(f'\nreviews {before[0] / after[0]:.1f}x, daily orders {by_date[0] / by_range[0]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: JSON encoding and decoding of the largest API payloads.
+
+Seeds a fresh SQLite file with generate_load_data, serializes once
+  * menu   - ``--dishes`` dishes through DishSerializer (the full menu)
+  * orders - ``--orders`` orders through OrderSerializer (an admin page with
+             customers and nested items)
+and then times, per payload, DRF's JSONRenderer/JSONParser against
+restaurant/renderers.py. Serialization time is shown for scale; the renderers
+are checked to produce identical bytes first.
+
+    python benchmarks/bench_json.py [--dishes 500] [--orders 200] [--rounds 50]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def per_call(rounds, function):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - start) / rounds * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench-json-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/bench.sqlite3'
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+    import logging
+
+    import django
+    django.setup()
+    logging.disable(logging.CRITICAL)
+
+    from django.core.management import call_command
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from restaurant import renderers
+    from restaurant.models import Dish, Order
+    from restaurant.serializers import DishSerializer, OrderSerializer
+
+    call_command('migrate', verbosity=0)
+    call_command(
+        'generate_load_data', customers=100, orders=args.orders, ratings=args.dishes * 4,
+        dishes=args.dishes, days=7, stdout=io.StringIO(),
+    )
+
+    dishes = Dish.objects.select_related('category').prefetch_related('dishrating_set')
+    orders = (
+        Order.objects
+        .select_related('customer__user')
+        .prefetch_related('orderitem_set__dish__category', 'orderitem_set__dish__dishrating_set')
+        .order_by('-order_date')[:args.orders]
+    )
+    payloads = {
+        'menu': lambda: DishSerializer(list(dishes), many=True).data,
+        'orders': lambda: OrderSerializer(list(orders), many=True).data,
+    }
+
+    print(f"backend: {'orjson ' + renderers.orjson.__version__ if renderers.orjson else 'stdlib fallback'}")
+    print(f"{'payload':<8}{'bytes':>10}{'serialize':>11}{'render':>9}{'fast':>8}{'x':>6}{'parse':>9}{'fast':>8}{'x':>6}  (ms)")
+    for name, build in payloads.items():
+        serialize = per_call(3, build)
+        data = build()
+        slow, fast = JSONRenderer(), renderers.FastJSONRenderer()
+        body = slow.render(data)
+        assert fast.render(data) == body, 'renderers disagree'
+
+        render = per_call(args.rounds, lambda: slow.render(data))
+        render_fast = per_call(args.rounds, lambda: fast.render(data))
+        parse = per_call(args.rounds, lambda: JSONParser().parse(io.BytesIO(body)))
+        parse_fast = per_call(args.rounds, lambda: renderers.FastJSONParser().parse(io.BytesIO(body)))
+        print(
+            f'{name:<8}{len(body):>10}{serialize:>11.1f}{render:>9.2f}{render_fast:>8.2f}'
+            f'{render / render_fast:>6.1f}{parse:>9.2f}{parse_fast:>8.2f}{parse / parse_fast:>6.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
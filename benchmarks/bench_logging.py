@@ -0,0 +1,147 @@
+"""
+Benchmark: cost of logging on the request thread.
+
+Each configuration runs in its own process on a fresh SQLite file and times
+hot requests through the test client (menu, user type, customer login) and
+the model saves behind the order path (dish and order ``save()``):
+  * sync-debug   - handlers writing inline, restaurant loggers at DEBUG, no
+                   sampling (the configuration before restaurant/log.py)
+  * queue-debug  - BackgroundHandler (project default), DEBUG, no sampling
+  * queue-info   - BackgroundHandler, INFO, model events sampled at 10%
+                   (the production defaults)
+
+The console handler writes to /dev/null and the file handler to a temporary
+file, so the numbers are the formatting and I/O done per operation, not the
+terminal. "drain" is the time the listener needed afterwards to write what was
+queued.
+
+    python benchmarks/bench_logging.py [--requests 300] [--saves 2000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+CONFIGS = {
+    'sync-debug': ('sync', 'DEBUG', '1'),
+    'queue-debug': ('queue', 'DEBUG', '1'),
+    'queue-info': ('queue', 'INFO', '0.1'),
+}
+
+
+def logging_config(mode, level, log_file):
+    console = {'class': 'logging.StreamHandler', 'stream': open(os.devnull, 'w')}
+    file = {'class': 'logging.FileHandler', 'filename': log_file}
+    if mode == 'queue':
+        console = {'class': 'restaurant.log.BackgroundHandler', 'handler_class': console.pop('class'), **console}
+        file = {'class': 'restaurant.log.BackgroundHandler', 'handler_class': file.pop('class'), **file}
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'verbose': {'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}', 'style': '{'},
+        },
+        'handlers': {'console': {**console, 'formatter': 'verbose'}, 'file': {**file, 'formatter': 'verbose'}},
+        'root': {'handlers': ['console', 'file'], 'level': 'INFO'},
+        'loggers': {
+            'django': {'handlers': ['console', 'file'], 'level': 'INFO', 'propagate': False},
+            'restaurant': {'handlers': ['console', 'file'], 'level': level, 'propagate': False},
+        },
+    }
+
+
+def timed(count, operation):
+    start = time.perf_counter()
+    for n in range(count):
+        operation(n)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def run_worker(args):
+    """Runs inside a configured subprocess: migrate, seed, then time the operations."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+    import logging
+    import logging.config
+
+    import django
+    django.setup()
+
+    from decimal import Decimal
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+    from restaurant.models import Category, Customer, Dish, Order
+
+    call_command('migrate', verbosity=0)
+    mode, level, _ = CONFIGS[args.config]
+    settings.ALLOWED_HOSTS = ['*']
+    logging.config.dictConfig(logging_config(mode, level, os.environ['BENCH_LOG_FILE']))
+
+    category = Category.objects.create(name='Bench')
+    dishes = [
+        Dish.objects.create(name=f'Dish {i}', description='', price=Decimal('9.99'), category=category)
+        for i in range(20)
+    ]
+    user = User.objects.create_user('bench', 'bench@example.com', 'bench-password')
+    customer = Customer.objects.create(user=user, phone='', address='', is_email_verified=True)
+    order = Order.objects.create(customer=customer, total_amount=Decimal('9.99'), delivery_address='bench')
+
+    client = Client()
+    login = {'email': 'bench@example.com', 'password': 'bench-password'}
+    results = {
+        'GET /api/dishes/': timed(args.requests, lambda n: client.get('/api/dishes/')),
+        'GET /api/check-user-type/': timed(args.requests, lambda n: client.get('/api/check-user-type/')),
+        'POST /api/login/': timed(args.requests // 10, lambda n: client.post(
+            '/api/login/', login, content_type='application/json')),
+        'Dish.save()': timed(args.saves, lambda n: dishes[n % len(dishes)].save()),
+        'Order.save()': timed(args.saves, lambda n: order.save()),
+    }
+
+    start = time.perf_counter()
+    for handler in logging.getLogger('restaurant').handlers:
+        handler.flush()
+    drain = (time.perf_counter() - start) * 1e3
+    print('  '.join(f'{value:9.0f}' for value in results.values()) + f'  {drain:8.0f}')
+    return list(results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=300, help='Requests per endpoint')
+    parser.add_argument('--saves', type=int, default=2000, help='save() calls per model')
+    parser.add_argument('--config', choices=CONFIGS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.config:
+        run_worker(args)
+        return
+
+    tmp = tempfile.mkdtemp(prefix='bench-logging-')
+    print('microseconds per operation (drain in ms)')
+    print(f"{'':<13}{'dishes':>9}  {'usertype':>9}  {'login':>9}  {'dish.save':>9}  {'order.save':>9}  {'drain':>8}")
+    for label, (_, level, sample_rate) in CONFIGS.items():
+        print(f'{label:<13}', end='', flush=True)
+        subprocess.run(
+            [sys.executable, __file__, '--config', label,
+             '--requests', str(args.requests), '--saves', str(args.saves)],
+            env={
+                **os.environ,
+                'DATABASE_URL': f'sqlite:///{tmp}/{label}.sqlite3',
+                'BENCH_LOG_FILE': f'{tmp}/{label}.log',
+                'LOG_LEVEL': level,
+                'LOG_SAMPLE_RATE_MODELS': sample_rate,
+            },
+            check=True,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark: login identity lookups, login throughput and menu latency during a
+login burst.
+
+Seeds a fresh SQLite file with ``--users`` accounts (one shared password hash
+at ``--iterations`` PBKDF2 rounds), then measures
+  * lookup - finding the account for an email: the old exact
+             ``User.objects.get(email=...)`` (no index on auth_user.email)
+             against restaurant.login.resolve_user (case-insensitive, through
+             the LOWER(email) index)
+  * login  - sequential POST /api/login/ per second and queries per login
+  * burst  - ``--burst`` forked worker processes (as gunicorn's sync
+             workers) logging in nonstop while the main process times
+             GET /api/dishes/, with LOGIN_HASH_CONCURRENCY unbounded (= burst)
+             and 1 slot on the host
+
+    python benchmarks/bench_login.py [--users 20000] [--iterations 100000] [--burst 8]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--iterations', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=500)
+    parser.add_argument('--logins', type=int, default=30)
+    parser.add_argument('--burst', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5, help='Length of each burst run')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench-login-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/bench.sqlite3'
+    os.environ['PASSWORD_HASH_ITERATIONS'] = str(args.iterations)
+    os.environ['LOGIN_HASH_SLOT_DIR'] = os.path.join(tmp, 'login-slots')
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+    import logging
+
+    import django
+    django.setup()
+    logging.disable(logging.CRITICAL)
+
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection, connections
+    from django.test import Client, override_settings
+    from restaurant.login import resolve_user
+    from restaurant.models import Category, Customer, Dish
+
+    call_command('migrate', verbosity=0)
+    password = make_password('correct horse')
+    User.objects.bulk_create([
+        User(username=f'user{i}', email=f'User{i}@example.com', password=password) for i in range(args.users)
+    ], batch_size=2000)
+    Customer.objects.bulk_create([
+        Customer(user_id=pk, phone='', address='') for pk in User.objects.values_list('pk', flat=True)
+    ], batch_size=2000)
+    category = Category.objects.create(name='Mains', slug='mains')
+    Dish.objects.bulk_create([
+        Dish(name=f'Dish {i}', slug=f'dish-{i}', price=10, description='', category=category) for i in range(40)
+    ])
+
+    emails = [f'User{random.randrange(args.users)}@example.com' for _ in range(args.lookups)]
+    start = time.perf_counter()
+    for email in emails:
+        User.objects.get(email=email)
+    exact = (time.perf_counter() - start) / len(emails) * 1e3
+    start = time.perf_counter()
+    for email in emails:
+        resolve_user(email.lower())
+    indexed = (time.perf_counter() - start) / len(emails) * 1e3
+    print(f'{args.users} users, pbkdf2_sha256 with {args.iterations} rounds')
+    print(f'lookup   exact email {exact:.3f} ms   case-insensitive indexed {indexed:.3f} ms   ({exact / indexed:.1f}x)')
+
+    def login(client, n):
+        body = json.dumps({'identity': f'user{n}@EXAMPLE.com', 'password': 'correct horse'})
+        return client.post('/api/login/', body, content_type='application/json')
+
+    executed = []
+
+    def count_queries(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    with override_settings(RATE_LIMITS={}, ALLOWED_HOSTS=['*']), connection.execute_wrapper(count_queries):
+        start = time.perf_counter()
+        for n in range(args.logins):
+            assert login(Client(), n).status_code == 200
+        elapsed = time.perf_counter() - start
+    queries = len(executed) / args.logins
+    print(f'login    {args.logins / elapsed:.1f} logins/s sequential, {queries:.1f} queries per login')
+
+    print(f"{'burst':<24}{'logins/s':>10}{'menu p50':>10}{'menu p95':>10}  (ms)")
+    context = multiprocessing.get_context('fork')
+    for label, concurrency in [(f'{args.burst} workers, unbounded', args.burst), (f'{args.burst} workers, 1 slot', 1)]:
+        with override_settings(RATE_LIMITS={}, LOGIN_HASH_CONCURRENCY=concurrency, LOGIN_HASH_WAIT=60, ALLOWED_HOSTS=['*']):
+            stop = context.Event()
+            done = context.Value('i', 0)
+
+            def worker(offset):
+                # Each worker opens its own connection, as after gunicorn's fork
+                connections.close_all()
+                client, n = Client(), offset
+                while not stop.is_set():
+                    login(client, n % args.users)
+                    with done.get_lock():
+                        done.value += 1
+                    n += args.burst
+
+            connections.close_all()
+            workers = [context.Process(target=worker, args=(i,)) for i in range(args.burst)]
+            for process in workers:
+                process.start()
+            menu, client = [], Client()
+            deadline = time.perf_counter() + args.seconds
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                client.get('/api/dishes/')
+                menu.append((time.perf_counter() - start) * 1e3)
+            stop.set()
+            for process in workers:
+                process.join()
+            p95 = statistics.quantiles(menu, n=20)[-1]
+            print(f'{label:<24}{done.value / args.seconds:>10.1f}{statistics.median(menu):>10.1f}{p95:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: bytes on the wire and CPU per request for the cacheable menu reads.
+
+Seeds a fresh SQLite file with ``--dishes`` dishes, then requests each path
+``--requests`` times through the test client with a file-based cache in a
+temporary directory (the deployed backend):
+  * render        - response cache off, identity body (rendered every time)
+  * render+gzip   - response cache off, gzip level 6 per response, as a
+                    compressing proxy or GZipMiddleware would
+  * cached-<enc>  - restaurant/response_cache.py: stored body in the encoding
+                    of Accept-Encoding (gzip, and br when brotli is installed)
+
+CPU is process time per request, so it counts serialization and compression
+but not waiting on the disk.
+
+    python benchmarks/bench_response_cache.py [--dishes 300] [--requests 200]
+"""
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+PATHS = ['/api/dishes/', '/api/categories/', '/api/menu-overview/']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=300)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per path and mode')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench-response-cache-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/bench.sqlite3'
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+    import logging
+
+    import django
+    django.setup()
+    logging.disable(logging.CRITICAL)
+
+    from decimal import Decimal
+    from django.core.management import call_command
+    from django.test import Client, override_settings
+    from restaurant import response_cache
+    from restaurant.models import Category, Dish
+
+    call_command('migrate', verbosity=0)
+    categories = Category.objects.bulk_create([Category(name=f'Category {i}', slug=f'category-{i}') for i in range(12)])
+    Dish.objects.bulk_create([
+        Dish(
+            name=f'Dish {i}', slug=f'dish-{i}', price=Decimal('9.50') + i % 20,
+            description='Slow-cooked, served with rice and a seasonal salad. ' * 2,
+            ingredients='rice, lamb, onion, spices', category=categories[i % len(categories)],
+            stock_quantity=100, preparation_time=15 + i % 30,
+        )
+        for i in range(args.dishes)
+    ])
+
+    modes = [
+        ('render', 0, '', False),
+        ('render+gzip', 0, '', True),
+    ] + [(f'cached-{encoding}', 600, encoding, False) for encoding in response_cache.PREFERENCE[::-1]
+         if encoding in response_cache.ENCODERS]
+
+    print(f'{args.dishes} dishes, {args.requests} requests per path')
+    print(f"{'path':<22}{'mode':<14}{'bytes':>9}{'cpu ms':>9}{'wall ms':>9}")
+    caches = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': f'{tmp}/cache',
+    }}
+    for path in PATHS:
+        for label, timeout, encoding, proxy_gzip in modes:
+            with override_settings(CACHES=caches, RESPONSE_CACHE_TIMEOUT=timeout, ALLOWED_HOSTS=['*']):
+                client = Client(HTTP_ACCEPT_ENCODING=encoding)
+                client.get(path)  # fills the cache and the category counts
+                size = 0
+                cpu, wall = time.process_time(), time.perf_counter()
+                for _ in range(args.requests):
+                    body = client.get(path).content
+                    if proxy_gzip:
+                        body = gzip.compress(body, compresslevel=6)
+                    size = len(body)
+                cpu = (time.process_time() - cpu) / args.requests * 1e3
+                wall = (time.perf_counter() - wall) / args.requests * 1e3
+            print(f'{path:<22}{label:<14}{size:>9}{cpu:>9.2f}{wall:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: DRF serializers against restaurant/compiled.py for the list payloads.
+
+Seeds a fresh SQLite file with generate_load_data plus ``--notifications``
+notifications, loads each list once (queries are not timed) and then times,
+per payload, ``Serializer(objs, many=True).data`` against
+``compiled(Serializer).many(objs)``:
+  * menu          - ``--dishes`` dishes through DishSerializer
+  * orders        - ``--orders`` orders through OrderSerializer (customers and
+                    nested items, as the admin orders page)
+  * notifications - through NotificationSerializer
+Each pair is checked to render to identical bytes first.
+
+    python benchmarks/bench_serializers.py [--dishes 500] [--orders 200] [--notifications 500] [--rounds 5]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def per_call(rounds, function):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - start) / rounds * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--notifications', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench-serializers-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/bench.sqlite3'
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+    import logging
+
+    import django
+    django.setup()
+    logging.disable(logging.CRITICAL)
+
+    from django.core.management import call_command
+    from rest_framework.test import APIRequestFactory
+    from restaurant.compiled import compiled
+    from restaurant.models import Customer, Dish, Notification, Order
+    from restaurant.renderers import FastJSONRenderer
+    from restaurant.serializers import DishSerializer, NotificationSerializer, OrderSerializer
+
+    call_command('migrate', verbosity=0)
+    call_command(
+        'generate_load_data', customers=100, orders=args.orders, ratings=args.dishes * 4,
+        dishes=args.dishes, days=7, stdout=io.StringIO(),
+    )
+    users = [customer.user for customer in Customer.objects.select_related('user')[:20]]
+    Notification.objects.bulk_create([
+        Notification(
+            user=users[i % len(users)], title=f'Order #{i} is ready',
+            message='Your order is ready for pickup.', notification_type='order_ready',
+        )
+        for i in range(args.notifications)
+    ])
+
+    payloads = {
+        'menu': (DishSerializer, Dish.objects.select_related('category').prefetch_related('dishrating_set')),
+        'orders': (OrderSerializer, (
+            Order.objects
+            .select_related('customer__user')
+            .prefetch_related('orderitem_set__dish__category', 'orderitem_set__dish__dishrating_set')
+            .order_by('-order_date')[:args.orders]
+        )),
+        'notifications': (NotificationSerializer, Notification.objects.select_related('user')),
+    }
+    context = {'request': APIRequestFactory().get('/api/')}
+    renderer = FastJSONRenderer()
+
+    print(f"{'payload':<15}{'rows':>6}{'bytes':>10}{'drf':>10}{'compiled':>10}{'x':>7}  (ms)")
+    for name, (serializer_class, queryset) in payloads.items():
+        instances = list(queryset)
+        body = renderer.render(serializer_class(instances, many=True, context=context).data)
+        assert renderer.render(compiled(serializer_class).many(instances, context)) == body, 'outputs differ'
+
+        drf = per_call(args.rounds, lambda: serializer_class(instances, many=True, context=context).data)
+        fast = per_call(args.rounds, lambda: compiled(serializer_class).many(instances, context))
+        print(f'{name:<15}{len(instances):>6}{len(body):>10}{drf:>10.1f}{fast:>10.1f}{drf / fast:>7.1f}')
+
+
+if __name__ == '__main__':
+    main()
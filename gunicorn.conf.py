@@ -0,0 +1,20 @@
+"""
+gunicorn settings for both deployment modes (``gunicorn -c gunicorn.conf.py``).
+
+    SERVER_MODE=wsgi  (default) sync workers running project.wsgi
+    SERVER_MODE=asgi  uvicorn workers running project.asgi; the public read
+                      endpoints are then served by restaurant/async_views.py
+
+Worker count comes from WEB_CONCURRENCY and the port from PORT, as usual.
+"""
+import os
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'project.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'project.wsgi:application'
+    worker_class = 'sync'
+
+timeout = 120
+loglevel = 'debug'
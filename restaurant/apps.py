@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class RestaurantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'restaurant'
+
+    def ready(self):
+        from django.conf import settings
+
+        if settings.SLOW_QUERY_LOG:
+            from . import slow_queries
+            slow_queries.enable()
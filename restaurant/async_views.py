@@ -0,0 +1,409 @@
+"""
+ASGI-native implementations of the hot public read endpoints.
+
+They mirror the DRF views of the same name in ``views.py`` (same URLs, same
+response bodies) but use the async ORM and async cache calls, so under uvicorn
+workers a request waiting on the database or on a slow client does not hold a
+whole worker. ``urls.py`` routes to them when ``SERVER_MODE = 'asgi'``; sync
+gunicorn deployments keep the DRF views and avoid the async_to_sync adaptor.
+
+Serialization reuses the DRF serializers and the renderer of the DRF views
+(``renderers.json_response``), so both paths return the same bytes and share
+ETags and cached responses. Everything they read is loaded up front
+(select_related/prefetch_related and preloaded category counts), so no query
+runs inside the event loop.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .compiled import compiled
+from .conditional import menu_conditional
+from .events import ADMIN_CHANNEL, broker, encode_event, user_channel
+from .models import AdminProfile, Category, Customer, Dish, DishRating, OrderItem, Restaurant
+from .renderers import json_response
+from .sessions import SessionStore
+from .utils import on_day
+from .serializers import CategorySerializer, DishSerializer, RestaurantSerializer
+
+logger = logging.getLogger(__name__)
+
+# Same keys and lifetime as CategorySerializer, so both paths share the cache
+CATEGORY_COUNT_TIMEOUT = 300
+
+STREAM_TOKEN_SALT = 'restaurant.events.stream'
+
+
+def _dishes():
+    """Everything DishSerializer reads, loaded in the query."""
+    return (
+        Dish.objects
+        .filter(is_available=True)
+        .select_related('category')
+        .prefetch_related('dishrating_set')
+    )
+
+
+async def category_counts(category_ids):
+    """
+    ``{category_id: (dishes_count, available_dishes_count)}`` for serializer context.
+
+    Served from the cache entries CategorySerializer uses; misses are filled with
+    one grouped query instead of two COUNTs per category.
+    """
+    category_ids = set(category_ids)
+    if not category_ids:
+        return {}
+
+    cached = await cache.aget_many(
+        [f'category_dishes_count_{cid}' for cid in category_ids]
+        + [f'category_available_dishes_count_{cid}' for cid in category_ids]
+    )
+
+    counts = {}
+    missing = []
+    for cid in category_ids:
+        total = cached.get(f'category_dishes_count_{cid}')
+        available = cached.get(f'category_available_dishes_count_{cid}')
+        if total is None or available is None:
+            missing.append(cid)
+        else:
+            counts[cid] = (total, available)
+
+    if missing:
+        fresh = {cid: (0, 0) for cid in missing}
+        rows = (
+            Dish.objects
+            .filter(category_id__in=missing)
+            .values('category_id')
+            .annotate(total=Count('id'), available=Count('id', filter=Q(is_available=True)))
+            .order_by()
+        )
+        async for row in rows:
+            fresh[row['category_id']] = (row['total'], row['available'])
+
+        to_cache = {}
+        for cid, (total, available) in fresh.items():
+            to_cache[f'category_dishes_count_{cid}'] = total
+            to_cache[f'category_available_dishes_count_{cid}'] = available
+        await cache.aset_many(to_cache, CATEGORY_COUNT_TIMEOUT)
+        counts.update(fresh)
+
+    return counts
+
+
+async def _serialize_dishes(request, dishes, many=True):
+    categories = [dish.category_id for dish in dishes] if many else [dishes.category_id]
+    context = {
+        'request': request,
+        'category_counts': await category_counts(categories),
+    }
+    serializer = compiled(DishSerializer)
+    return serializer.many(dishes, context) if many else serializer.one(dishes, context)
+
+
+# ========================================
+# 🌟 PUBLIC API FUNCTIONS
+# ========================================
+
+@require_safe
+@menu_conditional
+async def restaurant_info(request):
+    """Get basic restaurant information"""
+    restaurant = await Restaurant.objects.filter(is_active=True).afirst()
+    if restaurant:
+        return json_response(RestaurantSerializer(restaurant).data)
+    return json_response({'message': 'Restaurant information not available'}, status=404)
+
+
+@require_safe
+@menu_conditional
+async def menu_overview(request):
+    """Get menu overview with categories and featured dishes"""
+    categories = [category async for category in Category.objects.filter(is_active=True)]
+    featured_dishes = [dish async for dish in _dishes()[:6]]
+
+    counts = await category_counts(
+        [category.id for category in categories] + [dish.category_id for dish in featured_dishes]
+    )
+    context = {'category_counts': counts}
+    return json_response({
+        'categories': compiled(CategorySerializer).many(categories, context),
+        'featured_dishes': compiled(DishSerializer).many(featured_dishes, context),
+    })
+
+
+@require_safe
+async def homepage_stats(request):
+    """Get homepage statistics for main landing page"""
+    total_customers = await Customer.objects.acount()
+
+    today = timezone.now().date()
+    dishes_served = await OrderItem.objects.filter(
+        **on_day('order__order_date', today),
+        order__status__in=['confirmed', 'preparing', 'ready', 'delivered']
+    ).aaggregate(total=Sum('quantity'))
+
+    menu_items = await Dish.objects.filter(is_available=True).acount()
+    avg_rating = (await DishRating.objects.aaggregate(avg=Avg('rating')))['avg'] or 0
+
+    return json_response({
+        'total_customers': total_customers,
+        'dishes_served_today': dishes_served['total'] or 0,
+        'menu_items': menu_items,
+        'average_rating': round(float(avg_rating), 1)
+    })
+
+
+@require_safe
+async def get_stripe_config(request):
+    """Get Stripe publishable key for frontend"""
+    publishable_key = settings.STRIPE_PUBLISHABLE_KEY
+    if not publishable_key:
+        return json_response({'error': 'Stripe not configured'}, status=500)
+
+    return json_response({
+        'publishable_key': publishable_key,
+        'success': True
+    })
+
+
+async def _super_admin_status(user, response_data):
+    is_admin, is_super_admin = await AdminProfile.arole_for_email(user.email)
+    if not is_admin:
+        logger.warning("AdminProfile not found for %s", user.email)
+    else:
+        response_data['is_super_admin'] = is_super_admin
+
+
+def _user_data(user, is_admin, is_customer):
+    return {
+        'user_id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'is_admin': is_admin,
+        'is_customer': is_customer,
+        'is_authenticated': True
+    }
+
+
+@require_safe
+async def check_user_type(request):
+    """Check if current user is admin or customer"""
+    # Check for X-Session-Key header first
+    session_key_header = request.headers.get('X-Session-Key')
+    if session_key_header:
+        try:
+            session = SessionStore(session_key=session_key_header)
+            user_id = await session.aget('user_id')
+            user = await User.objects.filter(id=user_id).afirst() if user_id else None
+            if user is not None:
+                is_admin = await session.aget('is_admin', False)
+                response_data = _user_data(user, is_admin, await session.aget('is_customer', False))
+                if is_admin:
+                    await _super_admin_status(user, response_data)
+                logger.debug("User type from X-Session-Key: %s", user.pk)
+                return json_response(response_data)
+            if user_id:
+                logger.warning("User not found for ID from session: %s", user_id)
+        except Exception as e:
+            logger.error("Error reading X-Session-Key: %s", e)
+
+    # Fallback to Django session middleware
+    user = await request.auser()
+    if not user.is_authenticated:
+        user_id = await request.session.aget('user_id')
+        user = await User.objects.filter(id=user_id).afirst() if user_id else None
+
+    if not user or not user.is_authenticated:
+        return json_response({
+            'user_id': None,
+            'username': None,
+            'email': None,
+            'first_name': None,
+            'last_name': None,
+            'is_admin': False,
+            'is_customer': False,
+            'is_authenticated': False
+        })
+
+    is_admin = await request.session.aget('is_admin', False)
+    if not is_admin:
+        is_admin = (await AdminProfile.arole_for_email(user.email))[0]
+
+    is_customer = await request.session.aget('is_customer', False)
+    if not is_customer:
+        is_customer = await Customer.objects.filter(user=user).aexists()
+
+    response_data = _user_data(user, is_admin, is_customer)
+    if is_admin:
+        await _super_admin_status(user, response_data)
+
+    logger.debug("User type from Django session: %s", user.pk)
+    return json_response(response_data)
+
+
+# ========================================
+# 🍽️ DISH READS (DishViewSet list/retrieve)
+# ========================================
+
+@require_safe
+@menu_conditional
+async def dish_list(request):
+    """Paginated like DishViewSet.list (PageNumberPagination, in Dish.Meta.ordering: category, then name)"""
+    page_size = api_settings.PAGE_SIZE
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+
+    queryset = _dishes()
+    count = await queryset.acount()
+    last_page = max((count + page_size - 1) // page_size, 1)
+    if not 1 <= page <= last_page:
+        return json_response({'detail': 'Invalid page.'}, status=404)
+
+    start = (page - 1) * page_size
+    dishes = [dish async for dish in queryset[start:start + page_size]]
+
+    url = request.build_absolute_uri()
+    if page == 1:
+        previous = None
+    elif page == 2:
+        previous = remove_query_param(url, 'page')
+    else:
+        previous = replace_query_param(url, 'page', page - 1)
+
+    return json_response({
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1) if page < last_page else None,
+        'previous': previous,
+        'results': await _serialize_dishes(request, dishes),
+    })
+
+
+@require_safe
+@menu_conditional
+async def dish_detail(request, pk):
+    """Same as DishViewSet.retrieve"""
+    dish = await _dishes().filter(pk=pk).afirst()
+    if dish is None:
+        return json_response({'detail': 'No Dish matches the given query.'}, status=404)
+    return json_response(await _serialize_dishes(request, dish, many=False))
+
+
+# ========================================
+# 📡 LIVE EVENTS (server-sent events)
+# ========================================
+
+async def _session_user(request):
+    """(user, session) from X-Session-Key or the session cookie; user is None when signed out."""
+    session_key = request.headers.get('X-Session-Key')
+    if session_key:
+        session = SessionStore(session_key=session_key)
+        user_id = await session.aget('_auth_user_id') or await session.aget('user_id')
+        user = await User.objects.filter(id=user_id, is_active=True).afirst() if user_id else None
+        return user, session
+
+    user = await request.auser()
+    return (user if user.is_authenticated else None), request.session
+
+
+async def _stream_user(request):
+    """
+    Resolve the user for an event stream: (user, session's is_admin flag).
+
+    EventSource cannot send custom headers, so besides X-Session-Key and the
+    cookie the stream accepts ``?token=`` from ``event_stream_token``. The
+    session key itself never goes in the URL, where access logs keep it.
+    """
+    token = request.GET.get('token')
+    if token:
+        try:
+            claims = signing.loads(token, salt=STREAM_TOKEN_SALT, max_age=settings.SSE_TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            return None, False
+        user = await User.objects.filter(id=claims['user'], is_active=True).afirst()
+        return user, claims['admin']
+
+    user, session = await _session_user(request)
+    return user, (await session.aget('is_admin', False) if user is not None else False)
+
+
+@csrf_exempt
+@require_POST
+async def event_stream_token(request):
+    """
+    A signed token opening /api/events/?token=... for SSE_TOKEN_MAX_AGE seconds.
+
+    It names the user, not the session, and is only checked when a stream
+    opens: fetch a new one for every (re)connection.
+    """
+    user, session = await _session_user(request)
+    if user is None:
+        return json_response({'error': 'Authentication required'}, status=401)
+    token = signing.dumps(
+        {'user': user.pk, 'admin': bool(await session.aget('is_admin', False))}, salt=STREAM_TOKEN_SALT,
+    )
+    return json_response({'token': token, 'expires_in': settings.SSE_TOKEN_MAX_AGE})
+
+
+async def _event_stream(subscription):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SSE_MAX_STREAM_SECONDS
+    try:
+        yield f"retry: {settings.SSE_RETRY_MILLISECONDS}\n\n"
+        yield encode_event('ready', {'channels': list(subscription.channels)})
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                yield await subscription.get(min(settings.SSE_HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@require_safe
+async def event_stream(request):
+    """
+    Push order status changes and new notifications to the signed-in user.
+
+    Admins also receive every order status change. The stream ends after
+    SSE_MAX_STREAM_SECONDS and the browser reconnects on its own, so session
+    expiry and admin rights are re-checked regularly.
+    """
+    user, session_admin = await _stream_user(request)
+    if user is None:
+        return json_response({'error': 'Authentication required'}, status=401)
+
+    channels = [user_channel(user.id)]
+    is_admin = (
+        user.is_superuser
+        or session_admin
+        or (await AdminProfile.arole_for_email(user.email))[0]
+    )
+    if is_admin:
+        channels.append(ADMIN_CHANNEL)
+
+    subscription = broker.subscribe(channels)
+    logger.info("Event stream opened for %s: %s", user.username, channels)
+
+    response = StreamingHttpResponse(_event_stream(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tell nginx-style proxies not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
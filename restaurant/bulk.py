@@ -0,0 +1,164 @@
+"""
+Bulk admin changes to dishes and orders.
+
+The one-at-a-time admin actions each load, save and invalidate a single row.
+These apply a whole batch instead: the rows are loaded and validated with one
+query, every change is rejected if any of them is invalid, and the rest is
+written with ``bulk_update`` inside one transaction. Side effects happen once
+per batch: one cache invalidation for the menu, one low stock digest, and the
+customer notifications bulk-inserted together.
+
+``bulk_update`` skips ``Model.save()``, so the work save() would do (low stock
+flag, ``updated_at``, ETA fields) is done here explicitly.
+"""
+import logging
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .conditional import bump_menu_version
+from .eta import update_order_eta
+from .events import publish_notification, publish_order_status
+from .kitchen import InvalidTransition, publish_order, validate_transition
+from .models import Dish, Notification, Order, OrderItem
+from .utils import send_low_stock_digest
+
+logger = logging.getLogger('restaurant')
+
+STOCK_FIELDS = {'stock_quantity', 'low_stock_threshold'}
+
+# Customer notification sent for each status; cancellations are announced by the live event only
+STATUS_NOTIFICATION_TYPES = {
+    'confirmed': 'order_confirmed',
+    'preparing': 'order_preparing',
+    'ready': 'order_ready',
+    'delivered': 'order_delivered',
+}
+
+
+class BulkUpdateError(ValueError):
+    """The batch was rejected; ``errors`` maps each offending id to the reason."""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid changes')
+        self.errors = errors
+
+
+def _bulk_update_grouped(model, objects_fields):
+    """
+    ``bulk_update`` each group of objects sharing the same changed fields.
+
+    Writing only what changed keeps a batch from overwriting columns it did not
+    touch (e.g. a stock stamp set by the low stock digest in the meantime).
+    """
+    groups = defaultdict(list)
+    for obj, fields in objects_fields:
+        groups[frozenset(fields)].append(obj)
+    for fields, objects in groups.items():
+        model.objects.bulk_update(objects, sorted(fields), batch_size=200)
+
+
+def invalidate_menu_cache(category_ids, dish_ids):
+    """Drop the cached counts and lists a menu change can affect (one round trip) and bump the menu version."""
+    keys = ['popular_dishes_10', 'popular_dishes_5', 'category_stats']
+    for category_id in category_ids:
+        keys += [f'category_dishes_count_{category_id}', f'category_available_dishes_count_{category_id}']
+    keys += [f'dish_ratings_count_{dish_id}' for dish_id in dish_ids]
+    cache.delete_many(keys)
+    bump_menu_version()
+
+
+def apply_dish_changes(changes):
+    """
+    Apply ``[{'id': ..., <field>: <value>, ...}, ...]`` (see BulkDishUpdateSerializer).
+
+    Raises BulkUpdateError if any id does not exist. Returns the updated dishes.
+    """
+    dishes = Dish.objects.in_bulk([change['id'] for change in changes])
+    missing = {change['id']: 'Dish not found' for change in changes if change['id'] not in dishes}
+    if missing:
+        raise BulkUpdateError(missing)
+
+    now = timezone.now()
+    updated = []
+    stock_changed = False
+    for change in changes:
+        dish = dishes[change['id']]
+        fields = set(change) - {'id'}
+        for field in fields:
+            setattr(dish, field, change[field])
+        if fields & STOCK_FIELDS:
+            stock_changed = True
+            fields = dish._sync_low_stock_flag(fields)
+        dish.updated_at = now
+        updated.append((dish, fields | {'updated_at'}))
+
+    with transaction.atomic():
+        _bulk_update_grouped(Dish, updated)
+        if stock_changed:
+            send_low_stock_digest(Dish.objects.filter(pk__in=list(dishes)))
+
+    category_ids = {dish.category_id for dish in dishes.values()}
+    transaction.on_commit(lambda: invalidate_menu_cache(category_ids, list(dishes)))
+    logger.info("Bulk updated %d dishes in %d categories", len(updated), len(category_ids))
+    return list(dishes.values())
+
+
+def apply_order_statuses(changes):
+    """
+    Move each order in ``[{'id': ..., 'status': ...}, ...]`` to its new status.
+
+    Every transition is checked against the kitchen flow first; one invalid
+    change rejects the whole batch (BulkUpdateError). Orders already in the
+    requested status are left alone. Returns the orders that changed.
+    """
+    orders = (
+        Order.objects
+        .select_related('customer__user')
+        .prefetch_related(Prefetch('orderitem_set', queryset=OrderItem.objects.select_related('dish')))
+        .in_bulk([change['id'] for change in changes])
+    )
+    errors = {}
+    for change in changes:
+        order = orders.get(change['id'])
+        if order is None:
+            errors[change['id']] = 'Order not found'
+            continue
+        try:
+            validate_transition(order.status, change['status'])
+        except InvalidTransition as e:
+            errors[change['id']] = str(e)
+    if errors:
+        raise BulkUpdateError(errors)
+
+    now = timezone.now()
+    with transaction.atomic():
+        updated = []
+        for change in changes:
+            order = orders[change['id']]
+            if order.status == change['status']:
+                continue
+            order.status = change['status']
+            updated.append((order, {'status', *update_order_eta(order, now)}))
+        _bulk_update_grouped(Order, updated)
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                user_id=order.customer.user_id,
+                title="تحديث حالة طلبك",
+                message=f"طلبك رقم #{order.id} أصبح: {order.get_status_display()}",
+                notification_type=STATUS_NOTIFICATION_TYPES[order.status],
+            )
+            for order, _ in updated
+            if order.status in STATUS_NOTIFICATION_TYPES
+        ])
+        for notification in notifications:
+            publish_notification(notification)
+        for order, _ in updated:
+            publish_order_status(order, order.customer.user_id)
+            publish_order(order)
+
+    logger.info("Bulk moved %d orders (%d unchanged)", len(updated), len(changes) - len(updated))
+    return [order for order, _ in updated]
@@ -0,0 +1,203 @@
+"""
+Compiled read-only serializers for the hot list endpoints.
+
+``compiled(DishSerializer).many(dishes, context)`` returns what
+``DishSerializer(dishes, many=True, context=context).data`` would, rendered to
+the same bytes, several times faster. DRF spends most of a list's time in its
+generic per-field loop: ``get_attribute`` walking ``source`` with try/except
+and callable checks, ``to_representation`` dispatch, SkipField handling. Here
+each serializer class is inspected once and turned into a generated function
+with one dict display per row::
+
+    def row(obj):
+        return {'id': int(obj.id), 'name': str(obj.name), 'category': category(obj.category), ...}
+
+Only the pieces that need it keep going through DRF objects: method fields
+call the serializer's ``get_<name>`` (so context and caches behave the same),
+and field types without an inline equivalent (dates, decimals, images...) call
+the bound field's ``to_representation``. Nested serializers, single or
+``many=True``, are compiled the same way.
+
+The output contract is DRF's: a source that is missing, or None on the way to
+the last attribute, would make DRF skip the field, so such sources are refused
+when the class is compiled rather than handled differently at run time.
+"""
+import datetime
+import functools
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models.fields.related_descriptors import ReverseManyToOneDescriptor
+from rest_framework import fields as drf_fields
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Field classes whose to_representation is one builtin call on a non-None value
+INLINE_CONVERSIONS = {
+    drf_fields.IntegerField: 'int',
+    drf_fields.CharField: 'str',
+    drf_fields.SlugField: 'str',
+    drf_fields.EmailField: 'str',
+    drf_fields.URLField: 'str',
+    drf_fields.FloatField: 'float',
+    drf_fields.BooleanField: 'bool',
+    drf_fields.ReadOnlyField: '',
+}
+
+
+def memoized(row):
+    """``row`` remembering its result per primary key, for one listing."""
+    rows = {}
+
+    def cached(obj):
+        try:
+            return rows[obj.pk]
+        except KeyError:
+            value = rows[obj.pk] = row(obj)
+            return value
+    return cached
+
+
+def iso_datetime(field):
+    """DateTimeField.to_representation with the field's time zone looked up once."""
+    zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    fallback = field.to_representation
+
+    def convert(value):
+        if zone is None or type(value) is not datetime.datetime or value.utcoffset() is None:
+            return fallback(value)
+        value = value.astimezone(zone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _is_iso_datetime(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    return type(field) is drf_fields.DateTimeField and isinstance(output_format, str) \
+        and output_format.lower() == 'iso-8601'
+
+
+class _Source:
+    """How to read one field's source from an instance of ``model``."""
+
+    def __init__(self, model, source_attrs, field_name):
+        self.expression = 'obj'
+        self.nullable = False
+        self.manager = False
+        for position, attr in enumerate(source_attrs):
+            if self.nullable:
+                raise ImproperlyConfigured(f"{field_name}: '{attr}' is read through a value that can be None")
+            last = position == len(source_attrs) - 1
+            self.expression += f'.{attr}'
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is not None and model_field.concrete:
+                self.nullable = model_field.null
+                model = model_field.related_model
+                continue
+            descriptor = getattr(model, attr, None) if model is not None else None
+            if isinstance(descriptor, ReverseManyToOneDescriptor) and last:
+                self.manager = True
+            elif isinstance(descriptor, property):
+                self.nullable = True
+            elif callable(descriptor):
+                # get_FOO_display, model methods: DRF calls them without arguments
+                self.expression += '()'
+                self.nullable = True
+            else:
+                raise ImproperlyConfigured(f"{field_name}: cannot compile source attribute '{attr}'")
+            model = None
+
+
+class CompiledSerializer:
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.build = self._compile(serializer_class())
+
+    def _compile(self, serializer):
+        model = serializer.Meta.model
+        setup = ['def build(serializer):', '    fields = serializer.fields']
+        items = []
+        namespace = {'memoized': memoized, 'iso_datetime': iso_datetime}
+        for index, field in enumerate(serializer._readable_fields):
+            name = field.field_name
+            local = f'f{index}'
+            if isinstance(field, serializers.SerializerMethodField):
+                setup.append(f'    {local} = getattr(serializer, fields[{name!r}].method_name)')
+                items.append(f'{name!r}: {local}(obj)')
+                continue
+            if field.source == '*':
+                setup.append(f'    {local} = fields[{name!r}].to_representation')
+                items.append(f'{name!r}: {local}(obj)')
+                continue
+
+            source = _Source(model, field.source_attrs, name)
+            if isinstance(field, serializers.ListSerializer):
+                namespace[f'compiled_{local}'] = compiled(type(field.child))
+                setup.append(f'    {local} = compiled_{local}.build(fields[{name!r}].child)')
+                if source.manager:
+                    items.append(f'{name!r}: [{local}(item) for item in {source.expression}.all()]')
+                    continue
+                convert = f'[{local}(item) for item in {{}}]'
+            elif isinstance(field, serializers.BaseSerializer):
+                namespace[f'compiled_{local}'] = compiled(type(field))
+                setup.append(f'    {local} = memoized(compiled_{local}.build(fields[{name!r}]))')
+                convert = f'{local}({{}})'
+            elif type(field) is drf_fields.ChoiceField:
+                setup.append(f'    {local} = fields[{name!r}].choice_strings_to_values')
+                convert = f"({{0}} if {{0}} == '' else {local}.get(str({{0}}), {{0}}))"
+            elif _is_iso_datetime(field):
+                setup.append(f'    {local} = iso_datetime(fields[{name!r}])')
+                convert = f'{local}({{}})'
+            elif type(field) in INLINE_CONVERSIONS:
+                convert = INLINE_CONVERSIONS[type(field)] + '({})'
+            else:
+                setup.append(f'    {local} = fields[{name!r}].to_representation')
+                convert = f'{local}({{}})'
+
+            if source.manager:
+                raise ImproperlyConfigured(f'{name}: a related manager needs a many=True serializer')
+            if source.nullable:
+                value = f'v{index}'
+                items.append(f'{name!r}: (None if ({value} := {source.expression}) is None else {convert.format(value)})')
+            else:
+                items.append(f'{name!r}: {convert.format(source.expression)}')
+
+        code = '\n'.join(setup + [
+            '    def row(obj):',
+            '        return {',
+            *(f'            {item},' for item in items),
+            '        }',
+            '    return row',
+        ])
+        exec(compile(code, f'<compiled {self.serializer_class.__name__}>', 'exec'), namespace)
+        self.source = code
+        return namespace['build']
+
+    def many(self, instances, context=None):
+        row = self.build(self.serializer_class(context=context or {}))
+        return [row(instance) for instance in instances]
+
+    def one(self, instance, context=None):
+        return self.build(self.serializer_class(context=context or {}))(instance)
+
+
+@functools.lru_cache(maxsize=None)
+def compiled(serializer_class):
+    return CompiledSerializer(serializer_class)
+
+
+class CompiledListMixin:
+    """``list()`` through the compiled serializer (filters and pagination unchanged)."""
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        data = compiled(self.get_serializer_class()).many(
+            page if page is not None else queryset, self.get_serializer_context()
+        )
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,170 @@
+"""
+Conditional GET for the public menu reads (dishes, categories, restaurants,
+restaurant info and the menu overview).
+
+Everything those responses contain is versioned by one counter in the cache,
+bumped after any write that can change it commits: Dish, Category, Restaurant
+and DishRating saves and deletes (ratings are part of the dish bodies; an
+order's ``Dish.reduce_stock`` only when the dish runs out or turns low), bulk
+menu updates and imports (``bulk.invalidate_menu_cache``) and image variant
+updates. A response's strong ETag hashes the version with what else selects the
+representation (host, path and query string, Accept), so a repeat request with
+a matching ``If-None-Match`` is answered 304 from two cache reads, before any
+queryset or serializer runs.
+
+``Last-Modified`` is the time of the last bump, or the newest ``Dish.updated_at``
+when the cache has lost it. The version is read before the view runs, so a write
+racing with a request can only make its ETag older than its body, never newer.
+Responses carry ``Cache-Control: no-cache``: browsers revalidate every time
+instead of guessing a freshness lifetime from ``Last-Modified``.
+
+Full responses are served from ``response_cache`` (rendered and precompressed
+once per version, by one request at a time); each content encoding gets its
+own ETag.
+"""
+import asyncio
+import functools
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from . import response_cache
+
+MENU_VERSION_KEY = 'menu_version'
+MENU_MODIFIED_KEY = 'menu_last_modified'
+
+
+def _initial_version():
+    # A lost counter restarts above every version handed out before (unless it
+    # was bumped more than a thousand times a second)
+    return int(time.time() * 1000)
+
+
+def bump_menu_version():
+    try:
+        cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        cache.add(MENU_VERSION_KEY, _initial_version(), timeout=None)
+    cache.set(MENU_MODIFIED_KEY, timezone.now(), timeout=None)
+
+
+def menu_changed():
+    """Bump the menu version once the current transaction commits (now, in autocommit)."""
+    if transaction.get_connection().in_atomic_block:
+        # And right away: reads on this connection already see the change. A
+        # request elsewhere caching the old state under this version is
+        # superseded by the bump on commit.
+        bump_menu_version()
+    transaction.on_commit(bump_menu_version)
+
+
+def _last_dish_update():
+    from django.db.models import Max
+    from .models import Dish
+
+    return Dish.objects.aggregate(latest=Max('updated_at'))['latest'] or timezone.now()
+
+
+def _validators(request, state):
+    """(digest, last_modified timestamp) of this request's representation at ``state``."""
+    version, modified = state.get(MENU_VERSION_KEY), state.get(MENU_MODIFIED_KEY)
+    if version is None:
+        cache.add(MENU_VERSION_KEY, _initial_version(), timeout=None)
+        version = cache.get(MENU_VERSION_KEY)
+    if modified is None:
+        modified = _last_dish_update()
+        cache.add(MENU_MODIFIED_KEY, modified, timeout=None)
+    representation = '|'.join([
+        str(version), request.get_host(), request.get_full_path(), request.META.get('HTTP_ACCEPT', ''),
+    ])
+    digest = hashlib.md5(representation.encode(), usedforsecurity=False).hexdigest()
+    return digest, int(modified.timestamp())
+
+
+def _encoding(request):
+    if not response_cache.enabled():
+        return response_cache.IDENTITY
+    return response_cache.accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+
+def _etag(digest, encoding):
+    return quote_etag(digest if encoding == response_cache.IDENTITY else f'{digest}-{encoding}')
+
+
+def _finish(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+    return response
+
+
+def menu_conditional(view):
+    """
+    ETag/Last-Modified and 304s for a view (sync or async) serving menu data.
+
+    For DRF views it goes inside ``@api_view`` (or wraps the viewset method),
+    and is skipped for anything but the JSON renderer: the browsable API page
+    also depends on the user.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            state = await cache.aget_many([MENU_VERSION_KEY, MENU_MODIFIED_KEY])
+            if len(state) < 2:
+                digest, last_modified = await sync_to_async(_validators)(request, state)
+            else:
+                digest, last_modified = _validators(request, state)
+            encoding = _encoding(request)
+            etag = _etag(digest, encoding)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                entry = await response_cache.alookup(digest)
+                if entry is None and not await response_cache.aclaim(digest):
+                    entry = await response_cache.await_entry(digest)
+                if entry is not None:
+                    response = response_cache.cached_response(entry, encoding)
+                else:
+                    # Compression and the cache write stay off the event loop
+                    response = await sync_to_async(response_cache.store_rendered)(
+                        await view(request, *args, **kwargs), digest, encoding
+                    )
+            return _finish(response, etag, last_modified)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if renderer is not None and renderer.format != 'json':
+            return view(request, *args, **kwargs)
+        digest, last_modified = _validators(request, cache.get_many([MENU_VERSION_KEY, MENU_MODIFIED_KEY]))
+        encoding = _encoding(request)
+        etag = _etag(digest, encoding)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            entry = response_cache.lookup(digest)
+            if entry is None and not response_cache.claim(digest):
+                entry = response_cache.wait(digest)
+            if entry is not None:
+                response = response_cache.cached_response(entry, encoding)
+            else:
+                response = response_cache.store_rendered(view(request, *args, **kwargs), digest, encoding)
+        return _finish(response, etag, last_modified)
+    return wrapper
+
+
+class MenuConditionalMixin:
+    """Conditional list/retrieve for the read-only menu viewsets."""
+
+    def list(self, request, *args, **kwargs):
+        return menu_conditional(super().list)(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return menu_conditional(super().retrieve)(request, *args, **kwargs)
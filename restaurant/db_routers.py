@@ -0,0 +1,203 @@
+"""
+Database routing for read replicas and a reporting database.
+
+* Reads made while handling a safe (GET/HEAD/OPTIONS) request are spread over
+  the configured replicas; everything else, including management commands,
+  goes to ``default``.
+* Once a request writes to the restaurant tables (an order, a rating, ...) the
+  client is pinned to ``default`` for a short window so it reads its own writes.
+  The window is never shorter than the worst replication lag currently observed.
+* Analytics code can pin its reads to the ``reporting`` alias with ``pin_reads``.
+* Replicas lagging more than ``REPLICA_MAX_LAG_SECONDS`` are skipped.
+
+Sessions, auth and admin profiles always use the primary: they are tiny indexed
+lookups and must see a login immediately.
+"""
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('restaurant')
+
+PRIMARY = 'default'
+REPORTING = 'reporting'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'primary_until'
+
+# Tables that must always be read from the primary
+PRIMARY_ONLY_APPS = {'sessions', 'auth', 'contenttypes', 'admin'}
+PRIMARY_ONLY_MODELS = {'adminprofile', 'queryfingerprint'}
+
+LAG_CHECK_INTERVAL = 5.0
+
+
+class RoutingState:
+    __slots__ = ('use_replica', 'pinned', 'wrote')
+
+    def __init__(self, use_replica=False, pinned=None):
+        self.use_replica = use_replica
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+_lag_cache = {}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+def replica_lag(alias):
+    """Replication lag of ``alias`` in seconds, cached per process for a few seconds."""
+    now = time.monotonic()
+    cached = _lag_cache.get(alias)
+    if cached and now - cached[0] < LAG_CHECK_INTERVAL:
+        return cached[1]
+
+    lag = 0.0
+    # Only PostgreSQL streaming replicas report lag; local SQLite copies have none
+    if 'postgresql' in settings.DATABASES[alias]['ENGINE']:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(
+                    "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+                )
+                lag = float(cursor.fetchone()[0])
+        except Exception as e:
+            logger.warning("Replica %s lag check failed: %s", alias, e)
+            lag = float('inf')
+
+    _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def healthy_replicas():
+    max_lag = settings.REPLICA_MAX_LAG_SECONDS
+    return [alias for alias in replica_aliases() if replica_lag(alias) <= max_lag]
+
+
+def sticky_window():
+    """Seconds a writer stays on the primary: the configured window or the worst healthy lag."""
+    lags = [replica_lag(alias) for alias in healthy_replicas()]
+    return max([settings.REPLICA_STICKY_SECONDS] + lags)
+
+
+@contextmanager
+def pin_reads(alias):
+    """
+    Route reads in this block to ``alias`` when it is configured.
+
+    Usable as a decorator, e.g. ``@pin_reads('reporting')`` on analytics views.
+    """
+    current = _state.get()
+    state = RoutingState(
+        use_replica=current.use_replica if current else False,
+        pinned=alias if alias in settings.DATABASES else None,
+    )
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        if current is not None and state.wrote:
+            current.wrote = True
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def _primary_only(self, model):
+        return (
+            model._meta.app_label in PRIMARY_ONLY_APPS
+            or model._meta.model_name in PRIMARY_ONLY_MODELS
+        )
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or self._primary_only(model):
+            return PRIMARY
+        if state.pinned:
+            return state.pinned
+        if state.use_replica and not state.wrote:
+            replicas = healthy_replicas()
+            if replicas:
+                return random.choice(replicas)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label == 'restaurant':
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Enables replica reads for safe requests and keeps recent writers on the primary."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        state = self._state_for(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote:
+            self._set_sticky_cookie(response)
+        return response
+
+    async def __acall__(self, request):
+        state = self._state_for(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote:
+            # The lag check may query a replica
+            await sync_to_async(self._set_sticky_cookie)(response)
+        return response
+
+    def _state_for(self, request):
+        try:
+            sticky = float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            sticky = False
+        return RoutingState(use_replica=request.method in SAFE_METHODS and not sticky)
+
+    def _set_sticky_cookie(self, response):
+        if not replica_aliases():
+            return
+        window = sticky_window()
+        response.set_cookie(
+            STICKY_COOKIE,
+            str(int(time.time() + window)),
+            max_age=int(window) + 1,
+            httponly=True,
+            samesite='Lax',
+        )
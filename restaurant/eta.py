@@ -0,0 +1,265 @@
+"""
+Order ETA estimation.
+
+The kitchen is modelled as ``KITCHEN_STATIONS`` stations working in parallel.
+An order occupies one station for its preparation time, which is that of the
+slowest dish in the basket (dishes of one order are cooked side by side).
+Each station keeps the queue of orders reserved on it, so a new order's ETA
+is found by taking the station that frees up first: O(stations), with no scan
+of the orders table.
+
+State is per process, built from the database on first use and then kept up
+to date incrementally:
+
+* ``update_order_eta`` is called by the writer when an order is fulfilled or
+  changes status, inside the transaction saving the order. It stores the
+  estimate on the order right away, but the stations only take the change
+  once that transaction commits, so a rolled-back write leaves no phantom
+  reservation behind;
+* every other process follows the same changes through the kitchen channel
+  (see kitchen.py), so their stations converge on the same load. The
+  LocalBackend only delivers within the publishing process, so with it the
+  engine, like the kitchen queue, compares its version with the shared
+  ``kitchen:version`` at most every KITCHEN_SYNC_INTERVAL seconds and reloads
+  from the database when another process has published something newer.
+
+Ready orders, deliveries and cancellations free their station; orders queued
+behind them on that station move up.
+"""
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .events import LocalBackend, broker, get_backend
+from .kitchen import KITCHEN_CHANNEL, SHARED_VERSION_KEY, _now_version
+
+logger = logging.getLogger('restaurant')
+
+WAITING_STATUSES = ('pending', 'confirmed')
+
+
+class Reservation:
+    __slots__ = ('order_id', 'minutes', 'start', 'end', 'started')
+
+    def __init__(self, order_id, minutes, start, started=False):
+        self.order_id = order_id
+        self.minutes = minutes
+        self.start = start
+        self.end = start + timedelta(minutes=minutes)
+        self.started = started
+
+
+class ETAEngine:
+    def __init__(self, stations=None):
+        self._lock = threading.Lock()
+        self._station_count = stations
+        self.loaded = False
+        # Kitchen channel version the stations reflect (kitchen.py)
+        self.version = 0
+        self._synced_at = 0.0
+        self._stations = []
+        self._reservations = {}
+
+    # ===== station bookkeeping (lock held) =====
+
+    def _free_at(self, station, now):
+        queue = self._stations[station]
+        # Orders nobody marked ready yet still finish on paper; they do not block forever
+        while queue and queue[0].end <= now:
+            self._reservations.pop(queue.popleft().order_id, None)
+        return queue[-1].end if queue else now
+
+    def _repack(self, station, now):
+        """Start every waiting order on ``station`` as soon as the one before it ends."""
+        previous_end = now
+        for queued in self._stations[station]:
+            if not queued.started:
+                queued.start = previous_end
+                queued.end = queued.start + timedelta(minutes=queued.minutes)
+            previous_end = max(previous_end, queued.end)
+
+    def _reserve(self, order_id, minutes, now, started=False):
+        station = min(range(len(self._stations)), key=lambda s: self._free_at(s, now))
+        queue = self._stations[station]
+        if started:
+            # Cooking now: it goes ahead of the orders still waiting on this station
+            reservation = Reservation(order_id, minutes, now, started=True)
+            queue.insert(sum(1 for queued in queue if queued.started), reservation)
+            self._repack(station, now)
+        else:
+            reservation = Reservation(order_id, minutes, self._free_at(station, now))
+            queue.append(reservation)
+        self._reservations[order_id] = (station, reservation)
+        return reservation
+
+    def _release(self, order_id, now):
+        entry = self._reservations.pop(order_id, None)
+        if entry is None:
+            return
+        station, reservation = entry
+        self._stations[station].remove(reservation)
+        # Everything queued behind it on this station moves up
+        self._repack(station, now)
+
+    # ===== public API =====
+
+    def load(self):
+        """Rebuild the stations from the active orders (one query)."""
+        from .models import Order
+
+        now = timezone.now()
+        # Taken before reading: a change committed meanwhile carries a later version and forces another load
+        version = _now_version()
+        orders = (
+            Order.objects
+            .filter(status__in=WAITING_STATUSES + ('preparing',))
+            .annotate(prep_minutes=Max('orderitem__dish__preparation_time'))
+            .order_by('order_date')
+            .values_list('id', 'status', 'prep_minutes', 'estimated_ready_time')
+        )
+        with self._lock:
+            count = self._station_count or settings.KITCHEN_STATIONS
+            self._stations = [deque() for _ in range(count)]
+            self._reservations = {}
+            # Orders being cooked hold their stations first, then the waiting ones queue up
+            rows = sorted(orders, key=lambda row: row[1] != 'preparing')
+            for order_id, status, prep_minutes, ready_at in rows:
+                prep_minutes = prep_minutes or 0
+                if status == 'preparing':
+                    remaining = prep_minutes
+                    if ready_at and ready_at > now:
+                        remaining = (ready_at - now).total_seconds() / 60
+                    self._reserve(order_id, remaining, now, started=True)
+                else:
+                    self._reserve(order_id, prep_minutes, now)
+            self.version = version
+            self.loaded = True
+        logger.info("ETA engine loaded %d active orders on %d stations", len(rows), count)
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+        elif isinstance(get_backend(), LocalBackend):
+            self._sync()
+
+    def _sync(self):
+        """Reload when another process published a change this one never received."""
+        now = time.monotonic()
+        if now - self._synced_at < settings.KITCHEN_SYNC_INTERVAL:
+            return
+        self._synced_at = now
+        if (cache.get(SHARED_VERSION_KEY) or 0) > self.version:
+            self.load()
+
+    def track(self, order_id, status, prep_minutes, now=None):
+        """
+        Record ``order_id`` entering ``status``; returns its estimated ready time.
+
+        Repeating a call for the same status is a no-op, so the writer and the
+        kitchen channel can both report a change.
+        """
+        self.ensure_loaded()
+        now = now or timezone.now()
+        with self._lock:
+            entry = self._reservations.get(order_id)
+            if status in WAITING_STATUSES:
+                if entry is None:
+                    entry = (None, self._reserve(order_id, prep_minutes, now))
+                return entry[1].end
+            if status == 'preparing':
+                if entry is not None and entry[1].started:
+                    return entry[1].end
+                self._release(order_id, now)
+                return self._reserve(order_id, prep_minutes, now, started=True).end
+            # ready, delivered, cancelled
+            self._release(order_id, now)
+            return now
+
+    def estimate(self, order_id, status, prep_minutes, now=None):
+        """The ready time ``track`` would return for the same change, leaving the stations as they are."""
+        self.ensure_loaded()
+        now = now or timezone.now()
+        with self._lock:
+            entry = self._reservations.get(order_id)
+            if status in WAITING_STATUSES:
+                if entry is not None:
+                    return entry[1].end
+                free_at = min(self._free_at(s, now) for s in range(len(self._stations)))
+                return free_at + timedelta(minutes=prep_minutes)
+            if status == 'preparing':
+                if entry is not None and entry[1].started:
+                    return entry[1].end
+                return now + timedelta(minutes=prep_minutes)
+            return now
+
+    def load_minutes(self, now=None):
+        """Minutes until each station is free, for monitoring."""
+        self.ensure_loaded()
+        now = now or timezone.now()
+        with self._lock:
+            return [
+                round((self._free_at(s, now) - now).total_seconds() / 60, 1)
+                for s in range(len(self._stations))
+            ]
+
+
+eta_engine = ETAEngine()
+
+
+def order_prep_minutes(order):
+    """Preparation time of the slowest dish in ``order``; uses prefetched items when present."""
+    if 'orderitem_set' in getattr(order, '_prefetched_objects_cache', {}):
+        return max((item.dish.preparation_time for item in order.orderitem_set.all()), default=0)
+    return order.orderitem_set.aggregate(prep=Max('dish__preparation_time'))['prep'] or 0
+
+
+def update_order_eta(order, now=None):
+    """
+    Set ``order``'s ready/delivery estimates for its current status (not saved).
+
+    Call it inside the transaction that saves the order: the stations are
+    updated when it commits. Returns the names of the fields changed, for
+    ``save(update_fields=...)``.
+    """
+    now = now or timezone.now()
+    changed = []
+    prep_minutes = 0 if order.status in ('delivered', 'cancelled') else order_prep_minutes(order)
+    transaction.on_commit(functools.partial(eta_engine.track, order.id, order.status, prep_minutes, now))
+
+    if order.status == 'delivered':
+        if order.actual_delivery_time is None:
+            order.actual_delivery_time = now
+            changed.append('actual_delivery_time')
+        return changed
+    if order.status == 'cancelled':
+        return changed
+
+    ready_at = eta_engine.estimate(order.id, order.status, prep_minutes, now)
+    order.estimated_ready_time = ready_at
+    order.estimated_delivery_time = ready_at + timedelta(minutes=settings.DELIVERY_MINUTES)
+    changed += ['estimated_ready_time', 'estimated_delivery_time']
+    return changed
+
+
+def _follow_kitchen(change):
+    """Keep this process's stations in step with changes made by other workers."""
+    if not eta_engine.loaded:
+        return
+    if change['op'] == 'remove':
+        eta_engine.track(change['id'], 'cancelled', 0)
+    else:
+        ticket = change['ticket']
+        eta_engine.track(ticket['id'], ticket['status'], ticket['prep_minutes'])
+    eta_engine.version = max(eta_engine.version, change['version'])
+
+
+broker.listen(KITCHEN_CHANNEL, _follow_kitchen)
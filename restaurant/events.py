@@ -0,0 +1,178 @@
+"""
+Live events (order status changes, new notifications) for the SSE stream.
+
+Publishers run in ordinary sync code (views, utils) and call ``publish``; the
+event is sent after the surrounding transaction commits and is encoded to JSON
+once, however many clients receive it. Delivery goes through a backend chosen
+by ``settings.EVENTS_BACKEND``:
+
+* ``LocalBackend`` (default) delivers to subscribers in this process only. It is
+  enough for a single uvicorn worker and for tests.
+* A cross-worker backend (e.g. Redis pub/sub) implements the same interface:
+  ``publish(channel, payload)`` sends to the transport, and a listener calls
+  ``broker.deliver(channel, payload)`` for every message it receives.
+
+Subscribers are the SSE responses in ``async_views.event_stream``; each owns an
+asyncio queue on its event loop, fed thread-safely by ``Broker.deliver``.
+In-process state such as the kitchen queue registers a plain callback with
+``Broker.listen`` instead.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('restaurant')
+
+ADMIN_CHANNEL = 'admins'
+
+# Events buffered per subscriber before the oldest is dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    def __init__(self, channels, loop):
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, payload):
+        # A client that stops reading loses its oldest events, not the worker's memory
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(payload)
+
+    def put(self, payload):
+        self.loop.call_soon_threadsafe(self._put, payload)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class Broker:
+    """In-process fan-out from channels to subscriptions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._listeners = defaultdict(list)
+
+    def listen(self, channel, callback):
+        """Call ``callback(payload)`` in the delivering thread for every message on ``channel``."""
+        with self._lock:
+            self._listeners[channel].append(callback)
+
+    def subscribe(self, channels):
+        subscription = Subscription(tuple(channels), asyncio.get_running_loop())
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def deliver(self, channel, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+            listeners = list(self._listeners.get(channel, ()))
+        for callback in listeners:
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error("Error in %s listener: %s", channel, e)
+        for subscription in subscribers:
+            try:
+                subscription.put(payload)
+            except RuntimeError:
+                # Its event loop is closed; the stream is going away
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+
+class LocalBackend:
+    """Delivers to this process's broker only."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, channel, payload):
+        self.broker.deliver(channel, payload)
+
+
+broker = Broker()
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.EVENTS_BACKEND)(broker)
+    return _backend
+
+
+def encode_event(event_type, data):
+    """Encode one SSE message; done once per event, not per subscriber."""
+    return f"event: {event_type}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def send(channels, payload):
+    """Hand ``payload`` to the backend for each channel once the current transaction commits."""
+    def deliver():
+        backend = get_backend()
+        for channel in channels:
+            try:
+                backend.publish(channel, payload)
+            except Exception as e:
+                logger.error("Error publishing to %s: %s", channel, e)
+
+    transaction.on_commit(deliver)
+
+
+def publish(channels, event_type, data):
+    """Send an SSE event to ``channels`` once the current transaction commits."""
+    send(channels, encode_event(event_type, data))
+
+
+def publish_notification(notification):
+    publish([user_channel(notification.user_id)], 'notification', {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at,
+    })
+
+
+def publish_order_status(order, user_id):
+    """Tell the order's customer and every admin stream about a status change."""
+    publish([user_channel(user_id), ADMIN_CHANNEL], 'order_status', {
+        'order_id': order.id,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'payment_status': order.payment_status,
+    })
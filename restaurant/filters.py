@@ -1,6 +1,6 @@
 import django_filters
 from django_filters import rest_framework as filters
-from django.db.models import Q, F
+from django.db.models import Q
 from .models import Dish, Category, Order, DishRating
 
 class DishFilter(filters.FilterSet):
@@ -55,7 +55,7 @@ class DishFilter(filters.FilterSet):
     def filter_low_stock(self, queryset, name, value):
         """فلترة الأطباق ذات المخزون المنخفض"""
         if value:
-            return queryset.filter(stock_quantity__lte=F('low_stock_threshold'))
+            return queryset.filter(is_low_stock=True)
         return queryset
     
     def filter_min_rating(self, queryset, name, value):
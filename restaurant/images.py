@@ -0,0 +1,228 @@
+"""
+Responsive image variants for dishes and categories.
+
+Decoding and resizing is CPU heavy, so it runs in a process pool instead of the
+admin upload request. Each upload produces thumb/card/full sizes in WebP and
+JPEG, written through the field's storage backend, and the resulting names and
+URLs are recorded in the model's ``image_variants`` column so serializers can
+build a srcset without touching storage. The original's URL is likewise
+precomputed into ``image_url`` whenever the row is saved.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+from PIL import Image
+
+from .conditional import menu_changed
+
+logger = logging.getLogger('restaurant')
+
+# Largest first: each size is reduced from the previous one instead of the original
+IMAGE_VARIANTS = {
+    'full': (800, 600),
+    'card': (400, 300),
+    'thumb': (200, 150),
+}
+
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+_lock = threading.Lock()
+_pools = {}
+
+
+def render_variants(data):
+    """
+    Decode ``data`` once and encode every size/format pair.
+
+    Pure function of the image bytes so it can run in a worker process.
+    Returns ``{variant: {'width': int, 'webp': bytes, 'jpeg': bytes}}``.
+    """
+    rendered = {}
+    with Image.open(io.BytesIO(data)) as img:
+        # Let the JPEG decoder downscale by DCT before we touch the pixels
+        img.draft('RGB', IMAGE_VARIANTS['full'])
+        current = img.convert('RGB')
+
+    for variant, size in IMAGE_VARIANTS.items():
+        current.thumbnail(size, Image.LANCZOS)
+        entry = {'width': current.width}
+        for ext, (fmt, options) in IMAGE_FORMATS.items():
+            output = io.BytesIO()
+            current.save(output, format=fmt, **options)
+            entry[ext] = output.getvalue()
+        rendered[variant] = entry
+    return rendered
+
+
+@lru_cache(maxsize=4096)
+def _storage_url(storage, name):
+    return storage.url(name)
+
+
+def resolve_image_url(field_file):
+    """
+    Memoized ``field_file.url`` keyed by (storage, name).
+
+    Building a URL is pure string work for every backend we use, but with
+    Cloudinary it is expensive enough to show up when a menu page serializes
+    hundreds of dishes.
+    """
+    if not field_file:
+        return ''
+    return _storage_url(field_file.storage, field_file.name)
+
+
+def sync_image_url(instance, update_fields=None, field_name='image', url_field='image_url'):
+    """
+    Precompute ``instance.<url_field>`` from its image before the row is written.
+
+    A freshly uploaded file is committed to storage first (as ``FileField.pre_save``
+    would) so the URL reflects the final stored name.
+    """
+    field_file = getattr(instance, field_name)
+    if field_file and not field_file._committed:
+        field_file.save(field_file.name, field_file.file, save=False)
+    setattr(instance, url_field, resolve_image_url(field_file))
+
+    if update_fields is not None and field_name in update_fields:
+        update_fields = set(update_fields) | {url_field}
+    return update_fields
+
+
+def _get_pool(kind):
+    """Per-process pools, created lazily so forked gunicorn workers get their own."""
+    from django.conf import settings
+
+    key = (kind, os.getpid())
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            workers = settings.IMAGE_PIPELINE_WORKERS
+            if kind == 'process':
+                pool = ProcessPoolExecutor(max_workers=workers)
+            else:
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-pipeline')
+            _pools[key] = pool
+        return pool
+
+
+def save_variants(field_file, rendered):
+    """Write rendered variants next to the original; returns the ``image_variants`` dict."""
+    from django.core.files.base import ContentFile
+
+    storage = field_file.storage
+    directory, filename = os.path.split(os.path.splitext(field_file.name)[0])
+
+    variants = {}
+    for variant, encoded in rendered.items():
+        entry = {'width': encoded['width']}
+        for ext in IMAGE_FORMATS:
+            name = storage.save(
+                f"{directory}/variants/{filename}_{variant}.{ext}",
+                ContentFile(encoded[ext])
+            )
+            entry[ext] = {'name': name, 'url': _storage_url(storage, name)}
+        variants[variant] = entry
+    return variants
+
+
+def read_image(field_file):
+    """Read the whole file through its storage backend."""
+    field_file.open('rb')
+    try:
+        return field_file.read()
+    finally:
+        field_file.close()
+
+
+def store_variants(instance, rendered, field_name='image'):
+    """Save rendered variants and record them on ``instance``."""
+    variants = save_variants(getattr(instance, field_name), rendered)
+    # update() rather than save(): no model side effects for a derived column
+    type(instance)._default_manager.filter(pk=instance.pk).update(image_variants=variants)
+    instance.image_variants = variants
+    # ...except that the public menu bodies list the variants
+    menu_changed()
+    return variants
+
+
+def generate_image_variants(instance, field_name='image'):
+    """Render and store variants for ``instance`` in the calling thread."""
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return {}
+    return store_variants(instance, render_variants(read_image(field_file)), field_name)
+
+
+def _run_pipeline(model, pk, name, field_name):
+    from django.db import close_old_connections
+
+    try:
+        instance = model._default_manager.filter(pk=pk).first()
+        # Skip if the row is gone or the image was replaced again meanwhile
+        if instance is None or getattr(instance, field_name).name != name:
+            return {}
+
+        data = read_image(getattr(instance, field_name))
+        rendered = _get_pool('process').submit(render_variants, data).result()
+        variants = store_variants(instance, rendered, field_name)
+        logger.info("Image variants generated for %s #%s", model.__name__, pk)
+        return variants
+    except Exception as e:
+        logger.error("Error generating image variants for %s #%s: %s", model.__name__, pk, e)
+        return {}
+    finally:
+        close_old_connections()
+
+
+def schedule_image_variants(instance, field_name='image'):
+    """
+    Queue variant generation for ``instance``.
+
+    With ``IMAGE_PIPELINE_WORKERS = 0`` the work runs inline, which keeps tests
+    and local development deterministic. Returns a future otherwise.
+    """
+    from django.conf import settings
+
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return None
+
+    if not settings.IMAGE_PIPELINE_WORKERS:
+        # Logged like the pool path: a bad upload must not fail the request that saved it
+        try:
+            return generate_image_variants(instance, field_name)
+        except Exception as e:
+            logger.error("Error generating image variants for %s #%s: %s", type(instance).__name__, instance.pk, e)
+            return {}
+
+    return _get_pool('thread').submit(
+        _run_pipeline, type(instance), instance.pk, field_file.name, field_name
+    )
+
+
+def build_srcset(variants, request=None):
+    """Build ``{'webp': srcset, 'jpeg': srcset}`` from recorded variants (no storage access)."""
+    if not variants:
+        return None
+
+    srcset = {}
+    for ext in IMAGE_FORMATS:
+        candidates = []
+        for variant in reversed(list(IMAGE_VARIANTS)):
+            entry = variants.get(variant)
+            if not entry or ext not in entry:
+                continue
+            url = entry[ext]['url']
+            if request is not None and not url.startswith('http'):
+                url = request.build_absolute_uri(url)
+            candidates.append(f"{url} {entry['width']}w")
+        srcset[ext] = ', '.join(candidates)
+    return srcset
@@ -0,0 +1,200 @@
+"""
+Index proposals from the QueryFingerprint statistics (manage.py index_advisor).
+
+Fingerprints with a captured plan are read most expensive first. A table the
+database read in full (SQLite ``SCAN t``, PostgreSQL ``Seq Scan on t``), or
+whose rows it sorted after reading them (``USE TEMP B-TREE FOR ORDER BY``,
+``Sort``), gets an index made from the statement's own predicates on it:
+equality columns first, then one range column or else the ORDER BY columns,
+so the same index finds the rows and returns them in order. A proposal is
+dropped when an index in the database (RunSQL ones included) already starts
+with its columns.
+
+Predicates no plain index serves are reported instead:
+  * a column compared with another column of the row (``stock_quantity <=
+    low_stock_threshold``): store the outcome in a column, as Dish.is_low_stock;
+  * a column inside a date function (``order_date__date``): compare the bare
+    column with a half-open range, as restaurant.utils.on_day does.
+"""
+import re
+
+from django.apps import apps
+from django.db.models import Q
+from django.db import connections, migrations, models
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from .models import QueryFingerprint
+from .slow_queries import EXPLAINABLE
+
+_FROM = re.compile(r'\bFROM "(\w+)"')
+_SCAN = re.compile(r'\bSCAN (?!SUBQUERY|CONSTANT)(\w+)|Seq Scan on (\w+)')
+_SORT = re.compile(r'TEMP B-TREE FOR ORDER BY|\bSort\b')
+_COMPARISON = re.compile(r'"(\w+)"\."(\w+)" (=|IN|IS|<=|>=|<|>) (?=\?|\(|NULL|NOT NULL)')
+_COLUMN_PAIR = re.compile(r'"(\w+)"\."(\w+)" (<=|>=|<|>|=|!=|<>) \(?"(\w+)"\."(\w+)"')
+_DATE_FUNCTION = re.compile(
+    r'(django_\w*(?:date|time|trunc|extract)\w*)\("(\w+)"\."(\w+)"|\("(\w+)"\."(\w+)" AT TIME ZONE [^)]*\)::(date)'
+)
+_ORDER_COLUMN = re.compile(r'"(\w+)"\."(\w+)"')
+_CLAUSE_END = re.compile(r' (?:GROUP BY|ORDER BY|HAVING|LIMIT) ')
+
+EQUALITY = ('=', 'IN', 'IS')
+
+
+def where_clause(sql):
+    _, found, rest = sql.partition(' WHERE ')
+    return _CLAUSE_END.split(rest, 1)[0] if found else ''
+
+
+def order_by_columns(sql):
+    _, found, rest = sql.rpartition(' ORDER BY ')
+    if not found:
+        return []
+    return _ORDER_COLUMN.findall(rest.split(' LIMIT ', 1)[0])
+
+
+def existing_indexes(table, using='default'):
+    """Column lists of the indexes ``table`` has in the database."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [
+        tuple(info['columns']) for info in constraints.values()
+        if (info['index'] or info['unique'] or info['primary_key']) and info['columns'] and None not in info['columns']
+    ]
+
+
+class Proposal:
+    def __init__(self, table, columns, model):
+        self.table = table
+        self.columns = tuple(columns)
+        self.model = model
+        self.fingerprints = []
+        self.plan = []
+
+    @property
+    def fields(self):
+        """Field names for the columns, or None when a column is not a model field."""
+        if self.model is None:
+            return None
+        names = {field.column: field.name for field in self.model._meta.concrete_fields}
+        if not all(column in names for column in self.columns):
+            return None
+        return [names[column] for column in self.columns]
+
+    @property
+    def calls(self):
+        return sum(row.calls for row in self.fingerprints)
+
+    @property
+    def total_ms(self):
+        return sum(row.total_ms for row in self.fingerprints)
+
+    def index(self):
+        """The models.Index for a field-based proposal, named as Django would."""
+        index = models.Index(fields=self.fields)
+        index.set_name_with_model(self.model)
+        return index
+
+    def sql_name(self):
+        return f"{self.table}_{'_'.join(self.columns)}_idx"[:63]
+
+
+def _index_columns(row, table):
+    where = where_clause(row.sql)
+    equality, ranges = [], []
+    for table_name, column, operator in _COMPARISON.findall(where):
+        if table_name != table:
+            continue
+        target = equality if operator in EQUALITY else ranges
+        if column not in equality and column not in ranges:
+            target.append(column)
+    # An index only gives the order when every ORDER BY column is in it
+    order = order_by_columns(row.sql)
+    if any(table_name != table for table_name, _ in order):
+        order = []
+    return equality, ranges, [column for _, column in order]
+
+
+def advise(rows, using='default'):
+    """(proposals, advice) for the QueryFingerprint ``rows``, most expensive first."""
+    models_by_table = {model._meta.db_table: model for model in apps.get_models()}
+    proposals, advice, indexes = {}, {}, {}
+    for row in rows:
+        for table, column, operator, other_table, other in _COLUMN_PAIR.findall(where_clause(row.sql)):
+            if table == other_table:
+                advice.setdefault(
+                    (table, f'{column} {operator} {other}'),
+                    'compares two columns of the row; no index serves it, store the outcome in an indexed column',
+                )
+        for match in _DATE_FUNCTION.finditer(row.sql):
+            function, table, column = match.group(1, 2, 3) if match.group(1) else match.group(6, 4, 5)
+            advice.setdefault(
+                (table, column),
+                f'is wrapped in {function}(); no index on the column serves it, filter on a range of the bare column',
+            )
+        if not row.plan:
+            continue
+        plan = '\n'.join(row.plan)
+        scanned = {name for groups in _SCAN.findall(plan) for name in groups if name}
+        main = _FROM.search(row.sql)
+        sorted_table = main.group(1) if main and _SORT.search(plan) else None
+        for table in scanned | ({sorted_table} if sorted_table else set()):
+            if table == QueryFingerprint._meta.db_table:
+                continue
+            equality, ranges, order = _index_columns(row, table)
+            if ranges:
+                columns = equality + ranges[:1]
+            elif order and (table == sorted_table or ' LIMIT ' in row.sql):
+                columns = equality + [column for column in order if column not in equality]
+            else:
+                columns = equality
+            if not columns or (table not in scanned and not order):
+                continue
+            if table not in indexes:
+                indexes[table] = existing_indexes(table, using)
+            if any(existing[:len(columns)] == tuple(columns) for existing in indexes[table]):
+                continue
+            proposal = proposals.get((table, tuple(columns)))
+            if proposal is None:
+                proposal = proposals[(table, tuple(columns))] = Proposal(table, columns, models_by_table.get(table))
+                proposal.plan = row.plan
+            proposal.fingerprints.append(row)
+    ranked = sorted(proposals.values(), key=lambda proposal: proposal.total_ms, reverse=True)
+    return ranked, advice
+
+
+def candidate_rows(min_calls=1, limit=50):
+    """The costliest statements an index could help: DDL, PRAGMAs and INSERTs are left out."""
+    statements = Q()
+    for keyword in EXPLAINABLE:
+        statements |= Q(sql__startswith=keyword)
+    return list(
+        QueryFingerprint.objects.filter(statements, calls__gte=min_calls).order_by('-total_ms')[:limit]
+    )
+
+
+def build_migration(proposals, app_label='restaurant', name='advised_indexes', using='default'):
+    """A MigrationWriter for a migration of ``app_label`` creating the proposed indexes."""
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    leaves = loader.graph.leaf_nodes(app_label)
+    number = max((MigrationAutodetector.parse_number(leaf) or 0 for _, leaf in leaves), default=0) + 1
+    quote = connections[using].ops.quote_name
+    dependencies, operations = set(leaves), []
+    for proposal in proposals:
+        if proposal.fields and proposal.model._meta.app_label == app_label:
+            operations.append(migrations.AddIndex(proposal.model._meta.model_name, proposal.index()))
+            continue
+        # Tables of other apps (auth_user...) get plain SQL, as in 0016
+        if proposal.model is not None:
+            dependencies.update(loader.graph.leaf_nodes(proposal.model._meta.app_label))
+        columns = ', '.join(quote(column) for column in proposal.columns)
+        operations.append(migrations.RunSQL(
+            f'CREATE INDEX IF NOT EXISTS {proposal.sql_name()} ON {quote(proposal.table)} ({columns})',
+            f'DROP INDEX IF EXISTS {proposal.sql_name()}',
+        ))
+    migration = migrations.Migration(f'{number:04d}_{name}', app_label)
+    migration.dependencies = sorted(dependencies)
+    migration.operations = operations
+    return MigrationWriter(migration)
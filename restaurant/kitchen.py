@@ -0,0 +1,251 @@
+"""
+Kitchen display queue.
+
+Active orders (anything not delivered or cancelled) are kept in memory as
+compact tickets, ordered by when they are due (the ETA engine's ready time,
+see eta.py) and, among equals, longest preparation first. Kitchen screens poll
+``GET /api/admin/kitchen/?since=<version>`` and get only the tickets changed
+or removed since their last refresh, served from memory without touching the
+database.
+
+The queue is loaded once per process on first use. After that it changes
+through messages on the events ``kitchen`` channel, sent by ``publish_order``
+whenever an order is created or changes status, so it follows the same
+backend as the SSE stream (see events.py).
+
+The LocalBackend delivers only within the publishing process, so with several
+workers each would miss the others' changes. Publishers therefore also store
+their version under ``kitchen:version`` in the shared cache; with the local
+backend a queue compares it with its own version at most every
+KITCHEN_SYNC_INTERVAL seconds and reloads from the database when another
+process has published something newer.
+
+Versions are microsecond timestamps. A publisher stamps its message when the
+transaction commits, after its rows are visible, and a load stamps its own
+version before querying, so a load that could have missed a change always
+holds an older version than the change and resyncs. A client whose
+``since`` this process cannot describe as a delta (before it loaded, older
+than the retained removals, or newer than anything it has seen, i.e. from
+another worker) gets a full snapshot with ``reset: true``.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .events import LocalBackend, broker, get_backend, send
+from .models import Order, OrderItem
+
+logger = logging.getLogger('restaurant')
+
+KITCHEN_CHANNEL = 'kitchen'
+SHARED_VERSION_KEY = 'kitchen:version'
+
+# Forward path through the kitchen; cancelling is allowed until delivery
+ORDER_FLOW = ['pending', 'confirmed', 'preparing', 'ready', 'delivered']
+FINAL_STATUSES = {'delivered', 'cancelled'}
+
+TRANSITIONS = {
+    status: set(ORDER_FLOW[i + 1:]) | ({'cancelled'} if status not in FINAL_STATUSES else set())
+    for i, status in enumerate(ORDER_FLOW)
+}
+TRANSITIONS['cancelled'] = set()
+assert set(TRANSITIONS) == set(dict(Order.ORDER_STATUS_CHOICES)), 'kitchen flow out of sync with Order'
+
+# Removals remembered for delta clients
+TOMBSTONE_LIMIT = 1000
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def validate_transition(current, new):
+    """Raise InvalidTransition unless an order may move from ``current`` to ``new``."""
+    if new not in TRANSITIONS:
+        raise InvalidTransition(f'Unknown status "{new}"')
+    if new != current and new not in TRANSITIONS.get(current, ()):
+        raise InvalidTransition(f'Cannot change order status from "{current}" to "{new}"')
+
+
+def _now_version():
+    return time.time_ns() // 1000
+
+
+def build_ticket(order):
+    """Compact kitchen view of ``order``; reads ``orderitem_set`` (prefetch it when loading many)."""
+    items = [
+        (item.dish.name, item.quantity, item.special_instructions, item.dish.preparation_time)
+        for item in order.orderitem_set.all()
+    ]
+    # Dishes are cooked in parallel: the slowest one decides
+    prep_minutes = max((prep for *_, prep in items), default=0)
+    due_at = order.estimated_ready_time or order.order_date + timedelta(minutes=prep_minutes)
+    return {
+        'id': order.id,
+        'status': order.status,
+        'placed_at': order.order_date.isoformat(),
+        'due_at': due_at.isoformat(),
+        'prep_minutes': prep_minutes,
+        'customer': order.customer.user.get_full_name() or order.customer.user.username,
+        'notes': order.special_instructions,
+        'items': [[name, quantity, note] for name, quantity, note, _ in items],
+    }
+
+
+def _priority(ticket):
+    due = datetime.fromisoformat(ticket['due_at']).timestamp()
+    return (due, -ticket['prep_minutes'], ticket['id'])
+
+
+class KitchenQueue:
+    def __init__(self, tombstone_limit=TOMBSTONE_LIMIT):
+        self._lock = threading.Lock()
+        self._tombstone_limit = tombstone_limit
+        self.loaded = False
+        self._synced_at = 0.0
+        self._reset_state(0)
+
+    def _reset_state(self, version):
+        self._tickets = {}
+        self._key_of = {}
+        self._keys = []
+        self._removed = deque()
+        self.version = version
+        self.horizon = version
+
+    def load(self):
+        """(Re)load active orders from the database: one query for orders, one for items."""
+        orders = (
+            Order.objects
+            .exclude(status__in=FINAL_STATUSES)
+            .select_related('customer__user')
+            .prefetch_related(
+                Prefetch('orderitem_set', queryset=OrderItem.objects.select_related('dish'))
+            )
+        )
+        # Stamped before the query: a change committed while it runs has a later version
+        version = _now_version()
+        tickets = [build_ticket(order) for order in orders]
+        with self._lock:
+            self._reset_state(version)
+            for ticket in tickets:
+                self._upsert(ticket, self.version)
+            self.loaded = True
+        logger.info("Kitchen queue loaded with %d active orders", len(tickets))
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+        elif isinstance(get_backend(), LocalBackend):
+            self._sync()
+
+    def _sync(self):
+        """Reload when another process published a change this one never received."""
+        now = time.monotonic()
+        if now - self._synced_at < settings.KITCHEN_SYNC_INTERVAL:
+            return
+        self._synced_at = now
+        if (cache.get(SHARED_VERSION_KEY) or 0) > self.version:
+            self.load()
+
+    # ===== mutations (lock held) =====
+
+    def _discard(self, order_id):
+        ticket = self._tickets.pop(order_id, None)
+        if ticket is not None:
+            index = bisect.bisect_left(self._keys, self._key_of.pop(order_id))
+            del self._keys[index]
+        return ticket
+
+    def _upsert(self, ticket, version):
+        self._discard(ticket['id'])
+        ticket = dict(ticket, version=version)
+        key = _priority(ticket)
+        self._tickets[ticket['id']] = ticket
+        self._key_of[ticket['id']] = key
+        bisect.insort(self._keys, key)
+
+    def _remove(self, order_id, version):
+        if self._discard(order_id) is None:
+            return
+        self._removed.append((version, order_id))
+        if len(self._removed) > self._tombstone_limit:
+            dropped_version, _ = self._removed.popleft()
+            self.horizon = max(self.horizon, dropped_version)
+
+    def apply(self, change):
+        """Apply one ``publish_order`` message. Ignored until the queue has been loaded."""
+        with self._lock:
+            if not self.loaded:
+                return
+            # Keep versions increasing even if messages arrive out of order
+            version = max(change['version'], self.version + 1)
+            if change['op'] == 'remove':
+                self._remove(change['id'], version)
+            else:
+                self._upsert(change['ticket'], version)
+            self.version = version
+
+    # ===== reads =====
+
+    def feed(self, since=None):
+        """
+        Tickets changed after ``since`` plus the current order of the queue.
+
+        Returns ``{'version', 'reset', 'orders', 'removed', 'queue'}``; ``orders``
+        holds every active ticket when ``reset`` is true.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            queue = [key[2] for key in self._keys]
+            reset = since is None or since < self.horizon or since > self.version
+            if reset:
+                orders = [self._tickets[order_id] for order_id in queue]
+                removed = []
+            else:
+                orders = [
+                    self._tickets[order_id] for order_id in queue
+                    if self._tickets[order_id]['version'] > since
+                ]
+                removed = [order_id for version, order_id in self._removed if version > since]
+            return {
+                'version': self.version,
+                'reset': reset,
+                'orders': orders,
+                'removed': removed,
+                'queue': queue,
+            }
+
+
+kitchen_queue = KitchenQueue()
+broker.listen(KITCHEN_CHANNEL, kitchen_queue.apply)
+
+
+def _publish(message):
+    def stamp():
+        # Runs before send's delivery: the version is taken once the rows are committed
+        message['version'] = _now_version()
+        cache.set(SHARED_VERSION_KEY, message['version'], None)
+
+    transaction.on_commit(stamp)
+    send([KITCHEN_CHANNEL], message)
+
+
+def publish_order(order):
+    """Send ``order``'s kitchen ticket (or its removal) to every kitchen queue after commit."""
+    if order.status in FINAL_STATUSES:
+        publish_order_removed(order.id)
+        return
+    _publish({'op': 'upsert', 'ticket': build_ticket(order)})
+
+
+def publish_order_removed(order_id):
+    _publish({'op': 'remove', 'id': order_id})
@@ -0,0 +1,133 @@
+"""
+Logging helpers: structured, lazily formatted, sampled events and a queue
+handler that moves formatting and I/O off the request thread.
+
+``event_logger(name)`` returns an EventLogger for high-volume events::
+
+    log = event_logger('restaurant.models')
+    log.debug('dish_saved', dish=dish.id, stock=dish.stock_quantity)
+
+Nothing is formatted unless the record is emitted: below the logger's level a
+call costs one ``isEnabledFor`` check, and INFO/DEBUG events from a logger
+listed in ``settings.LOG_SAMPLE_RATES`` are kept only at that rate (warnings
+and errors always pass). Emitted events read ``event key=value ...`` and also
+carry ``event``/``fields`` attributes for structured formatters.
+
+``BackgroundHandler`` wraps any handler (``LOGGING`` uses it for the console
+and the log file): the request thread only enqueues the record, and a
+QueueListener thread formats and writes it. When the queue is full records are
+dropped and counted rather than blocking the request.
+"""
+import atexit
+import copy
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_QUEUE_SIZE = 10000
+
+
+class Event:
+    """Log message formatted on first ``str()`` (after the record has been accepted)."""
+
+    __slots__ = ('name', 'fields')
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __str__(self):
+        if not self.fields:
+            return self.name
+        return self.name + ' ' + ' '.join(f'{key}={value}' for key, value in self.fields.items())
+
+
+class EventLogger:
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+        self._rate = None
+
+    @property
+    def sample_rate(self):
+        if self._rate is None:
+            self._rate = float(getattr(settings, 'LOG_SAMPLE_RATES', {}).get(self.logger.name, 1.0))
+        return self._rate
+
+    def log(self, level, event, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self.logger.log(level, Event(event, fields), extra={'event': event, 'fields': fields}, stacklevel=3)
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+
+_event_loggers = {}
+
+
+def event_logger(name):
+    if name not in _event_loggers:
+        _event_loggers[name] = EventLogger(name)
+    return _event_loggers[name]
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Queue in front of ``handler_class(**kwargs)``, drained by a listener thread.
+
+    The formatter configured for this handler is applied by the wrapped one, on
+    the listener thread; here records only get their message interpolated.
+    """
+
+    def __init__(self, handler_class, queue_size=DEFAULT_QUEUE_SIZE, **kwargs):
+        super().__init__(queue.Queue(queue_size))
+        self.target = import_string(handler_class)(**kwargs)
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Same thread, same process: only resolve what may change after the call returns
+        record = copy.copy(record)
+        if not isinstance(record.msg, Event):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait until every queued record has been written (used by tests and benchmarks)."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+            self.listener.start()
+        self.target.flush()
+
+    def close(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+        self.target.close()
+        super().close()
@@ -0,0 +1,126 @@
+"""
+Identity resolution and password checks for customer_login and admin_login.
+
+* ``resolve_user(identity)`` finds the account for an email (when the identity
+  contains ``@``) or a username, case-insensitively, through the LOWER()
+  expression indexes of migration 0016: auth_user has no index on ``email``,
+  and ``iexact`` compiles to LIKE on SQLite, which no index serves. An exact-case
+  match wins; otherwise the identity must name a single account.
+* ``check_password(user, password)`` runs the hash with at most
+  ``LOGIN_HASH_CONCURRENCY`` checks at a time on the host, across every
+  worker process: a check holds an ``flock`` on one of that many slot files in
+  ``LOGIN_HASH_SLOT_DIR``. Each sync worker (or ASGI executor thread) hashes
+  one password at a time anyway, so a per-process limit would bound nothing;
+  a host-wide one keeps a burst of logins (PBKDF2 is CPU-bound by design) from
+  occupying every worker, leaving the rest for menu and order requests. A
+  check that waits longer than ``LOGIN_HASH_WAIT`` seconds gives up with
+  HashingBusy, a 503. The kernel drops a dead worker's lock, so a crash cannot
+  leak a slot. Without ``fcntl`` (Windows) the limit is per process.
+* ``TunablePBKDF2PasswordHasher`` (first in PASSWORD_HASHERS) is Django's
+  pbkdf2_sha256 with ``PASSWORD_HASH_ITERATIONS`` rounds. Existing hashes keep
+  verifying; Django's ``User.check_password`` re-hashes a password stored with
+  other rounds or another hasher right after a successful login, so changing
+  the setting migrates accounts as they sign in.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.db.models.functions import Lower
+from django.http import JsonResponse
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to a per-process limit
+    fcntl = None
+
+# Seconds between attempts to take a slot while all are held
+SLOT_POLL_INTERVAL = 0.02
+
+
+class HashingBusy(Exception):
+    """No hashing slot freed up within LOGIN_HASH_WAIT seconds."""
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+_hash_slots = None
+_hash_slots_lock = threading.Lock()
+
+
+def _slots():
+    global _hash_slots
+    with _hash_slots_lock:
+        if _hash_slots is None or _hash_slots[0] != settings.LOGIN_HASH_CONCURRENCY:
+            _hash_slots = (settings.LOGIN_HASH_CONCURRENCY, threading.BoundedSemaphore(settings.LOGIN_HASH_CONCURRENCY))
+        return _hash_slots[1]
+
+
+def _try_slot_files():
+    """An open, locked slot file descriptor, or None when every slot is held."""
+    os.makedirs(settings.LOGIN_HASH_SLOT_DIR, exist_ok=True)
+    for n in range(settings.LOGIN_HASH_CONCURRENCY):
+        fd = os.open(os.path.join(settings.LOGIN_HASH_SLOT_DIR, f'slot-{n}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+@contextmanager
+def hash_slot():
+    """Hold one of the host's LOGIN_HASH_CONCURRENCY hashing slots; raises HashingBusy after LOGIN_HASH_WAIT."""
+    if fcntl is None:
+        slots = _slots()
+        if not slots.acquire(timeout=settings.LOGIN_HASH_WAIT):
+            raise HashingBusy()
+        try:
+            yield
+        finally:
+            slots.release()
+        return
+
+    deadline = time.monotonic() + settings.LOGIN_HASH_WAIT
+    while (fd := _try_slot_files()) is None:
+        if time.monotonic() >= deadline:
+            raise HashingBusy()
+        time.sleep(SLOT_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        os.close(fd)
+
+
+def resolve_user(identity):
+    """The User ``identity`` (email or username) names, or None."""
+    identity = identity.strip()
+    field = 'email' if '@' in identity else 'username'
+    candidates = list(
+        User.objects.alias(identity_lower=Lower(field)).filter(identity_lower=identity.lower())[:2]
+    )
+    for user in candidates:
+        if getattr(user, field) == identity:
+            return user
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def check_password(user, password):
+    """``user.check_password(password)`` within the host-wide hashing limit."""
+    with hash_slot():
+        return user.check_password(password)
+
+
+def login_busy():
+    response = JsonResponse({'error': 'Too many sign-ins in progress, please try again.'}, status=503)
+    response['Retry-After'] = '1'
+    return response
@@ -0,0 +1,23 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from restaurant.menu_io import KINDS, export_menu
+from restaurant.tabular import WRITERS
+
+
+class Command(BaseCommand):
+    help = 'Stream categories or dishes to CSV or JSONL (stdout unless --output is given)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(KINDS))
+        parser.add_argument('--format', dest='file_format', choices=list(WRITERS), default='csv')
+        parser.add_argument('--output', help='File to write instead of stdout')
+
+    def handle(self, *args, **options):
+        chunks = export_menu(options['kind'], options['file_format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+            self.stderr.write(self.style.SUCCESS(f"Exported {options['kind']} to {options['output']}"))
+        else:
+            sys.stdout.writelines(chunks)
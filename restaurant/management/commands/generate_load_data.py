@@ -0,0 +1,306 @@
+"""
+Synthetic data at load-test volumes.
+
+Everything is derived from ``--seed`` and ``--base-date`` (dates count back
+from its midnight, UTC; today by default): each block of rows has its own random generator
+seeded from (seed, table, block number), so the data is the same whether it is
+written by one process or many, and in any order. Users, customers and orders
+get their ids up front, counting on from the highest id in each table, so their
+ids and the order numbers quoted in notifications do not depend on which block
+is written first either; order items, ratings and notifications are numbered
+in write order. Blocks are written with ``bulk_create`` in one transaction
+each, which also skips the per-row ``save()`` logging of the models.
+
+Distributions:
+  * dish popularity follows a Zipf law (a few dishes take most orders);
+  * order times follow a diurnal curve with lunch and dinner peaks, busier at
+    weekends, spread over the last ``--days`` days;
+  * basket sizes are geometric, ratings skew positive, old orders are mostly
+    delivered and recent ones still moving through the kitchen.
+"""
+import bisect
+import itertools
+import math
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from restaurant.conditional import bump_menu_version
+from restaurant.models import Category, Customer, Dish, DishRating, Notification, Order, OrderItem
+
+# Shared password of every generated user, so load tests can log in
+LOAD_PASSWORD = 'loadtest'
+
+# Weight of each hour of the day (0-23): lunch and dinner peaks, quiet nights
+HOURLY_WEIGHTS = [
+    1, 0.5, 0.3, 0.2, 0.2, 0.3, 0.8, 1.5, 2, 2.5, 3, 5,
+    9, 10, 7, 4, 3.5, 4, 6, 9, 10, 8, 5, 2.5,
+]
+WEEKEND_FACTOR = 1.4
+ACTIVE_STATUSES = ['pending', 'confirmed', 'preparing', 'ready']
+RATING_WEIGHTS = [0.04, 0.06, 0.15, 0.35, 0.40]
+
+# Set by the parent before work is handed out (inherited by forked workers)
+_plan = {}
+
+
+def _rng(table, block):
+    return random.Random(f"{_plan['seed']}:{table}:{block}")
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def _next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def _blocks(total, size):
+    return [(n, n * size, min(size, total - n * size)) for n in range((total + size - 1) // size)]
+
+
+@contextmanager
+def _explicit_timestamps(*fields):
+    """Let bulk_create store the generated value of auto_now(_add) fields."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _random_moment(rng, days_cum, hours_cum):
+    day = bisect.bisect(days_cum, rng.random() * days_cum[-1])
+    hour = bisect.bisect(hours_cum, rng.random() * hours_cum[-1])
+    return _plan['start'] + timedelta(days=day, hours=hour, seconds=rng.randrange(3600))
+
+
+# ===== blocks (run in the parent or in pool workers) =====
+
+def _customers_block(block):
+    number, first, count = block
+    rng = _rng('customers', number)
+    prefix = _plan['prefix']
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                id=_plan['user_base'] + i,
+                username=f'{prefix}{i:08d}',
+                email=f'{prefix}{i:08d}@example.com',
+                first_name=f'Load{i}',
+                last_name='Customer',
+                password=_plan['password'],
+                date_joined=_plan['start'],
+            )
+            for i in range(first, first + count)
+        ])
+        Customer.objects.bulk_create([
+            Customer(
+                id=_plan['customer_base'] + i,
+                user_id=user.id,
+                phone=f'05{rng.randrange(10 ** 8):08d}',
+                address=f'{rng.randrange(1, 200)} Load Street, Block {rng.randrange(1, 50)}',
+                is_email_verified=rng.random() < 0.8,
+            )
+            for i, user in enumerate(users, first)
+        ])
+    return count
+
+
+def _orders_block(block):
+    number, first, count = block
+    rng = _rng('orders', number)
+    dishes, customers = _plan['dishes'], _plan['customers']
+    recent = _plan['now'] - timedelta(hours=3)
+
+    orders, baskets = [], []
+    for i in range(first, first + count):
+        placed = _random_moment(rng, _plan['days_cum'], _plan['hours_cum'])
+        # Basket: 1 + geometric number of distinct dishes, mostly single portions
+        size = 1 + int(math.log(1 - rng.random()) / math.log(0.55))
+        chosen = {bisect.bisect(_plan['popularity_cum'], rng.random() * _plan['popularity_cum'][-1])
+                  for _ in range(min(size, 8))}
+        basket = [(dishes[index], rng.choices((1, 2, 3), (0.75, 0.2, 0.05))[0]) for index in chosen]
+        total = sum(price * quantity for (_, price), quantity in basket)
+
+        if placed > recent:
+            status = rng.choice(ACTIVE_STATUSES)
+        else:
+            status = 'cancelled' if rng.random() < 0.06 else 'delivered'
+        orders.append(Order(
+            id=_plan['order_base'] + i,
+            customer_id=customers[rng.randrange(len(customers))],
+            order_date=placed,
+            status=status,
+            payment_status={'cancelled': 'refunded'}.get(status, 'paid'),
+            total_amount=total,
+            delivery_address='Load Street',
+            actual_delivery_time=placed + timedelta(minutes=rng.randint(25, 70)) if status == 'delivered' else None,
+        ))
+        baskets.append(basket)
+
+    with transaction.atomic():
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=order.id, dish_id=dish_id, quantity=quantity, price=price)
+            for order, basket in zip(orders, baskets)
+            for (dish_id, price), quantity in basket
+        ])
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=_plan['users'][order.customer_id],
+                title="تم توصيل طلبك" if order.status == 'delivered' else "تم استلام طلبك",
+                message=f"طلبك رقم #{order.id}",
+                notification_type='order_delivered' if order.status == 'delivered' else 'order_placed',
+                is_read=order.order_date < recent and rng.random() < 0.9,
+                created_at=order.actual_delivery_time or order.order_date,
+            )
+            for order in orders
+        ])
+    return count
+
+
+def _ratings_block(block):
+    number, _, count = block
+    rng = _rng('ratings', number)
+    dishes, customers = _plan['dishes'], _plan['customers']
+    ratings = [
+        DishRating(
+            dish_id=dishes[bisect.bisect(_plan['popularity_cum'], rng.random() * _plan['popularity_cum'][-1])][0],
+            customer_id=customers[rng.randrange(len(customers))],
+            rating=rng.choices(range(1, 6), RATING_WEIGHTS)[0],
+            created_at=_random_moment(rng, _plan['days_cum'], _plan['hours_cum']),
+        )
+        for _ in range(count)
+    ]
+    with transaction.atomic():
+        DishRating.objects.bulk_create(ratings)
+    return count
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate customers, orders, order items, ratings and notifications at load-test '
+        'volumes with realistic distributions, deterministically from --seed. '
+        f'Generated users log in with the password "{LOAD_PASSWORD}".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--ratings', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=90, help='Spread orders over this many past days')
+        parser.add_argument('--dishes', type=int, default=60, help='Menu size to create when there are no dishes')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of dish popularity')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--base-date', type=date.fromisoformat, default=None,
+            help='Day (YYYY-MM-DD) the generated history ends on; defaults to today',
+        )
+        parser.add_argument('--prefix', default='load', help='Username prefix of generated customers')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create transaction')
+        parser.add_argument('--workers', type=int, default=1, help='Processes writing blocks in parallel')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f"Users starting with '{options['prefix']}' exist already; use another --prefix")
+
+        rng = random.Random(f"{options['seed']}:plan")
+        # Whole days, so the same seed and base date give the same data whenever it runs
+        base_date = options['base_date'] or timezone.now().date()
+        now = datetime.combine(base_date, dt_time.min, tzinfo=dt_timezone.utc)
+        _plan.update(
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=make_password(LOAD_PASSWORD, salt=f"load{options['seed']}"),
+            now=now,
+            start=now - timedelta(days=options['days']),
+            hours_cum=_cumulative(HOURLY_WEIGHTS),
+            user_base=_next_id(User),
+            customer_base=_next_id(Customer),
+            order_base=_next_id(Order),
+            days_cum=_cumulative(
+                WEEKEND_FACTOR if (now - timedelta(days=options['days'] - day)).weekday() >= 4 else 1
+                for day in range(options['days'])
+            ),
+        )
+
+        started = time.perf_counter()
+        self._ensure_menu(options['dishes'], rng)
+        self._run('customers', _customers_block, _blocks(options['customers'], options['batch_size']), options)
+
+        # Customers in username order, so indexes mean the same thing in every run
+        rows = list(
+            Customer.objects
+            .filter(user__username__startswith=options['prefix'])
+            .order_by('user__username')
+            .values_list('id', 'user_id')
+        )
+        _plan['customers'] = [customer_id for customer_id, _ in rows]
+        _plan['users'] = dict(rows)
+        dishes = list(Dish.objects.filter(is_available=True).order_by('slug').values_list('id', 'price'))
+        if not dishes or not rows:
+            raise CommandError('Need at least one available dish and one customer')
+        rng.shuffle(dishes)
+        _plan['dishes'] = dishes
+        _plan['popularity_cum'] = _cumulative(1 / rank ** options['zipf'] for rank in range(1, len(dishes) + 1))
+
+        with _explicit_timestamps(Order._meta.get_field('order_date'),
+                                  Notification._meta.get_field('created_at'),
+                                  DishRating._meta.get_field('created_at')):
+            self._run('orders', _orders_block, _blocks(options['orders'], options['batch_size']), options)
+            self._run('ratings', _ratings_block, _blocks(options['ratings'], options['batch_size']), options)
+
+        # Explicit ids leave PostgreSQL's sequences behind (a no-op on SQLite)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Customer, Order]):
+                cursor.execute(sql)
+        # bulk_create skips the model saves that bump the menu version (new dishes, ratings)
+        bump_menu_version()
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s'))
+
+    def _ensure_menu(self, count, rng):
+        if Dish.objects.filter(is_available=True).exists():
+            return
+        categories = Category.objects.bulk_create([
+            Category(name=f'Load Category {i}', slug=f'load-category-{i}') for i in range(max(count // 10, 1))
+        ])
+        Dish.objects.bulk_create([
+            Dish(
+                name=f'Load Dish {i}',
+                slug=f'load-dish-{i}',
+                description='Generated for load testing',
+                price=Decimal(rng.randrange(500, 15000)) / 100,
+                category_id=categories[i % len(categories)].id,
+                stock_quantity=10 ** 6,
+                preparation_time=rng.randrange(5, 45),
+            )
+            for i in range(count)
+        ])
+        self.stdout.write(f'Created {count} dishes in {len(categories)} categories')
+
+    def _run(self, table, work, blocks, options):
+        started = time.perf_counter()
+        if options['workers'] > 1 and len(blocks) > 1:
+            # Workers fork with _plan and open their own connections
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+                rows = sum(pool.imap_unordered(work, blocks))
+        else:
+            rows = sum(map(work, blocks))
+        seconds = time.perf_counter() - started
+        self.stdout.write(f'{table}: {rows} rows in {seconds:.1f}s ({rows / seconds if seconds else 0:.0f} rows/s)')
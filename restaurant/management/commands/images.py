@@ -0,0 +1,256 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
+import os
+
+from django.core.management.base import BaseCommand
+from restaurant.conditional import menu_changed
+from restaurant.images import IMAGE_FORMATS, read_image, render_variants, resolve_image_url, save_variants
+from restaurant.models import Category, Dish
+
+
+MODELS = {
+    'dish': Dish,
+    'category': Category,
+}
+
+ACTIONS = ['verify', 're-path', 'regenerate-variants', 'find-orphans']
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def repath(name, upload_to):
+    """Normalise a legacy local path to ``<upload_to><filename>``."""
+    if upload_to in name:
+        filename = name.split(upload_to)[-1]
+    else:
+        filename = os.path.basename(name)
+
+    # Remove any Cloudinary versioning prefix, e.g. image/upload/v123/x.jpg -> x.jpg
+    if '/upload/' in filename:
+        filename = filename.split('/')[-1]
+
+    return f"{upload_to}{filename}"
+
+
+class Command(BaseCommand):
+    help = (
+        'Batch image maintenance for dishes and categories. Actions: verify (check files '
+        'exist and refresh stored URLs), re-path (normalise legacy local paths), '
+        'regenerate-variants (re-render responsive variants), find-orphans (list or delete '
+        'stored files no row references).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=ACTIONS)
+        parser.add_argument(
+            '--model',
+            choices=['dish', 'category', 'all'],
+            default='all',
+            help='Which images to process (default: all)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100,
+            help='Rows streamed, processed and written back per batch',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 4,
+            help='Pool size for storage I/O and rendering',
+        )
+        parser.add_argument(
+            '--executor',
+            choices=['thread', 'process'],
+            default='process',
+            help='Pool used to render variants (regenerate-variants only)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing to the database or storage',
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='find-orphans: delete the unreferenced files',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.dry_run = options['dry_run']
+        self.chunk_size = options['chunk_size']
+        self.written = 0
+
+        if options['model'] == 'all':
+            models = list(MODELS.values())
+        else:
+            models = [MODELS[options['model']]]
+
+        handler = getattr(self, '_' + options['action'].replace('-', '_'))
+
+        with ExitStack() as stack:
+            self.io_pool = stack.enter_context(ThreadPoolExecutor(max_workers=options['workers']))
+            if options['executor'] == 'process':
+                self.render_pool = stack.enter_context(ProcessPoolExecutor(max_workers=options['workers']))
+            else:
+                self.render_pool = stack.enter_context(ThreadPoolExecutor(max_workers=options['workers']))
+
+            for model in models:
+                handler(model)
+
+        # bulk_update skips the model saves that move the menu version; the
+        # cached menu responses carry the old URLs and srcsets until it moves
+        if self.written:
+            menu_changed()
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: no changes were written.'))
+
+    # ===== helpers =====
+
+    def _rows(self, model, queryset=None):
+        """Stream rows with an image in chunks, loading only the image columns."""
+        if queryset is None:
+            queryset = model.objects.all()
+        queryset = (
+            queryset
+            .exclude(image='')
+            .exclude(image__isnull=True)
+            .only('id', 'image', 'image_url', 'image_variants')
+            .order_by('pk')
+        )
+        return chunked(queryset.iterator(chunk_size=self.chunk_size), self.chunk_size)
+
+    def _write(self, model, objs, fields):
+        if objs and not self.dry_run:
+            model.objects.bulk_update(objs, fields, batch_size=self.chunk_size)
+            self.written += len(objs)
+
+    def _report(self, model, message):
+        self.stdout.write(self.style.SUCCESS(f'{model._meta.verbose_name_plural}: {message}'))
+
+    # ===== actions =====
+
+    def _verify(self, model):
+        checked = missing = stale = 0
+        for chunk in self._rows(model):
+            exists = self.io_pool.map(lambda obj: obj.image.storage.exists(obj.image.name), chunk)
+            changed = []
+            for obj, found in zip(chunk, exists):
+                checked += 1
+                if not found:
+                    missing += 1
+                    self.stdout.write(
+                        self.style.WARNING(f'{model.__name__} #{obj.pk}: missing file "{obj.image.name}"')
+                    )
+                url = resolve_image_url(obj.image)
+                if obj.image_url != url:
+                    obj.image_url = url
+                    changed.append(obj)
+            stale += len(changed)
+            self._write(model, changed, ['image_url'])
+
+        self._report(model, f'{checked} checked, {missing} missing, {stale} stale URLs refreshed')
+
+    def _re_path(self, model):
+        upload_to = model._meta.get_field('image').upload_to
+        updated = 0
+        for chunk in self._rows(model, model.objects.exclude(image__startswith='http')):
+            changed = []
+            for obj in chunk:
+                new_name = repath(obj.image.name, upload_to)
+                if new_name == obj.image.name:
+                    continue
+                if self.options['verbosity'] > 1:
+                    self.stdout.write(f'{model.__name__} #{obj.pk}: "{obj.image.name}" -> "{new_name}"')
+                obj.image.name = new_name
+                obj.image_url = resolve_image_url(obj.image)
+                changed.append(obj)
+            updated += len(changed)
+            self._write(model, changed, ['image', 'image_url'])
+
+        self._report(model, f'{updated} image paths updated')
+
+    def _read(self, obj):
+        try:
+            return read_image(obj.image)
+        except Exception as e:
+            self.stderr.write(f'{type(obj).__name__} #{obj.pk}: cannot read "{obj.image.name}": {e}')
+            return None
+
+    def _store(self, job):
+        obj, future = job
+        try:
+            rendered = future.result()
+            if self.dry_run:
+                return obj
+            obj.image_variants = save_variants(obj.image, rendered)
+            return obj
+        except Exception as e:
+            self.stderr.write(f'{type(obj).__name__} #{obj.pk}: cannot render "{obj.image.name}": {e}')
+            return None
+
+    def _regenerate_variants(self, model):
+        regenerated = failed = 0
+        for chunk in self._rows(model):
+            jobs = [
+                (obj, self.render_pool.submit(render_variants, data))
+                for obj, data in zip(chunk, self.io_pool.map(self._read, chunk))
+                if data is not None
+            ]
+            done = [obj for obj in self.io_pool.map(self._store, jobs) if obj is not None]
+            regenerated += len(done)
+            failed += len(chunk) - len(done)
+            self._write(model, done, ['image_variants'])
+
+        self._report(model, f'{regenerated} variant sets regenerated, {failed} failed')
+
+    def _walk(self, storage, path):
+        try:
+            directories, files = storage.listdir(path)
+        except FileNotFoundError:
+            return
+        for filename in files:
+            yield f'{path}/{filename}'
+        for directory in directories:
+            yield from self._walk(storage, f'{path}/{directory}')
+
+    def _find_orphans(self, model):
+        field = model._meta.get_field('image')
+        storage = field.storage
+
+        referenced = set()
+        rows = model.objects.exclude(image='').values_list('image', 'image_variants')
+        for name, variants in rows.iterator(chunk_size=self.chunk_size * 10):
+            if name:
+                referenced.add(name)
+            for entry in (variants or {}).values():
+                for ext in IMAGE_FORMATS:
+                    if ext in entry:
+                        referenced.add(entry[ext]['name'])
+
+        try:
+            orphans = [
+                name for name in self._walk(storage, field.upload_to.rstrip('/'))
+                if name not in referenced
+            ]
+        except NotImplementedError:
+            self.stdout.write(
+                self.style.WARNING(f'{storage.__class__.__name__} cannot list files; skipping orphan scan')
+            )
+            return
+
+        for name in orphans:
+            self.stdout.write(f'orphan: {name}')
+
+        if self.options['delete'] and not self.dry_run:
+            list(self.io_pool.map(storage.delete, orphans))
+            self._report(model, f'{len(orphans)} orphaned files deleted')
+        else:
+            self._report(model, f'{len(orphans)} orphaned files found')
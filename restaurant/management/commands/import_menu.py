@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from restaurant.menu_io import IMPORT_CHUNK_SIZE, KINDS, import_menu
+from restaurant.tabular import READERS, format_from_filename, undecodable_line
+
+
+class Command(BaseCommand):
+    help = (
+        'Create or update categories or dishes from a CSV or JSONL file, matched by slug. '
+        'Import categories before the dishes that reference them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(KINDS))
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=list(READERS),
+            help='File format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help='Rows validated and written per batch',
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or format_from_filename(options['path'])
+        if file_format is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        with open(options['path'], 'rb') as raw:
+            bad_line = undecodable_line(iter(lambda: raw.read(1 << 16), b''))
+        if bad_line is not None:
+            raise CommandError(f'The file is not UTF-8 encoded (first invalid byte on line {bad_line})')
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+            report = import_menu(options['kind'], lines, file_format, options['chunk_size'])
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if report.error_count > len(report.errors):
+            self.stderr.write(f'... {report.error_count - len(report.errors)} more rejected rows')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['kind']}: {report.created} created, {report.updated} updated, "
+            f"{report.error_count} rejected"
+        ))
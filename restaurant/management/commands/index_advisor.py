@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from restaurant.index_advisor import advise, build_migration, candidate_rows
+from restaurant.models import QueryFingerprint
+
+
+class Command(BaseCommand):
+    help = 'Propose indexes from the recorded query statistics (SLOW_QUERY_LOG) and optionally write the migration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-calls', type=int, default=1, help='Ignore fingerprints seen fewer times')
+        parser.add_argument('--limit', type=int, default=50, help='Most expensive fingerprints to consider')
+        parser.add_argument('--write', action='store_true', help='Write a migration creating the proposed indexes')
+        parser.add_argument('--name', default='advised_indexes', help='Name of the written migration')
+        parser.add_argument('--clear', action='store_true', help='Delete the recorded statistics afterwards')
+
+    def handle(self, *args, **options):
+        rows = candidate_rows(options['min_calls'], options['limit'])
+        if not rows:
+            self.stdout.write('No query statistics recorded yet (set SLOW_QUERY_LOG and let traffic run).')
+            return
+        proposals, advice = advise(rows)
+
+        for proposal in proposals:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{proposal.table} ({', '.join(proposal.columns)})"))
+            self.stdout.write(
+                f'  {len(proposal.fingerprints)} statements, {proposal.calls} calls, {proposal.total_ms:.1f} ms total'
+            )
+            for row in proposal.fingerprints:
+                self.stdout.write(
+                    f'  p50 {row.percentile(50):.2f} ms  p95 {row.percentile(95):.2f} ms  '
+                    f'p99 {row.percentile(99):.2f} ms  {row.sql[:150]}'
+                )
+            for line in proposal.plan:
+                self.stdout.write(f'  plan: {line}')
+            if proposal.fields:
+                index = proposal.index()
+                self.stdout.write(f"  Meta.indexes: models.Index(fields={proposal.fields!r}, name={index.name!r})")
+        for (table, predicate), note in advice.items():
+            self.stdout.write(self.style.WARNING(f'{table}.{predicate} {note}'))
+
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS('No missing indexes found.'))
+        elif options['write']:
+            writer = build_migration(proposals, name=options['name'])
+            with open(writer.path, 'w', encoding='utf-8') as migration:
+                migration.write(writer.as_string())
+            self.stdout.write(self.style.SUCCESS(
+                f'Wrote {writer.path}; add the Meta.indexes lines above to the models to keep them in step.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(proposals)} indexes proposed; --write creates the migration.'))
+
+        if options['clear']:
+            QueryFingerprint.objects.all().delete()
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from restaurant.utils import send_low_stock_digest
+
+
+class Command(BaseCommand):
+    help = 'Send one coalesced low stock notification per admin (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        reported = send_low_stock_digest()
+        if reported:
+            self.stdout.write(
+                self.style.SUCCESS(f'Low stock digest sent for {reported} dishes.')
+            )
+        else:
+            self.stdout.write('No new low stock dishes to report.')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from restaurant.sessions import extensions, sweep_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small indexed chunks (a gentler clearsessions; run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows per DELETE (default SESSION_SWEEP_CHUNK)')
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        extensions.flush()
+        deleted = sweep_expired(options['chunk_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired sessions.'))
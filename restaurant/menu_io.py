@@ -0,0 +1,242 @@
+"""
+Menu import and export (categories and dishes) as CSV or JSONL.
+
+Rows are keyed by ``slug``: importing a row whose slug exists updates that
+category or dish, otherwise it is created. An update writes only the columns
+the row gives (a missing column or an empty CSV cell leaves the stored value
+alone); a new row gets the defaults for what it leaves out. Dishes name their
+category by slug, so import categories first. Images are not part of the format; they are managed
+through the admin upload and the ``images`` command.
+
+Both directions stream. Exports read ``values_list`` rows with ``.iterator()``
+and encode them in batches; imports look up a chunk's slugs with one query,
+validate its rows (partially for existing ones), create the new rows with a
+single ``bulk_create(update_conflicts=True)`` (plain ``bulk_create`` where the
+database has no upsert) and update the existing ones with one ``bulk_update``
+per set of given columns. Invalid rows are skipped and reported with
+their line number; the rest are imported.
+"""
+import logging
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework.exceptions import ValidationError
+
+from .bulk import invalidate_menu_cache
+from .models import Category, Dish
+from .serializers import MenuCategoryRowSerializer, MenuDishRowSerializer
+from .tabular import READERS, WRITERS, chunked
+from .utils import send_low_stock_digest
+
+logger = logging.getLogger('restaurant')
+
+IMPORT_CHUNK_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+
+# Errors listed in a report; the total is always counted
+MAX_REPORTED_ERRORS = 100
+
+
+class MenuKind:
+    def __init__(self, model, row_serializer, columns, export_fields, extra_update_fields=(), current_fields=()):
+        self.model = model
+        self.row_serializer = row_serializer
+        self.columns = columns
+        self.export_fields = export_fields
+        self.extra_update_fields = list(extra_update_fields)
+        # Columns written when a new row races with another import of the same slug
+        self.update_fields = [column for column in columns if column != 'slug'] + self.extra_update_fields
+        # Stored values an update of some columns still needs (the low stock flag)
+        self.current_fields = ['id', 'slug'] + list(current_fields)
+
+
+KINDS = {
+    'categories': MenuKind(
+        Category, MenuCategoryRowSerializer,
+        columns=['slug', 'name', 'description', 'is_active'],
+        export_fields=['slug', 'name', 'description', 'is_active'],
+    ),
+    'dishes': MenuKind(
+        Dish, MenuDishRowSerializer,
+        columns=[
+            'slug', 'name', 'category', 'description', 'price', 'is_available',
+            'stock_quantity', 'low_stock_threshold', 'preparation_time',
+            'ingredients', 'calories', 'is_spicy', 'is_vegetarian',
+        ],
+        export_fields=[
+            'slug', 'name', 'category__slug', 'description', 'price', 'is_available',
+            'stock_quantity', 'low_stock_threshold', 'preparation_time',
+            'ingredients', 'calories', 'is_spicy', 'is_vegetarian',
+        ],
+        extra_update_fields=['is_low_stock', 'updated_at'],
+        current_fields=['category_id', 'stock_quantity', 'low_stock_threshold'],
+    ),
+}
+
+
+def export_menu(kind, file_format):
+    """Generator of text chunks for every row of ``kind``, in ``file_format``."""
+    kind = KINDS[kind]
+    rows = (
+        kind.model.objects
+        .order_by('pk')
+        .values_list(*kind.export_fields)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    _, _, writer = WRITERS[file_format]
+    return writer(kind.columns, rows)
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.category_ids = set()
+
+    def error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+
+def _record_slug(record):
+    return str(record.get('slug') or slugify(str(record.get('name') or ''))).strip()
+
+
+def _validate_chunk(kind, chunk, existing, report):
+    """
+    Validated rows of ``chunk`` by slug; a slug repeated in the chunk keeps its last row.
+
+    Rows for ``existing`` slugs are validated partially: they hold only the
+    fields the row gives, without the serializer's defaults.
+    """
+    rows = {}
+    # One serializer per mode validates every row (as ListSerializer does): building its fields is the costly part
+    validators = {False: kind.row_serializer(), True: kind.row_serializer(partial=True)}
+    for line, record, error in chunk:
+        if error:
+            report.error(line, error)
+            continue
+        slug = _record_slug(record)
+        if not slug:
+            report.error(line, {'slug': ['Required when the name has no latin characters']})
+            continue
+        try:
+            data = dict(validators[slug in existing].run_validation(record))
+        except ValidationError as e:
+            report.error(line, e.detail)
+            continue
+        data['slug'] = slug
+        rows[slug] = (line, data)
+    return rows
+
+
+def _resolve_categories(rows, report):
+    """Swap dish rows' category slugs for ids (one query); rows with unknown categories are dropped."""
+    category_ids = dict(
+        Category.objects
+        .filter(slug__in={data['category'] for _, data in rows.values() if 'category' in data})
+        .values_list('slug', 'id')
+    )
+    for slug, (line, data) in list(rows.items()):
+        if 'category' not in data:
+            continue
+        category_id = category_ids.get(data.pop('category'))
+        if category_id is None:
+            report.error(line, {'category': ['No category with this slug']})
+            del rows[slug]
+        else:
+            data['category_id'] = category_id
+            report.category_ids.add(category_id)
+
+
+def _create(kind, objects):
+    model = kind.model
+    if connections[router.db_for_write(model)].features.supports_update_conflicts_with_target:
+        # A row created by another import since the lookup is overwritten, not an error
+        model.objects.bulk_create(
+            objects, update_conflicts=True, unique_fields=['slug'], update_fields=kind.update_fields
+        )
+    else:
+        model.objects.bulk_create(objects)
+
+
+def _update(kind, objects):
+    """``bulk_update`` each group of ``(obj, given fields)`` pairs that give the same columns."""
+    groups = {}
+    for obj, fields in objects:
+        groups.setdefault(tuple(sorted(fields)), []).append(obj)
+    for fields, group in groups.items():
+        fields = list(fields) + kind.extra_update_fields
+        if fields:
+            kind.model.objects.bulk_update(group, fields)
+
+
+def _import_chunk(kind, chunk, report):
+    slugs = {_record_slug(record) for _, record, error in chunk if not error}
+    existing = kind.model.objects.only(*kind.current_fields).in_bulk(list(slugs - {''}), field_name='slug')
+    rows = _validate_chunk(kind, chunk, existing, report)
+    if kind.model is Dish:
+        _resolve_categories(rows, report)
+    if not rows:
+        return
+
+    now = timezone.now()
+    created, updated = [], []
+    for slug, (_, data) in rows.items():
+        obj = existing.get(slug)
+        if obj is None:
+            obj = kind.model(**data)
+            created.append(obj)
+        else:
+            if kind.model is Dish:
+                # The dish leaves its current category's cached counts too
+                report.category_ids.add(obj.category_id)
+            for field, value in data.items():
+                setattr(obj, field, value)
+            updated.append((obj, [field for field in data if field != 'slug']))
+        if kind.model is Dish:
+            # Bulk writes skip save(): keep the stored low stock flag and updated_at right here
+            obj.is_low_stock = obj.stock_quantity <= obj.low_stock_threshold
+            obj.updated_at = now
+
+    with transaction.atomic():
+        _create(kind, created)
+        _update(kind, updated)
+        if kind.model is Dish:
+            # Restocked dishes may alert again (the flag is cleared the same way by Dish.save)
+            Dish.objects.filter(slug__in=list(rows), is_low_stock=False).exclude(
+                low_stock_alerted_at=None
+            ).update(low_stock_alerted_at=None)
+
+    report.updated += len(updated)
+    report.created += len(created)
+
+
+def import_menu(kind, lines, file_format, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import ``kind`` rows from an iterable of text ``lines``; returns an ImportReport."""
+    menu_kind = KINDS[kind]
+    report = ImportReport()
+    for chunk in chunked(READERS[file_format](lines), chunk_size):
+        _import_chunk(menu_kind, chunk, report)
+
+    invalidate_menu_cache(report.category_ids, [])
+    if menu_kind.model is Dish and report.created + report.updated:
+        send_low_stock_digest()
+
+    logger.info(
+        "Menu import (%s): %d created, %d updated, %d rejected",
+        kind, report.created, report.updated, report.error_count,
+    )
+    return report
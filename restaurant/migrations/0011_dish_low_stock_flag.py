@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-18 23:57
+
+from django.db import migrations, models
+
+
+def backfill_low_stock_flag(apps, schema_editor):
+    Dish = apps.get_model('restaurant', 'Dish')
+    Dish.objects.filter(stock_quantity__lte=models.F('low_stock_threshold')).update(is_low_stock=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0010_make_contact_subject_optional'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='is_low_stock',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Low Stock'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='low_stock_alerted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Low Stock Alerted At'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(condition=models.Q(('is_low_stock', True)), fields=['low_stock_alerted_at'], name='dish_low_stock_idx'),
+        ),
+        migrations.RunPython(backfill_low_stock_flag, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.2 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='image_url',
+            field=models.CharField(blank=True, editable=False, max_length=500, verbose_name='Image URL'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='image_url',
+            field=models.CharField(blank=True, editable=False, max_length=500, verbose_name='Image URL'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-19 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0013_image_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='estimated_ready_time',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Estimated Ready Time'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.2 on 2026-10-19 00:26
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def dedupe_slugs(apps, schema_editor):
+    """Give blank or repeated slugs a unique value before the constraint is added."""
+    for model_name in ('Category', 'Dish'):
+        model = apps.get_model('restaurant', model_name)
+        seen = set()
+        for pk, name, slug in model.objects.order_by('pk').values_list('pk', 'name', 'slug'):
+            base = slug or slugify(name) or model_name.lower()
+            unique, n = base, 2
+            while unique in seen:
+                unique, n = f'{base}-{n}', n + 1
+            seen.add(unique)
+            if unique != slug:
+                model.objects.filter(pk=pk).update(slug=unique)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0014_order_estimated_ready_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='category',
+            name='restaurant__slug_9b53c7_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='dish',
+            name='restaurant__slug_f1731b_idx',
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(blank=True, unique=True, verbose_name='Slug'),
+        ),
+        migrations.AlterField(
+            model_name='dish',
+            name='slug',
+            field=models.SlugField(blank=True, unique=True, verbose_name='Slug'),
+        ),
+    ]
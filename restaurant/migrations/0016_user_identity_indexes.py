@@ -0,0 +1,24 @@
+from django.db import migrations
+
+# auth_user belongs to django.contrib.auth, so its expression indexes are
+# created here. restaurant/login.py filters on exactly these expressions.
+INDEXES = [
+    ('restaurant_user_email_lower', 'LOWER(email)'),
+    ('restaurant_user_username_lower', 'LOWER(username)'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('restaurant', '0015_unique_slugs'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f'CREATE INDEX IF NOT EXISTS {name} ON auth_user ({expression})',
+            f'DROP INDEX IF EXISTS {name}',
+        )
+        for name, expression in INDEXES
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.2 on 2026-10-19 01:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0016_user_identity_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('method', models.CharField(max_length=10, verbose_name='Method')),
+                ('path', models.CharField(max_length=500, verbose_name='Path')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Status Code')),
+                ('duration_ms', models.FloatField(verbose_name='Duration (ms)')),
+                ('report', models.JSONField(default=dict, verbose_name='Report')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Requested By')),
+            ],
+            options={
+                'verbose_name': 'Profile Report',
+                'verbose_name_plural': 'Profile Reports',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.2 on 2026-10-19 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0017_profile_report'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=32, unique=True, verbose_name='Fingerprint')),
+                ('alias', models.CharField(max_length=100, verbose_name='Database')),
+                ('sql', models.TextField(verbose_name='Normalized SQL')),
+                ('calls', models.PositiveBigIntegerField(default=0, verbose_name='Calls')),
+                ('slow_calls', models.PositiveBigIntegerField(default=0, verbose_name='Slow Calls')),
+                ('total_ms', models.FloatField(default=0, verbose_name='Total Time (ms)')),
+                ('max_ms', models.FloatField(default=0, verbose_name='Max Time (ms)')),
+                ('histogram', models.JSONField(default=dict, verbose_name='Latency Histogram')),
+                ('plan', models.JSONField(blank=True, default=list, verbose_name='Plan')),
+                ('plan_sql', models.TextField(blank=True, verbose_name='Explained SQL')),
+                ('first_seen', models.DateTimeField(verbose_name='First Seen')),
+                ('last_seen', models.DateTimeField(verbose_name='Last Seen')),
+            ],
+            options={
+                'verbose_name': 'Query Fingerprint',
+                'verbose_name_plural': 'Query Fingerprints',
+                'ordering': ['-total_ms'],
+            },
+        ),
+    ]
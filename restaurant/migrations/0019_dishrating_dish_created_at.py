@@ -0,0 +1,17 @@
+# Generated by Django 5.2.2 on 2026-10-19 01:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0018_query_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dishrating',
+            index=models.Index(fields=['dish', 'created_at'], name='restaurant__dish_id_a8a7ad_idx'),
+        ),
+    ]
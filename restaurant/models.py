@@ -1,12 +1,30 @@
+import hashlib
+
 from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
 import logging
 
+from .conditional import menu_changed
+from .images import sync_image_url
+from .log import event_logger
+
 # إعداد الـ logger
 logger = logging.getLogger('restaurant')
+# Per-save events: sampled (settings.LOG_SAMPLE_RATES) and formatted only when kept
+save_log = event_logger('restaurant.models')
+
+def unique_slug(model, value, pk=None):
+    """``slugify(value)``, suffixed with -2, -3... if another row of ``model`` already uses it."""
+    base = slugify(value) or model._meta.model_name
+    slug, n = base, 2
+    while model.objects.filter(slug=slug).exclude(pk=pk).exists():
+        slug, n = f'{base}-{n}', n + 1
+    return slug
 
 # Admin Profile for managing admin users
 class AdminProfile(models.Model):
@@ -22,16 +40,82 @@ class AdminProfile(models.Model):
     def __str__(self):
         return f"Admin: {self.user.username} ({self.admin_email})"
     
+    @staticmethod
+    def _role_cache_key(email):
+        return f'admin_role_{hashlib.md5(email.encode()).hexdigest()}'
+
+    @classmethod
+    def role_for_email(cls, email):
+        """
+        ``(is_admin, is_super_admin)`` for ``email``, cached per address.
+
+        Every admin API request and user-type check resolves the role, so it is
+        read from the cache and only queried after an AdminProfile change or
+        ADMIN_ROLE_CACHE_TIMEOUT.
+        """
+        if not email:
+            return (False, False)
+        from django.conf import settings
+        from django.core.cache import cache
+        key = cls._role_cache_key(email)
+        role = cache.get(key)
+        if role is None:
+            profile = cls.objects.filter(admin_email=email).only('is_super_admin').first()
+            role = (profile is not None, bool(profile and profile.is_super_admin))
+            cache.set(key, role, settings.ADMIN_ROLE_CACHE_TIMEOUT)
+        return role
+
+    @classmethod
+    async def arole_for_email(cls, email):
+        if not email:
+            return (False, False)
+        from django.conf import settings
+        from django.core.cache import cache
+        key = cls._role_cache_key(email)
+        role = await cache.aget(key)
+        if role is None:
+            profile = await cls.objects.filter(admin_email=email).only('is_super_admin').afirst()
+            role = (profile is not None, bool(profile and profile.is_super_admin))
+            await cache.aset(key, role, settings.ADMIN_ROLE_CACHE_TIMEOUT)
+        return role
+
+    @classmethod
+    def role_for_user(cls, user):
+        """``role_for_email`` resolved once per user object, i.e. once per request."""
+        role = getattr(user, '_admin_role', None)
+        if role is None:
+            role = user._admin_role = cls.role_for_email(user.email)
+        return role
+
     @classmethod
     def is_admin_email(cls, email):
         """Check if email belongs to an admin"""
-        return cls.objects.filter(admin_email=email).exists()
+        return cls.role_for_email(email)[0]
+
+    def clear_role_cache(self, *emails):
+        from django.core.cache import cache
+        cache.delete_many([self._role_cache_key(email) for email in {self.admin_email, *emails} if email])
+
+    def save(self, *args, **kwargs):
+        # The old address loses the role when admin_email changes
+        previous = type(self).objects.filter(pk=self.pk).values_list('admin_email', flat=True).first() if self.pk else None
+        super().save(*args, **kwargs)
+        self.clear_role_cache(previous)
+
+
+@receiver(post_delete, sender=AdminProfile)
+def clear_deleted_admin_role(sender, instance, **kwargs):
+    # Also runs for queryset deletes and for cascades from a deleted User
+    instance.clear_role_cache()
 
 class Category(models.Model):
     name = models.CharField(max_length=100, verbose_name="Category Name")
-    slug = models.SlugField(blank=True, verbose_name="Slug")
+    # Natural key used by menu import/export (menu_io.py)
+    slug = models.SlugField(unique=True, blank=True, verbose_name="Slug")
     description = models.TextField(blank=True, verbose_name="Description")
     image = models.ImageField(upload_to='categories/', blank=True, null=True, verbose_name="Category Image")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Image Variants")
+    image_url = models.CharField(max_length=500, blank=True, editable=False, verbose_name="Image URL")
     is_active = models.BooleanField(default=True, verbose_name="Active")
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -43,14 +127,20 @@ class Category(models.Model):
         indexes = [
             models.Index(fields=['created_at']),
             models.Index(fields=['is_active']),
-            models.Index(fields=['slug']),
         ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
-        logger.info(f"Category saved: {self.name}")
+            self.slug = unique_slug(Category, self.name, self.pk)
+        kwargs['update_fields'] = sync_image_url(self, kwargs.get('update_fields'))
+        save_log.debug('category_saved', id=self.pk, slug=self.slug)
         super().save(*args, **kwargs)
+        menu_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        menu_changed()
+        return result
 
     def clean(self):
         if Category.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
@@ -61,15 +151,20 @@ class Category(models.Model):
 
 class Dish(models.Model):
     name = models.CharField(max_length=100, verbose_name="Dish Name")
-    slug = models.SlugField(blank=True, verbose_name="Slug")
+    slug = models.SlugField(unique=True, blank=True, verbose_name="Slug")
     description = models.TextField(verbose_name="Description")
     price = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="Price")
     category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Category")
     image = models.ImageField(upload_to='dishes/', blank=True, null=True, verbose_name="Dish Image")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Image Variants")
+    image_url = models.CharField(max_length=500, blank=True, editable=False, verbose_name="Image URL")
     is_available = models.BooleanField(default=True, verbose_name="Available")
     # إضافة Stock Management
     stock_quantity = models.PositiveIntegerField(default=0, verbose_name="Stock Quantity")
     low_stock_threshold = models.PositiveIntegerField(default=5, verbose_name="Low Stock Alert")
+    # مخزن ومفهرس بدلاً من مقارنة stock_quantity <= low_stock_threshold في كل استعلام
+    is_low_stock = models.BooleanField(default=False, editable=False, verbose_name="Low Stock")
+    low_stock_alerted_at = models.DateTimeField(blank=True, null=True, editable=False, verbose_name="Low Stock Alerted At")
     preparation_time = models.PositiveIntegerField(default=15, verbose_name="Preparation Time (minutes)")
     ingredients = models.TextField(blank=True, verbose_name="Ingredients")
     calories = models.PositiveIntegerField(blank=True, null=True, verbose_name="Calories")
@@ -87,8 +182,12 @@ class Dish(models.Model):
             models.Index(fields=['category', 'is_available']),
             models.Index(fields=['created_at']),
             models.Index(fields=['price']),
-            models.Index(fields=['slug']),
             models.Index(fields=['stock_quantity']),
+            models.Index(
+                fields=['low_stock_alerted_at'],
+                condition=models.Q(is_low_stock=True),
+                name='dish_low_stock_idx',
+            ),
         ]
 
     def _clear_category_cache(self):
@@ -97,20 +196,55 @@ class Dish(models.Model):
         cache.delete(f'category_dishes_count_{self.category.id}')
         cache.delete(f'category_available_dishes_count_{self.category.id}')
 
+    def _sync_low_stock_flag(self, update_fields=None, force_insert=False):
+        """
+        Keep the stored low stock flag in line with the stock columns.
+
+        ``low_stock_alerted_at`` is owned by ``send_low_stock_digest``; it is only
+        written here to clear it when the dish is restocked, so a stale instance
+        can never wipe the stamp and trigger a duplicate alert. A plain save of a
+        stored row becomes an update of every other field; inserts (new rows,
+        rows deleted through the instance, ``force_insert``) are left alone.
+        """
+        self.is_low_stock = self.stock_quantity <= self.low_stock_threshold
+        if not self.is_low_stock:
+            self.low_stock_alerted_at = None
+
+        if update_fields is None:
+            if self._state.adding or self.pk is None or force_insert or not self.is_low_stock:
+                return None
+            return [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'low_stock_alerted_at'
+            ]
+
+        update_fields = set(update_fields)
+        if {'stock_quantity', 'low_stock_threshold'} & update_fields:
+            update_fields.add('is_low_stock')
+            if not self.is_low_stock:
+                update_fields.add('low_stock_alerted_at')
+        return update_fields
+
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
-        
+            self.slug = unique_slug(Dish, self.name, self.pk)
+
+        kwargs['update_fields'] = self._sync_low_stock_flag(kwargs.get('update_fields'), kwargs.get('force_insert', False))
+        kwargs['update_fields'] = sync_image_url(self, kwargs['update_fields'])
+
         # Clear cache on save
         self._clear_category_cache()
 
-        logger.info(f"Dish saved: {self.name} - Stock: {self.stock_quantity}")
+        save_log.debug('dish_saved', id=self.pk, slug=self.slug, stock=self.stock_quantity)
         super().save(*args, **kwargs)
+        menu_changed()
 
     def delete(self, *args, **kwargs):
         """Clear cache on delete."""
         self._clear_category_cache()
-        super().delete(*args, **kwargs)
+        result = super().delete(*args, **kwargs)
+        menu_changed()
+        return result
 
     def clean(self):
         if self.pk is None and not hasattr(self, 'category'):
@@ -123,25 +257,30 @@ class Dish(models.Model):
         if self.price <= 0:
             raise ValidationError({'price': 'Price must be greater than 0'})
 
-    @property
-    def is_low_stock(self):
-        """Check if dish is low on stock"""
-        return self.stock_quantity <= self.low_stock_threshold
-
     @property
     def is_in_stock(self):
         """Check if dish is in stock"""
         return self.stock_quantity > 0
 
     def reduce_stock(self, quantity):
-        """Reduce stock when order is placed"""
+        """
+        Reduce stock when order is placed.
+
+        Only the stock columns are written, and the menu version moves only
+        when the dish runs out or turns low on stock: an order must not throw
+        away every rendered menu response. Cached menus can show an older
+        count until the next menu change; orders always check the row.
+        """
         if self.stock_quantity >= quantity:
+            shown = (self.is_in_stock, self.is_low_stock)
             self.stock_quantity -= quantity
-            self.save()
-            logger.info(f"Stock reduced for {self.name}: {quantity} units")
+            super().save(update_fields=self._sync_low_stock_flag(['stock_quantity', 'updated_at']))
+            if (self.is_in_stock, self.is_low_stock) != shown:
+                menu_changed()
+            save_log.info('stock_reduced', dish=self.pk, quantity=quantity, stock=self.stock_quantity)
             return True
         else:
-            logger.warning(f"Insufficient stock for {self.name}. Available: {self.stock_quantity}, Requested: {quantity}")
+            save_log.warning('insufficient_stock', dish=self.pk, available=self.stock_quantity, requested=quantity)
             return False
 
     def __str__(self):
@@ -194,6 +333,7 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Total Amount")
     delivery_address = models.TextField(verbose_name="Delivery Address")
     special_instructions = models.TextField(blank=True, verbose_name="Special Instructions")
+    estimated_ready_time = models.DateTimeField(blank=True, null=True, verbose_name="Estimated Ready Time")
     estimated_delivery_time = models.DateTimeField(blank=True, null=True, verbose_name="Estimated Delivery Time")
     actual_delivery_time = models.DateTimeField(blank=True, null=True, verbose_name="Actual Delivery Time")
 
@@ -210,7 +350,8 @@ class Order(models.Model):
         ]
 
     def save(self, *args, **kwargs):
-        logger.info(f"Order saved: #{self.id} - Customer: {self.customer} - Total: ${self.total_amount}")
+        # customer_id, not customer: formatting must not cost a query
+        save_log.debug('order_saved', id=self.pk, customer=self.customer_id, total=self.total_amount, status=self.status)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -248,10 +389,30 @@ class DishRating(models.Model):
         verbose_name = "Dish Rating"
         verbose_name_plural = "Dish Ratings"
         # Removed unique_together to allow multiple ratings from same customer
+        indexes = [
+            # The reviews action: a dish's ratings, newest first, without a sort
+            models.Index(fields=['dish', 'created_at'], name='restaurant__dish_id_a8a7ad_idx'),
+        ]
 
     def __str__(self):
         return f"{self.dish.name} - {self.rating} stars"
 
+    # Ratings are part of the dish bodies (average_rating, rating_count)
+    def _clear_rating_count_cache(self):
+        from django.core.cache import cache
+        cache.delete(f'dish_ratings_count_{self.dish_id}')
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._clear_rating_count_cache()
+        menu_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._clear_rating_count_cache()
+        menu_changed()
+        return result
+
 class Restaurant(models.Model):
     name = models.CharField(max_length=100, verbose_name="Restaurant Name")
     address = models.TextField(verbose_name="Address")
@@ -270,6 +431,15 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        menu_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        menu_changed()
+        return result
+
 # MenuItem - keeping for backward compatibility, now points to Dish
 MenuItem = Dish
 
@@ -342,3 +512,55 @@ class ContactMessage(models.Model):
 
     def __str__(self):
         return f'Message from {self.name} re: "{self.subject}"'
+
+
+class ProfileReport(models.Model):
+    """A staff-requested profile of one request (restaurant/profiling.py)."""
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Requested By")
+    method = models.CharField(max_length=10, verbose_name="Method")
+    path = models.CharField(max_length=500, verbose_name="Path")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Status Code")
+    duration_ms = models.FloatField(verbose_name="Duration (ms)")
+    report = models.JSONField(default=dict, verbose_name="Report")
+
+    class Meta:
+        verbose_name = "Profile Report"
+        verbose_name_plural = "Profile Reports"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class QueryFingerprint(models.Model):
+    """Statistics of one normalized SQL statement (restaurant/slow_queries.py)."""
+    fingerprint = models.CharField(max_length=32, unique=True, verbose_name="Fingerprint")
+    alias = models.CharField(max_length=100, verbose_name="Database")
+    sql = models.TextField(verbose_name="Normalized SQL")
+    calls = models.PositiveBigIntegerField(default=0, verbose_name="Calls")
+    slow_calls = models.PositiveBigIntegerField(default=0, verbose_name="Slow Calls")
+    total_ms = models.FloatField(default=0, verbose_name="Total Time (ms)")
+    max_ms = models.FloatField(default=0, verbose_name="Max Time (ms)")
+    # {bucket index: calls}, see slow_queries.bucket()
+    histogram = models.JSONField(default=dict, verbose_name="Latency Histogram")
+    plan = models.JSONField(default=list, blank=True, verbose_name="Plan")
+    plan_sql = models.TextField(blank=True, verbose_name="Explained SQL")
+    first_seen = models.DateTimeField(verbose_name="First Seen")
+    last_seen = models.DateTimeField(verbose_name="Last Seen")
+
+    class Meta:
+        verbose_name = "Query Fingerprint"
+        verbose_name_plural = "Query Fingerprints"
+        ordering = ['-total_ms']
+
+    def __str__(self):
+        return f"{self.sql[:80]} ({self.calls} calls)"
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0.0
+
+    def percentile(self, p):
+        from .slow_queries import percentile
+        return percentile(self.histogram, p)
@@ -0,0 +1,315 @@
+"""
+Opt-in profiling of single requests for staff.
+
+A request carrying ``X-Profile: 1`` or ``?_profile=1`` from a staff user (Django
+staff, superuser or restaurant admin; X-Session-Key sessions count) runs with
+  * cProfile over the whole handler, kept as the top PROFILE_TOP_FUNCTIONS
+    entries by cumulative time;
+  * every SQL statement with its duration, and the database's plan (EXPLAIN
+    QUERY PLAN on SQLite, EXPLAIN elsewhere) for the PROFILE_EXPLAIN_LIMIT
+    statements costing the most in total;
+  * every call to the default cache with its key, duration and hit or miss;
+  * the time spent producing serializer output (``.data`` and the compiled
+    serializers), taken from the profile.
+The report is saved as a ProfileReport (the newest PROFILE_REPORTS_KEEP are
+kept), its id is sent back in ``X-Profile-Id`` and it is read through
+/api/admin/profiles/. Requests without the header or parameter pay one
+dictionary lookup and one substring test; profiling requests from anyone else
+are served normally and not profiled. cProfile only sees the thread that
+enabled it, so under ASGI there are two profiles, merged in the report: one of
+the event loop thread (async views; it can include other requests' coroutines
+running meanwhile) and one of the request's sync thread, where the DRF views,
+serializers and ORM run, enabled there through ``sync_to_async`` as the SQL
+hooks are. Session keys in cache keys are replaced by a digest.
+"""
+import contextvars
+import cProfile
+import hashlib
+import io
+import logging
+import pstats
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_PROFILE'
+PARAM = '_profile'
+
+# Statements and cache calls kept in full per report
+MAX_EVENTS = 500
+
+CACHE_METHODS = ('get', 'set', 'add', 'delete', 'get_many', 'set_many', 'delete_many', 'incr', 'decr', 'has_key')
+
+_recording = contextvars.ContextVar('profiling_recording', default=None)
+
+
+def requested(request):
+    if request.META.get(HEADER, '') not in ('', '0'):
+        return True
+    return PARAM in request.META.get('QUERY_STRING', '') and request.GET.get(PARAM, '') not in ('', '0')
+
+
+def profiling_user(request):
+    """The staff user behind ``request`` (session cookie or X-Session-Key), or None."""
+    from django.contrib.auth.models import User
+    from .models import AdminProfile
+    from .sessions import SessionStore
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        session_key = request.headers.get('X-Session-Key')
+        user_id = SessionStore(session_key).get('_auth_user_id') if session_key else None
+        user = User.objects.filter(pk=user_id, is_active=True).first() if user_id else None
+    if user is None:
+        return None
+    if user.is_staff or user.is_superuser or AdminProfile.role_for_user(user)[0]:
+        return user
+    return None
+
+
+def _cache_key(key):
+    """``key`` as shown in a report: a session cache key is a credential, so only its digest is kept."""
+    from .sessions import KEY_PREFIX
+
+    key = str(key)
+    if key.startswith(f'{KEY_PREFIX}:'):
+        digest = hashlib.sha256(key.encode()).hexdigest()[:12]
+        return f'{KEY_PREFIX}:<redacted {digest}>'
+    return key
+
+
+def _serializer_codes():
+    from rest_framework.serializers import BaseSerializer
+    from .compiled import CompiledSerializer
+
+    return [
+        BaseSerializer.data.fget.__code__,
+        CompiledSerializer.many.__code__,
+        CompiledSerializer.one.__code__,
+    ]
+
+
+class Recording:
+    """What one profiled request did; SQL and cache calls go through hooks."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        # The request's sync thread under ASGI
+        self.sync_profiler = cProfile.Profile()
+        self.statements = []
+        self.cache_calls = []
+        self._sql_hooks = ExitStack()
+        self._token = None
+
+    def record_sql(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': params if not many else None,
+                'ms': (time.perf_counter() - start) * 1e3,
+            })
+
+    def start_sql(self):
+        for connection in connections.all():
+            self._sql_hooks.enter_context(connection.execute_wrapper(self.record_sql))
+
+    def stop_sql(self):
+        self._sql_hooks.close()
+
+    def start_sync(self):
+        """SQL hooks and profiling in the request's sync thread (ASGI)."""
+        self.start_sql()
+        self.sync_profiler.enable()
+
+    def stop_sync(self):
+        self.sync_profiler.disable()
+        self.stop_sql()
+
+    def start(self):
+        self._token = _recording.set(self)
+        self._wrap_cache()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self._unwrap_cache()
+        _recording.reset(self._token)
+
+    def _wrap_cache(self):
+        backend = caches['default']
+        self._cache_backend = backend
+        for name in CACHE_METHODS:
+            method = getattr(backend, name)
+
+            def wrapper(*args, _method=method, _name=name, **kwargs):
+                recording = _recording.get()
+                start = time.perf_counter()
+                result = _method(*args, **kwargs)
+                if recording is not None:
+                    recording.cache_calls.append({
+                        'op': _name,
+                        'key': _cache_key(args[0]) if args else '',
+                        'ms': (time.perf_counter() - start) * 1e3,
+                        'hit': result is not None if _name == 'get' else None,
+                    })
+                return result
+            setattr(backend, name, wrapper)
+
+    def _unwrap_cache(self):
+        for name in CACHE_METHODS:
+            self._cache_backend.__dict__.pop(name, None)
+
+    def explain(self):
+        """Plans for the SELECTs that cost the most in total."""
+        groups = {}
+        for statement in self.statements:
+            if statement['sql'].lstrip()[:6].upper() != 'SELECT':
+                continue
+            group = groups.setdefault((statement['alias'], statement['sql']), {'count': 0, 'total_ms': 0.0, 'params': statement['params']})
+            group['count'] += 1
+            group['total_ms'] += statement['ms']
+        ranked = sorted(groups.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        plans = []
+        for (alias, sql), group in ranked[:settings.PROFILE_EXPLAIN_LIMIT]:
+            plans.append({
+                'alias': alias, 'sql': sql, 'count': group['count'], 'total_ms': round(group['total_ms'], 3),
+                'plan': explain(alias, sql, group['params']),
+            })
+        return plans
+
+    def stats(self):
+        stats = None
+        for profiler in (self.profiler, self.sync_profiler):
+            profiler.create_stats()
+            if not profiler.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+        return stats or pstats.Stats()
+
+    def report(self, request, response, duration_ms):
+        stats = self.stats()
+        codes = {(code.co_filename, code.co_firstlineno, code.co_name) for code in _serializer_codes()}
+        serializer_ms = sum(entry[3] for key, entry in stats.stats.items() if key in codes) * 1e3
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats('cumulative').print_stats(settings.PROFILE_TOP_FUNCTIONS)
+        cache_hits = [call['hit'] for call in self.cache_calls if call['hit'] is not None]
+        return {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status_code': response.status_code,
+            'duration_ms': round(duration_ms, 3),
+            'serializer_ms': round(serializer_ms, 3),
+            'sql': {
+                'count': len(self.statements),
+                'total_ms': round(sum(s['ms'] for s in self.statements), 3),
+                'statements': [
+                    {'alias': s['alias'], 'sql': s['sql'], 'ms': round(s['ms'], 3)} for s in self.statements[:MAX_EVENTS]
+                ],
+            },
+            'explain': self.explain(),
+            'cache': {
+                'count': len(self.cache_calls),
+                'total_ms': round(sum(c['ms'] for c in self.cache_calls), 3),
+                'hits': cache_hits.count(True),
+                'misses': cache_hits.count(False),
+                'calls': [dict(call, ms=round(call['ms'], 3)) for call in self.cache_calls[:MAX_EVENTS]],
+            },
+            'profile': text.getvalue(),
+        }
+
+
+def explain(alias, sql, params):
+    connection = connections[alias]
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as exc:
+        return [f'EXPLAIN failed: {exc}']
+
+
+def save_report(request, response, user, recording, duration_ms):
+    from .models import ProfileReport
+
+    try:
+        report = recording.report(request, response, duration_ms)
+        profile = ProfileReport.objects.create(
+            user=user, method=request.method, path=report['path'][:500], status_code=response.status_code,
+            duration_ms=duration_ms, report=report,
+        )
+    except Exception:
+        # A broken report must not cost the request its response
+        logger.exception("Could not save the profile of %s %s", request.method, request.path)
+        return response
+    stale = ProfileReport.objects.values_list('pk', flat=True)[settings.PROFILE_REPORTS_KEEP:]
+    ProfileReport.objects.filter(pk__in=list(stale)).delete()
+    response['X-Profile-Id'] = str(profile.pk)
+    logger.info("Profiled %s %s: %.1f ms, report %s", request.method, report['path'], duration_ms, profile.pk)
+    return response
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not requested(request):
+            return self.get_response(request)
+        user = profiling_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        recording = Recording()
+        recording.start_sql()
+        recording.start()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1e3
+            recording.stop()
+            recording.stop_sql()
+        return save_report(request, response, user, recording, duration_ms)
+
+    async def __acall__(self, request):
+        if not requested(request):
+            return await self.get_response(request)
+        user = await sync_to_async(profiling_user)(request)
+        if user is None:
+            return await self.get_response(request)
+
+        # The ORM and the DRF views run in the request's sync thread: hook and profile it there too
+        recording = Recording()
+        await sync_to_async(recording.start_sync)()
+        recording.start()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1e3
+            recording.stop()
+            await sync_to_async(recording.stop_sync)()
+        return await sync_to_async(save_report)(request, response, user, recording, duration_ms)
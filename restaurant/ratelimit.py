@@ -0,0 +1,230 @@
+"""
+Request rate limits for the login, registration, contact and checkout
+endpoints.
+
+``@rate_limit('login-ip', key=client_ip)`` goes outermost on a view, so an
+over-limit request gets its 429 before DRF authentication, the session lookup,
+any query or any password hash. Limits are read from ``settings.RATE_LIMITS``
+per scope (``'10/m'``, ``'5/10m'``...; empty turns the scope off) and counted
+per key value: the client address, a normalized login identity or the session
+cookie. The session is keyed on a digest of the raw cookie (or X-Session-Key)
+value and never loaded, so a rejected request costs no session query. A client
+can dodge a per-session limit by sending a fresh made-up cookie each time,
+which is why views keyed per session are also limited per address.
+
+Two stores, picked by ``RATE_LIMIT_STORE``:
+  * ``local`` - token buckets in this process's memory. No I/O at all; every
+    worker counts on its own, so N workers allow up to N times the rate.
+  * ``shared`` - sliding-window counters in a small SQLite file
+    (``RATE_LIMIT_DB``) that every worker on the host opens. Each request
+    adds itself with one ``INSERT ... ON CONFLICT DO UPDATE SET count = count
+    + 1 RETURNING count``, so concurrent requests from any worker each see a
+    distinct count and none is lost; the previous window is weighted by how
+    much of it still overlaps the last ``period`` seconds. Requests over the
+    limit are counted too, so a client that keeps hammering stays limited.
+    Several hosts each count on their own.
+
+The default cache cannot hold the counters: the file cache (like most
+backends without Redis) increments with a read and a write, the reason
+django-ratelimit (in requirements) refuses it and has stayed disabled.
+"""
+import functools
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """``'10/m'`` -> (10, 60), ``'5/10m'`` -> (5, 600); falsy -> None."""
+    if not rate:
+        return None
+    count, _, period = rate.partition('/')
+    multiplier = int(period[:-1] or 1)
+    return int(count), multiplier * PERIODS[period[-1]]
+
+
+class LocalStore:
+    """Per-process token buckets: ``limit`` tokens, refilled over ``period``."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, period, now):
+        """Take a token; return 0 when allowed, else the seconds until one is back."""
+        refill = limit / period
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                tokens = limit
+            else:
+                tokens = min(limit, bucket[0] + (now - bucket[1]) * refill)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now, period)
+                return 0
+            self._buckets[key] = (tokens, now, period)
+            return (1 - tokens) / refill
+
+    def _prune(self, now):
+        # Buckets untouched for a full period are full again: forgetting them changes nothing
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < bucket[2]}
+        if len(self._buckets) >= self.max_keys:
+            self._buckets.clear()
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SharedStore:
+    """Sliding-window counters in an SQLite file shared by the workers of the host."""
+
+    # One hit in this many also deletes the counters of past windows
+    PRUNE_EVERY = 1000
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _connection(self):
+        path = settings.RATE_LIMIT_DB
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.path != path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Autocommit: each statement is its own transaction
+            connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS counters ('
+                'key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL, expires REAL NOT NULL, '
+                'PRIMARY KEY (key, window)) WITHOUT ROWID'
+            )
+            self._local.connection, self._local.path = connection, path
+        return connection
+
+    def hit(self, key, limit, period, now):
+        window = int(now // period)
+        elapsed = now - window * period
+        try:
+            connection = self._connection()
+            (count,) = connection.execute(
+                'INSERT INTO counters (key, window, count, expires) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT (key, window) DO UPDATE SET count = count + 1 RETURNING count',
+                (key, window, now + period * 2),
+            ).fetchone()
+            row = connection.execute(
+                'SELECT count FROM counters WHERE key = ? AND window = ?', (key, window - 1)
+            ).fetchone()
+            if random.randrange(self.PRUNE_EVERY) == 0:
+                connection.execute('DELETE FROM counters WHERE expires < ?', (now,))
+        except sqlite3.Error:
+            # A broken counter file must not lock everyone out
+            logger.exception('Rate limit store %s unavailable', settings.RATE_LIMIT_DB)
+            return 0
+        previous = row[0] if row else 0
+        if previous * (period - elapsed) / period + count > limit:
+            return period - elapsed
+        return 0
+
+    def clear(self):
+        try:
+            self._connection().execute('DELETE FROM counters')
+        except sqlite3.Error:
+            pass
+
+
+local_store = LocalStore()
+shared_store = SharedStore()
+
+
+def get_store():
+    return shared_store if settings.RATE_LIMIT_STORE == 'shared' else local_store
+
+
+# Key functions: request -> value to count under, or None to not count it
+
+def client_ip(request):
+    if settings.RATE_LIMIT_IP_HEADER:
+        forwarded = request.META.get(settings.RATE_LIMIT_IP_HEADER, '')
+        # The right-most entry is the one the trusted proxy appended
+        address = forwarded.rsplit(',', 1)[-1].strip()
+        if address:
+            return address
+    return request.META.get('REMOTE_ADDR')
+
+
+def session_key(request):
+    """A digest of the raw cookie or X-Session-Key value, else None; the session is not loaded."""
+    key = request.COOKIES.get(settings.SESSION_COOKIE_NAME) or request.headers.get('X-Session-Key')
+    if not key:
+        return None
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def session_or_ip(request):
+    """The session (one per browser, signed in or not), else the address."""
+    key = session_key(request)
+    return f'session:{key}' if key else f'ip:{client_ip(request)}'
+
+
+def json_field(*names):
+    """Key on the first of ``names`` present in a JSON body, case-folded."""
+    def key(request):
+        try:
+            data = json.loads(request.body)
+        except (ValueError, UnicodeDecodeError):
+            return None
+        if not isinstance(data, dict):
+            return None
+        for name in names:
+            value = data.get(name)
+            if isinstance(value, str) and value.strip():
+                return value.strip().casefold()
+        return None
+    return key
+
+
+def check(scope, value):
+    """Count one request for ``value`` in ``scope``; seconds to wait if over the limit."""
+    rate = parse_rate(settings.RATE_LIMITS.get(scope))
+    if rate is None or value is None:
+        return 0
+    digest = hashlib.md5(f'{scope}:{value}'.encode()).hexdigest()
+    return get_store().hit(digest, *rate, time.time())
+
+
+def too_many_requests(retry_after):
+    response = JsonResponse({'error': 'Too many requests, please try again later.'}, status=429)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def rate_limit(scope, key=client_ip, methods=('POST',)):
+    """Reject requests to the view beyond ``settings.RATE_LIMITS[scope]`` per ``key``."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = check(scope, key(request))
+                if retry_after:
+                    logger.warning('Rate limit %s exceeded from %s', scope, client_ip(request))
+                    return too_many_requests(retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
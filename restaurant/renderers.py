@@ -0,0 +1,86 @@
+"""
+JSON renderer and parser backed by orjson, with DRF's stdlib implementation as
+the fallback.
+
+The output is byte-for-byte what DRF's JSONRenderer writes with this project's
+settings (compact, UTF-8, U+2028/U+2029 escaped): types orjson does not encode
+the way DRF does (datetimes, Decimals, lazy strings, querysets...) are handed to
+DRF's own encoder, so a datetime still ends in ``Z`` and a bare Decimal is still
+a number. Serializer fields keep owning the formats of ``price``
+(FloatField) and ``total_amount`` (DecimalField, an exact string); only the
+encoding loop moves to C. The one visible difference is the exponent notation
+of floats below 1e-4 or from 1e16 (``1e16`` rather than ``1e+16``), which parse
+to the same numbers.
+
+Without orjson installed, or for anything orjson refuses or reads differently
+(indented output for the browsable API, integers beyond 64 bits, invalid
+input), both classes behave exactly like their DRF parents.
+"""
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+from rest_framework.utils.encoders import JSONEncoder
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_drf_default = JSONEncoder().default
+
+# orjson reads integers beyond 64 bits as floats, json keeps them exact. Bodies
+# with a run of 20 digits go to json; translate() finds one far faster than re.
+DIGITS = bytes(ord('0') if chr(byte).isdigit() and byte < 128 else ord(' ') for byte in range(256))
+BIG_INTEGER = b'0' * 20
+
+LINE_SEPARATORS = (('\u2028'.encode(), b'\\u2028'), ('\u2029'.encode(), b'\\u2029'))
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_drf_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping as JSONRenderer
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+                data = data.decode(encoding).encode()
+            if BIG_INTEGER not in data.translate(DIGITS):
+                try:
+                    return orjson.loads(data)
+                except orjson.JSONDecodeError:
+                    # Let json decide (and word the error) on what orjson rejects
+                    pass
+            return json.loads(data, parse_constant=json.strict_constant if self.strict else None)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+def json_response(data, status=200):
+    """HttpResponse with the same body the DRF views render for ``data``."""
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
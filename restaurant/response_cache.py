@@ -0,0 +1,160 @@
+"""
+Rendered menu responses, stored once per menu version with precompressed
+variants.
+
+The bodies behind ``conditional.menu_conditional`` only change when the menu
+version does, so the first request for a representation at a version renders
+it, compresses it once with gzip (and brotli when the ``brotli`` package is
+installed), and stores all the variants in the cache under the representation's
+digest. Later requests for it, from any worker, get the stored bytes in the
+encoding their ``Accept-Encoding`` prefers: no queryset, no serializer and no
+compression per request. Entries of older versions are never read again and
+simply expire (``RESPONSE_CACHE_TIMEOUT``; 0 turns the cache off).
+
+The compression runs on the request that missed, so it uses moderate levels
+(brotli 5, gzip 6): a few milliseconds for a large menu instead of the half
+second brotli 11 takes, for bodies about a quarter larger. Misses for the same
+digest are rendered once: the first claims it with ``cache.add`` and the others
+poll for its entry for up to RENDER_WAIT seconds before rendering themselves.
+"""
+import asyncio
+import gzip
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+IDENTITY = 'identity'
+
+ENCODERS = {
+    'gzip': lambda data: gzip.compress(data, compresslevel=6, mtime=0),
+}
+if brotli is not None:
+    ENCODERS['br'] = lambda data: brotli.compress(data, quality=5)
+
+# Served first when the client accepts several
+PREFERENCE = ['br', 'gzip']
+
+# Seconds a render claim lasts (it is released once the entry is stored), a
+# waiting request waits for the entry, and between its cache reads
+RENDER_CLAIM_TIMEOUT = 10
+RENDER_WAIT = 2.0
+RENDER_POLL_INTERVAL = 0.02
+
+
+def accepted_encoding(header):
+    """The preferred stored encoding ``Accept-Encoding`` allows, or IDENTITY."""
+    accepted = {}
+    for part in header.lower().split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    for encoding in PREFERENCE:
+        if encoding in ENCODERS and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return IDENTITY
+
+
+def _key(digest):
+    return f'menu_response_{digest}'
+
+
+def _claim_key(digest):
+    return f'menu_response_rendering_{digest}'
+
+
+def enabled():
+    return settings.RESPONSE_CACHE_TIMEOUT > 0
+
+
+def lookup(digest):
+    return cache.get(_key(digest)) if enabled() else None
+
+
+async def alookup(digest):
+    return await cache.aget(_key(digest)) if enabled() else None
+
+
+def claim(digest):
+    """True when this request should render ``digest``: no other request is rendering it."""
+    return not enabled() or cache.add(_claim_key(digest), 1, RENDER_CLAIM_TIMEOUT)
+
+
+async def aclaim(digest):
+    return not enabled() or await cache.aadd(_claim_key(digest), 1, RENDER_CLAIM_TIMEOUT)
+
+
+def wait(digest):
+    """The entry another request is rendering for ``digest``, or None after RENDER_WAIT."""
+    deadline = time.monotonic() + RENDER_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(RENDER_POLL_INTERVAL)
+        entry = lookup(digest)
+        if entry is not None:
+            return entry
+    return None
+
+
+async def await_entry(digest):
+    deadline = time.monotonic() + RENDER_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(RENDER_POLL_INTERVAL)
+        entry = await alookup(digest)
+        if entry is not None:
+            return entry
+    return None
+
+
+def store(digest, response):
+    """Compress ``response``'s body into every encoding and cache the set."""
+    content = response.content
+    entry = {'content_type': response['Content-Type'], IDENTITY: content}
+    for encoding, encode in ENCODERS.items():
+        entry[encoding] = encode(content)
+    cache.set(_key(digest), entry, settings.RESPONSE_CACHE_TIMEOUT)
+    cache.delete(_claim_key(digest))
+    return entry
+
+
+def cached_response(entry, encoding):
+    response = HttpResponse(entry[encoding], content_type=entry['content_type'])
+    if encoding != IDENTITY:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+def _encode(response, entry, encoding):
+    if encoding != IDENTITY:
+        response.content = entry[encoding]
+        response['Content-Encoding'] = encoding
+    return response
+
+
+def store_rendered(response, digest, encoding):
+    """
+    Cache a 200 ``response`` once it is rendered and send it in ``encoding``.
+
+    DRF responses are rendered after the view returns, so they are stored from
+    a post-render callback; anything else is stored right away.
+    """
+    if not enabled():
+        return response
+    if response.status_code != 200 or response.has_header('Content-Encoding'):
+        cache.delete(_claim_key(digest))
+        return response
+    if getattr(response, 'is_rendered', True):
+        return _encode(response, store(digest, response), encoding)
+    response.add_post_render_callback(lambda rendered: _encode(rendered, store(digest, rendered), encoding))
+    return response
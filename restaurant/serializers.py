@@ -1,14 +1,44 @@
+from decimal import Decimal
+
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from .models import (
     Category, Dish, Customer, Order, OrderItem, 
-    DishRating, Restaurant, AdminProfile, Notification, OrderAnalytics, ContactMessage
+    DishRating, Restaurant, AdminProfile, Notification, OrderAnalytics, ContactMessage,
+    ProfileReport
 )
+from .images import build_srcset, resolve_image_url
+from .kitchen import InvalidTransition, validate_transition
 import logging
 
 logger = logging.getLogger('restaurant')
 
+def stored_image_url(obj, request=None):
+    """
+    Absolute URL for ``obj.image`` using the URL precomputed on save.
+
+    Rows saved before ``image_url`` existed fall back to the memoized resolver.
+    """
+    if not obj.image:
+        return None
+    url = obj.image_url or resolve_image_url(obj.image)
+    # Cloudinary URLs are already absolute; local storage needs the host.
+    if request is not None and not url.startswith('http'):
+        return request.build_absolute_uri(url)
+    return url
+
+
+class StoredURLImageField(serializers.ImageField):
+    """Writable ImageField whose output comes from the model's stored ``image_url``."""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return stored_image_url(value.instance, self.context.get('request'))
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -22,17 +52,23 @@ class AdminProfileSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'admin_email', 'is_super_admin', 'created_at']
 
 class CategorySerializer(serializers.ModelSerializer):
+    image = StoredURLImageField(required=False, allow_null=True)
     dishes_count = serializers.SerializerMethodField()
     available_dishes_count = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Category
         fields = [
-            'id', 'name', 'slug', 'description', 'image', 'is_active', 
+            'id', 'name', 'slug', 'description', 'image', 'image_srcset', 'is_active', 
             'created_at', 'dishes_count', 'available_dishes_count'
         ]
     
     def get_dishes_count(self, obj):
+        # Counts preloaded by the caller (e.g. the async views) skip the cache round trip
+        counts = self.context.get('category_counts')
+        if counts is not None:
+            return counts.get(obj.id, (0, 0))[0]
         # استخدام cache للأداء
         cache_key = f'category_dishes_count_{obj.id}'
         count = cache.get(cache_key)
@@ -42,6 +78,9 @@ class CategorySerializer(serializers.ModelSerializer):
         return count
     
     def get_available_dishes_count(self, obj):
+        counts = self.context.get('category_counts')
+        if counts is not None:
+            return counts.get(obj.id, (0, 0))[1]
         cache_key = f'category_available_dishes_count_{obj.id}'
         count = cache.get(cache_key)
         if count is None:
@@ -49,6 +88,9 @@ class CategorySerializer(serializers.ModelSerializer):
             cache.set(cache_key, count, 300)  # 5 minutes
         return count
 
+    def get_image_srcset(self, obj):
+        return build_srcset(obj.image_variants, self.context.get('request'))
+
 class DishSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     average_rating = serializers.FloatField(read_only=True)
@@ -61,12 +103,13 @@ class DishSerializer(serializers.ModelSerializer):
     is_in_stock = serializers.ReadOnlyField()
     is_low_stock = serializers.ReadOnlyField()
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Dish
         fields = [
             'id', 'name', 'slug', 'description', 'price', 'category', 'category_id', 'category_name',
-            'image', 'is_available', 'stock_quantity', 'low_stock_threshold',
+            'image', 'image_srcset', 'is_available', 'stock_quantity', 'low_stock_threshold',
             'preparation_time', 'ingredients', 'calories', 'is_spicy',
             'is_vegetarian', 'average_rating', 'rating_count',
             'is_in_stock', 'is_low_stock', 'created_at', 'updated_at'
@@ -74,21 +117,16 @@ class DishSerializer(serializers.ModelSerializer):
         read_only_fields = ('slug', 'category_name')
 
     def get_image(self, obj):
-        if obj.image and hasattr(obj.image, 'url'):
-            # If the image URL is already absolute (e.g., from Cloudinary), use it directly.
-            if obj.image.url.startswith('http'):
-                return obj.image.url
-            
-            # Otherwise, build an absolute URI from a relative path.
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.image.url)
-            
-            # Fallback for contexts without a request.
-            return obj.image.url
-        return None
+        return stored_image_url(obj, self.context.get('request'))
+
+    def get_image_srcset(self, obj):
+        # Built from the URLs recorded by the image pipeline, never from storage
+        return build_srcset(obj.image_variants, self.context.get('request'))
 
     def get_rating_count(self, obj):
+        # Already loaded by prefetch_related('dishrating_set') for average_rating
+        if 'dishrating_set' in getattr(obj, '_prefetched_objects_cache', {}):
+            return len(obj.dishrating_set.all())
         cache_key = f'dish_ratings_count_{obj.id}'
         count = cache.get(cache_key)
         if count is None:
@@ -123,6 +161,79 @@ class AdminDishSerializer(serializers.ModelSerializer):
             'ingredients', 'calories', 'is_spicy', 'is_vegetarian'
         ]
 
+def _unique_ids(changes):
+    ids = [change['id'] for change in changes]
+    if len(set(ids)) != len(ids):
+        raise serializers.ValidationError("Each id may appear only once")
+    return changes
+
+class BulkDishChangeSerializer(serializers.Serializer):
+    """One dish in a bulk update: its id plus the fields to change."""
+    id = serializers.IntegerField(min_value=1)
+    is_available = serializers.BooleanField(required=False)
+    price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=Decimal('0.01'), required=False)
+    stock_quantity = serializers.IntegerField(min_value=0, required=False)
+    low_stock_threshold = serializers.IntegerField(min_value=0, required=False)
+    preparation_time = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError("No fields to update")
+        return attrs
+
+class BulkDishUpdateSerializer(serializers.Serializer):
+    updates = BulkDishChangeSerializer(many=True, allow_empty=False, max_length=settings.BULK_MAX_ITEMS)
+
+    def validate_updates(self, value):
+        return _unique_ids(value)
+
+class BulkOrderStatusChangeSerializer(serializers.Serializer):
+    id = serializers.IntegerField(min_value=1)
+    status = serializers.ChoiceField(choices=Order.ORDER_STATUS_CHOICES)
+
+class BulkOrderStatusSerializer(serializers.Serializer):
+    """
+    Either ``updates: [{id, status}, ...]`` or, to move many orders to the same
+    status, ``ids: [...]`` with ``status``.
+    """
+    updates = BulkOrderStatusChangeSerializer(many=True, required=False, max_length=settings.BULK_MAX_ITEMS)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, max_length=settings.BULK_MAX_ITEMS
+    )
+    status = serializers.ChoiceField(choices=Order.ORDER_STATUS_CHOICES, required=False)
+
+    def validate(self, attrs):
+        if 'ids' in attrs:
+            if 'status' not in attrs:
+                raise serializers.ValidationError({'status': "Required with ids"})
+            attrs['updates'] = [{'id': order_id, 'status': attrs['status']} for order_id in attrs['ids']]
+        if not attrs.get('updates'):
+            raise serializers.ValidationError("Provide updates, or ids with status")
+        return {'updates': _unique_ids(attrs['updates'])}
+
+class MenuCategoryRowSerializer(serializers.Serializer):
+    """One category row of a menu import; the slug is derived from the name when missing."""
+    slug = serializers.SlugField(max_length=50, required=False)
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, default='', allow_blank=True)
+    is_active = serializers.BooleanField(required=False, default=True)
+
+class MenuDishRowSerializer(serializers.Serializer):
+    """One dish row of a menu import; ``category`` is the category's slug."""
+    slug = serializers.SlugField(max_length=50, required=False)
+    name = serializers.CharField(max_length=100)
+    category = serializers.SlugField(max_length=50)
+    description = serializers.CharField(required=False, default='', allow_blank=True)
+    price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=Decimal('0.01'))
+    is_available = serializers.BooleanField(required=False, default=True)
+    stock_quantity = serializers.IntegerField(min_value=0, required=False, default=0)
+    low_stock_threshold = serializers.IntegerField(min_value=0, required=False, default=5)
+    preparation_time = serializers.IntegerField(min_value=0, required=False, default=15)
+    ingredients = serializers.CharField(required=False, default='', allow_blank=True)
+    calories = serializers.IntegerField(min_value=0, required=False, allow_null=True, default=None)
+    is_spicy = serializers.BooleanField(required=False, default=False)
+    is_vegetarian = serializers.BooleanField(required=False, default=False)
+
 class CustomerSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     total_orders = serializers.SerializerMethodField()
@@ -157,9 +268,18 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'customer', 'order_date', 'status', 'status_display', 'payment_status',
             'total_amount', 'delivery_address', 'special_instructions',
-            'estimated_delivery_time', 'actual_delivery_time', 'items'
+            'estimated_ready_time', 'estimated_delivery_time', 'actual_delivery_time', 'items'
         ]
 
+    def validate_status(self, value):
+        # Updates follow the same status flow as update_status and bulk-status
+        if self.instance is not None:
+            try:
+                validate_transition(self.instance.status, value)
+            except InvalidTransition as e:
+                raise serializers.ValidationError(str(e))
+        return value
+
 class OrderCreateSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
     
@@ -226,6 +346,23 @@ class ContactMessageSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'email', 'subject', 'message', 'created_at']
         read_only_fields = ['id', 'created_at']
 
+
+class ProfileReportSerializer(serializers.ModelSerializer):
+    """Summary of a profiled request, for listing."""
+    username = serializers.CharField(source='user.username', read_only=True, default=None)
+
+    class Meta:
+        model = ProfileReport
+        fields = ['id', 'created_at', 'username', 'method', 'path', 'status_code', 'duration_ms']
+        read_only_fields = fields
+
+
+class ProfileReportDetailSerializer(ProfileReportSerializer):
+    """A profiled request with its full report."""
+    class Meta(ProfileReportSerializer.Meta):
+        fields = ProfileReportSerializer.Meta.fields + ['report']
+        read_only_fields = fields
+
 # تحسين OrderCreateSerializer مع validation
 class EnhancedOrderCreateSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
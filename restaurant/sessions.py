@@ -0,0 +1,227 @@
+"""
+Database sessions read through a process and a shared cache, written only when
+something changed (SESSION_ENGINE = 'restaurant.sessions').
+
+With SESSION_SAVE_EVERY_REQUEST every request that carries a session saved it:
+one UPDATE of django_session per request, which on SQLite queues every worker
+behind the write lock. Here a save compares the serialized data with what was
+loaded and
+  * writes the row (and both caches) when the data changed, exactly as the
+    database backend would;
+  * does nothing when only the expiry would move and the stored expiry is
+    still within SESSION_EXPIRY_REFRESH seconds of the full age;
+  * otherwise queues the expiry extension. Extensions are written together,
+    one UPDATE per SESSION_EXTEND_INTERVAL seconds (or per
+    SESSION_EXTEND_BATCH sessions) for the whole process.
+A stored expiry therefore trails the sliding one by at most the refresh
+threshold plus one interval, and the row in django_session always has the
+current data, so code reading the Session model directly keeps working.
+
+Loads try, in order, a per-process copy kept SESSION_LOCAL_CACHE_TTL seconds
+(another worker's logout can take that long to be seen here), the default
+cache, then the database. Expired rows are swept by ``clear_expired`` (so
+``clearsessions``) and ``sweep_sessions`` in chunks through the expire_date
+index, committing between chunks.
+"""
+import atexit
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends import db
+from django.core.cache import caches
+from django.utils import timezone
+
+KEY_PREFIX = 'restaurant.sessions'
+
+# Sessions kept in process memory at most
+LOCAL_CACHE_SIZE = 10000
+
+
+class _LocalCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key, payload):
+        if settings.SESSION_LOCAL_CACHE_TTL <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + settings.SESSION_LOCAL_CACHE_TTL, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > LOCAL_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _Extensions:
+    """Expiry extensions waiting to be written, by session key."""
+
+    def __init__(self):
+        self._pending = {}
+        self._since = None
+        self._lock = threading.Lock()
+
+    def add(self, session_key, expire_date):
+        with self._lock:
+            self._pending[session_key] = expire_date
+            if self._since is None:
+                self._since = time.monotonic()
+            due = (
+                len(self._pending) >= settings.SESSION_EXTEND_BATCH
+                or time.monotonic() - self._since >= settings.SESSION_EXTEND_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def discard(self, session_key):
+        with self._lock:
+            self._pending.pop(session_key, None)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending, self._since = self._pending, {}, None
+        if not pending:
+            return 0
+        # One UPDATE for the batch: every session gets the latest expiry,
+        # at most one interval beyond its own
+        expire_date = max(pending.values())
+        return SessionStore.get_model_class().objects.filter(
+            session_key__in=list(pending), expire_date__lt=expire_date,
+        ).update(expire_date=expire_date)
+
+
+local_cache = _LocalCache()
+extensions = _Extensions()
+atexit.register(extensions.flush)
+
+
+class SessionStore(db.SessionStore):
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        # {'raw': serialized data, 'expires': timestamp} as last stored, when known
+        self._stored = None
+        super().__init__(session_key)
+
+    def _cache_key(self, session_key):
+        return f'{KEY_PREFIX}:{session_key}'
+
+    def _remember(self, payload):
+        self._stored = payload
+        key = self._cache_key(self.session_key)
+        local_cache.set(key, payload)
+        self._cache.set(key, payload, max(1, int(payload['expires'] - time.time())))
+
+    def load(self):
+        self._stored = None
+        if self.session_key is None:
+            return {}
+        key = self._cache_key(self.session_key)
+        payload = local_cache.get(key)
+        if payload is None:
+            payload = self._cache.get(key)
+            if payload is not None:
+                local_cache.set(key, payload)
+        if payload is None:
+            s = self._get_session_from_db()
+            if s is None:
+                return {}
+            data = self.decode(s.session_data)
+            payload = {'raw': self.serializer().dumps(data), 'expires': s.expire_date.timestamp()}
+            self._remember(payload)
+            return data
+        if payload['expires'] <= time.time():
+            self._session_key = None
+            return {}
+        self._stored = payload
+        return self.serializer().loads(payload['raw'])
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        raw = self.serializer().dumps(data)
+        stored = self._stored
+        if not must_create and stored is not None and stored['raw'] == raw:
+            age = self.get_expiry_age()
+            remaining = stored['expires'] - time.time()
+            if remaining > age - settings.SESSION_EXPIRY_REFRESH:
+                return
+            expire_date = timezone.now() + datetime.timedelta(seconds=age)
+            extensions.add(self.session_key, expire_date)
+            self._remember({'raw': raw, 'expires': expire_date.timestamp()})
+            return
+        super().save(must_create)
+        extensions.discard(self.session_key)
+        self._remember({'raw': raw, 'expires': self.get_expiry_date().timestamp()})
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        super().delete(session_key)
+        extensions.discard(session_key)
+        local_cache.delete(self._cache_key(session_key))
+        self._cache.delete(self._cache_key(session_key))
+        if session_key == self.session_key:
+            self._stored = None
+
+    # The async API goes through the same caches
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        sweep_expired()
+
+    @classmethod
+    async def aclear_expired(cls):
+        await sync_to_async(sweep_expired)()
+
+
+def sweep_expired(chunk_size=None, pause=0):
+    """Delete expired sessions ``chunk_size`` rows at a time; returns the count."""
+    chunk_size = chunk_size or settings.SESSION_SWEEP_CHUNK
+    model = SessionStore.get_model_class()
+    now = timezone.now()
+    deleted = 0
+    while True:
+        # expire_date is indexed: each chunk is a range scan, each DELETE a short write
+        keys = list(
+            model.objects.filter(expire_date__lt=now).order_by('expire_date')
+            .values_list('session_key', flat=True)[:chunk_size]
+        )
+        if not keys:
+            return deleted
+        deleted += model.objects.filter(session_key__in=keys).delete()[0]
+        if len(keys) < chunk_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,225 @@
+"""
+Per-statement query statistics and plans for the index advisor
+(SLOW_QUERY_LOG = True).
+
+Every statement run through a database connection is reduced to a
+fingerprint: literals and placeholders become ``?``, IN lists and multi-row
+VALUES collapse to one element, whitespace is squeezed. Per fingerprint and
+alias the process counts calls, total and maximum time, and a latency
+histogram with buckets 19% wide (2 ** 0.25), so percentiles from several
+workers merge by adding buckets. The first statement of a fingerprint taking
+SLOW_QUERY_MS or more keeps its SQL and parameters; it is EXPLAINed when the
+statistics are written.
+
+Statistics are written to QueryFingerprint rows at the end of a request once
+SLOW_QUERY_FLUSH_INTERVAL seconds have passed, and when the process exits -
+never from inside the statement being timed, so a rolled-back transaction
+cannot take them along. New fingerprints are inserted empty first, skipping
+any another worker just inserted, then all the batch's rows are locked and
+added to. Statements the recorder runs itself (EXPLAIN, its
+own writes) are not recorded. The cost while recording is two clock reads, a
+cached fingerprint lookup and a dict update per statement; with the setting
+off nothing is installed.
+
+``manage.py index_advisor`` reads the rows back (restaurant/index_advisor.py).
+"""
+import atexit
+import functools
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket i holds latencies in [BUCKET_BASE * STEP ** i, BUCKET_BASE * STEP ** (i + 1)) ms
+BUCKET_BASE = 0.01
+STEP = 2 ** 0.25
+
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w".])-?\d+(?:\.\d+)?(?![\w"])')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_ROWS = re.compile(r'(\([^()]*\))(?:\s*,\s*\1)+')
+_SPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize(sql):
+    """``sql`` with its literals, list lengths and spacing made uniform."""
+    text = _STRING.sub('?', sql)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _LIST.sub('(?)', text)
+    text = _ROWS.sub(r'\1', text)
+    return _SPACE.sub(' ', text).strip()
+
+
+def fingerprint(alias, normalized):
+    return hashlib.md5(f'{alias}:{normalized}'.encode()).hexdigest()
+
+
+def bucket(ms):
+    if ms <= BUCKET_BASE:
+        return 0
+    return int(math.log(ms / BUCKET_BASE, STEP))
+
+
+def percentile(histogram, p):
+    """Estimated ``p``-th percentile (0-100) in ms from a {bucket: count} histogram."""
+    counts = sorted((int(index), count) for index, count in histogram.items())
+    total = sum(count for _, count in counts)
+    if not total:
+        return 0.0
+    rank = p / 100 * total
+    seen = 0
+    for index, count in counts:
+        seen += count
+        if seen >= rank:
+            # Geometric middle of the bucket
+            return BUCKET_BASE * STEP ** (index + 0.5)
+    return BUCKET_BASE * STEP ** (counts[-1][0] + 0.5)
+
+
+class _Stats:
+    __slots__ = ('alias', 'sql', 'calls', 'total_ms', 'max_ms', 'slow_calls', 'histogram', 'example')
+
+    def __init__(self, alias, sql):
+        self.alias = alias
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow_calls = 0
+        self.histogram = {}
+        # (sql, params) of a slow call, to EXPLAIN
+        self.example = None
+
+
+class Recorder:
+    def __init__(self):
+        self._pending = {}
+        self._explained = set()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(self._local, 'suppressed', False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add(context['connection'].alias, sql, None if many else params, (time.perf_counter() - start) * 1e3)
+
+    def add(self, alias, sql, params, ms):
+        normalized = normalize(sql)
+        key = fingerprint(alias, normalized)
+        with self._lock:
+            stats = self._pending.get(key)
+            if stats is None:
+                stats = self._pending[key] = _Stats(alias, normalized)
+            stats.calls += 1
+            stats.total_ms += ms
+            stats.max_ms = max(stats.max_ms, ms)
+            index = bucket(ms)
+            stats.histogram[index] = stats.histogram.get(index, 0) + 1
+            if ms >= settings.SLOW_QUERY_MS:
+                stats.slow_calls += 1
+                if stats.example is None and key not in self._explained and params is not None:
+                    stats.example = (sql, params)
+
+    def due(self):
+        return time.monotonic() - self._flushed_at >= settings.SLOW_QUERY_FLUSH_INTERVAL
+
+    def flush(self):
+        """Write the statistics gathered since the last flush; returns the fingerprints written."""
+        from .models import QueryFingerprint
+        from .profiling import explain
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return 0
+        self._local.suppressed = True
+        try:
+            plans = {}
+            for key, stats in pending.items():
+                if stats.example and stats.example[0].lstrip()[:6].upper().startswith(EXPLAINABLE):
+                    plans[key] = explain(stats.alias, *stats.example)
+                    self._explained.add(key)
+            now = timezone.now()
+            with transaction.atomic():
+                # Rows first, empty: select_for_update cannot lock rows that do not exist yet,
+                # and a worker inserting the same fingerprint meanwhile must not fail the batch
+                QueryFingerprint.objects.bulk_create([
+                    QueryFingerprint(fingerprint=key, alias=stats.alias, sql=stats.sql, first_seen=now, last_seen=now)
+                    for key, stats in pending.items()
+                ], ignore_conflicts=True)
+                rows = QueryFingerprint.objects.select_for_update().in_bulk(list(pending), field_name='fingerprint')
+                for key, stats in pending.items():
+                    row = rows[key]
+                    row.calls += stats.calls
+                    row.slow_calls += stats.slow_calls
+                    row.total_ms += stats.total_ms
+                    row.max_ms = max(row.max_ms, stats.max_ms)
+                    for index, count in stats.histogram.items():
+                        row.histogram[str(index)] = row.histogram.get(str(index), 0) + count
+                    if key in plans:
+                        row.plan = plans[key]
+                        row.plan_sql = stats.example[0]
+                    row.last_seen = now
+                QueryFingerprint.objects.bulk_update(
+                    list(rows.values()),
+                    ['calls', 'slow_calls', 'total_ms', 'max_ms', 'histogram', 'plan', 'plan_sql', 'last_seen'],
+                )
+        except DatabaseError:
+            logger.exception("Could not write %d query fingerprints", len(pending))
+            return 0
+        finally:
+            self._local.suppressed = False
+        return len(pending)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._explained.clear()
+
+
+recorder = Recorder()
+
+
+def install(connection, **kwargs):
+    if recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.append(recorder)
+
+
+def uninstall(connection):
+    if recorder in connection.execute_wrappers:
+        connection.execute_wrappers.remove(recorder)
+
+
+def flush_if_due(**kwargs):
+    if recorder.due():
+        recorder.flush()
+
+
+def enable():
+    """Record statements on every connection of this process (RestaurantConfig.ready)."""
+    connection_created.connect(install, dispatch_uid='restaurant.slow_queries')
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+    request_finished.connect(flush_if_due, dispatch_uid='restaurant.slow_queries')
+    atexit.register(recorder.flush)
@@ -0,0 +1,127 @@
+"""
+Streaming CSV/JSONL encoding and decoding shared by the import/export paths.
+
+Writers take a header and an iterator of row tuples (e.g. ``values_list(...)
+.iterator()``) and yield text in batches, so nothing but the current batch is
+held in memory. Readers yield ``(line_number, record, error)`` one record at a
+time from any iterable of text lines (an open file or a wrapped upload).
+
+Under ASGI a streaming response collects a sync iterator into a list before
+sending anything, so ``aiter_chunks`` hands it an async iterator instead.
+"""
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Rows encoded per yielded string: large enough to amortise the write, small enough to stream
+WRITE_BATCH_ROWS = 1000
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def csv_lines(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for batch in chunked(rows, WRITE_BATCH_ROWS):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def jsonl_lines(header, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for batch in chunked(rows, WRITE_BATCH_ROWS):
+        yield ''.join(encoder.encode(dict(zip(header, row))) + '\n' for row in batch)
+
+
+def columnar_lines(header, rows):
+    """
+    One JSON line per batch, column-oriented (``{"rows": n, "columns": {name: [...]}}``).
+
+    Like a Parquet row group: each column's values are stored together, so a
+    reader can load a batch straight into a dataframe column by column.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for batch in chunked(rows, WRITE_BATCH_ROWS):
+        columns = dict(zip(header, map(list, zip(*batch))))
+        yield encoder.encode({'rows': len(batch), 'columns': columns}) + '\n'
+
+
+async def aiter_chunks(chunks):
+    """Async iterator over the chunks of a writer, each one made in the sync thread (where the DB cursor lives)."""
+    iterator = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(iterator, None)) is not None:
+        yield chunk
+
+
+# format -> (content type, file extension, writer)
+WRITERS = {
+    'csv': ('text/csv', 'csv', csv_lines),
+    'jsonl': ('application/x-ndjson', 'jsonl', jsonl_lines),
+    'columnar': ('application/x-ndjson', 'columns.jsonl', columnar_lines),
+}
+
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    for record in reader:
+        # Empty cells mean "not given": the stored value (or a new row's default) stays
+        yield reader.line_num, {key: value for key, value in record.items() if key and value != ''}, None
+
+
+def read_jsonl(lines):
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'Each line must be a JSON object'
+        else:
+            yield line_number, record, None
+
+
+def undecodable_line(chunks, encoding='utf-8'):
+    """Line number of the first bytes in ``chunks`` not valid in ``encoding``, or None."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    line = 1
+    for chunk in chunks:
+        try:
+            decoder.decode(chunk)
+        except UnicodeDecodeError as e:
+            return line + chunk.count(b'\n', 0, max(0, e.start))
+        line += chunk.count(b'\n')
+    try:
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return line
+    return None
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def format_from_filename(filename, default=None):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in READERS else default
@@ -1,8 +1,10 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient, APITestCase
 from django.contrib.auth.models import User
 from django.urls import reverse
 from decimal import Decimal
+import io
+import tempfile
 
 from .models import Category, Dish, Customer, Order, OrderItem, DishRating
 
@@ -191,3 +193,1806 @@ class DishModelTestCase(TestCase):
             low_stock_threshold=5
         )
         self.assertTrue(dish.is_low_stock)
+
+
+class LowStockDigestTestCase(TestCase):
+    """اختبار ملخص تنبيهات المخزون المنخفض"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Test Category")
+        self.admin = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.dish = Dish.objects.create(
+            name="Test Dish",
+            price=Decimal('15.99'),
+            category=self.category,
+            stock_quantity=10,
+            low_stock_threshold=5
+        )
+
+    def test_flag_follows_stock_writes(self):
+        """اختبار تحديث علامة المخزون المنخفض عند الحفظ"""
+        self.assertFalse(self.dish.is_low_stock)
+        self.dish.reduce_stock(6)
+        self.dish.refresh_from_db()
+        self.assertTrue(self.dish.is_low_stock)
+
+        self.dish.stock_quantity = 20
+        self.dish.save(update_fields=['stock_quantity'])
+        self.dish.refresh_from_db()
+        self.assertFalse(self.dish.is_low_stock)
+
+    def test_low_stock_dish_can_be_inserted(self):
+        """اختبار إنشاء طبق منخفض المخزون وإعادة حفظه بعد حذفه"""
+        dish = Dish.objects.create(
+            name="Low From Start", price=Decimal('4.00'), category=self.category,
+            stock_quantity=1, low_stock_threshold=5, is_low_stock=True,
+        )
+        self.assertTrue(Dish.objects.get(pk=dish.pk).is_low_stock)
+
+        # Deleted through the instance: pk is reset, a save inserts a new row
+        dish.delete()
+        dish.save()
+        self.assertTrue(Dish.objects.get(pk=dish.pk).is_low_stock)
+
+        copy = Dish.objects.get(pk=dish.pk)
+        copy.pk, copy.slug = None, ''
+        copy.save(force_insert=True)
+        self.assertEqual(Dish.objects.filter(name="Low From Start", is_low_stock=True).count(), 2)
+
+    def test_digest_coalesces_crossings(self):
+        """اختبار دمج التنبيهات في إشعار واحد لكل مدير"""
+        from .models import Notification
+        from .utils import send_low_stock_digest
+
+        other = Dish.objects.create(
+            name="Other Dish",
+            price=Decimal('9.99'),
+            category=self.category,
+            stock_quantity=1
+        )
+        self.dish.reduce_stock(8)
+
+        self.assertEqual(send_low_stock_digest(), 2)
+        self.assertEqual(Notification.objects.filter(user=self.admin, notification_type='stock_low').count(), 1)
+
+        # No repeat alert until the dish is restocked and crosses again
+        other.reduce_stock(1)
+        self.assertEqual(send_low_stock_digest(), 0)
+
+        other.stock_quantity = 50
+        other.save()
+        other.stock_quantity = 2
+        other.save()
+        self.assertEqual(send_low_stock_digest(), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_PIPELINE_WORKERS=0)
+class ImageVariantsTestCase(APITestCase):
+    """اختبار توليد نسخ الصور المتعددة"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Test Category")
+        self.admin = User.objects.create_superuser(username='admin', password='pass', email='admin@example.com')
+
+    def _upload(self, name='dish.png'):
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), 'orange').save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_admin_upload_records_variants(self):
+        """اختبار تسجيل روابط النسخ بعد رفع صورة من لوحة الإدارة"""
+        self.client.force_authenticate(user=self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin-dish-list'), {
+                'name': 'Upload Dish',
+                'description': 'desc',
+                'price': '9.99',
+                'category_id': self.category.id,
+                'is_available': 'true',
+                'image': self._upload(),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        dish = Dish.objects.get(name='Upload Dish')
+        self.assertEqual(set(dish.image_variants), {'thumb', 'card', 'full'})
+        self.assertEqual(dish.image_variants['full']['width'], 800)
+        self.assertEqual(dish.image_variants['thumb']['width'], 200)
+        storage = dish.image.storage
+        for entry in dish.image_variants.values():
+            self.assertTrue(storage.exists(entry['webp']['name']))
+            self.assertTrue(storage.exists(entry['jpeg']['name']))
+
+        response = self.client.get(reverse('dish-detail', args=[dish.id]))
+        srcset = response.data['image_srcset']
+        self.assertIn('200w', srcset['webp'])
+        self.assertIn('800w', srcset['jpeg'])
+
+    def test_inline_failures_are_logged(self):
+        """اختبار تسجيل أخطاء التوليد المباشر بدلاً من رفعها"""
+        from .images import schedule_image_variants
+
+        dish = Dish.objects.create(name="Lost File", price=Decimal('5.00'), category=self.category, image=self._upload('lost.png'))
+        dish.image.storage.delete(dish.image.name)
+        with self.assertLogs('restaurant', level='ERROR') as captured:
+            self.assertEqual(schedule_image_variants(dish), {})
+        self.assertIn(f'Dish #{dish.pk}', captured.output[0])
+
+    def test_image_url_stored_on_save(self):
+        """اختبار حفظ رابط الصورة مسبقاً عند الحفظ"""
+        dish = Dish.objects.create(
+            name="Stored URL Dish",
+            price=Decimal('5.00'),
+            category=self.category,
+            image=self._upload('stored.png')
+        )
+        self.assertEqual(dish.image_url, dish.image.url)
+        self.assertTrue(dish.image_url.endswith('dishes/stored.png'))
+
+        dish.image.name = 'dishes/renamed.png'
+        dish.save(update_fields=['image'])
+        dish.refresh_from_db()
+        self.assertTrue(dish.image_url.endswith('dishes/renamed.png'))
+
+    def test_images_command(self):
+        """اختبار أمر صيانة الصور على التخزين المحلي"""
+        from django.core.management import call_command
+
+        dish = Dish.objects.create(
+            name="Command Dish",
+            price=Decimal('5.00'),
+            category=self.category,
+            image=self._upload('command.png')
+        )
+        Dish.objects.filter(pk=dish.pk).update(image='media/old/dishes/command.png', image_url='')
+        etag = self.client.get('/api/dishes/')['ETag']
+
+        out = io.StringIO()
+        call_command('images', 're-path', '--model', 'dish', '--dry-run', stdout=out)
+        dish.refresh_from_db()
+        self.assertEqual(dish.image.name, 'media/old/dishes/command.png')
+        self.assertEqual(self.client.get('/api/dishes/')['ETag'], etag)
+
+        call_command('images', 're-path', '--model', 'dish', stdout=out)
+        dish.refresh_from_db()
+        self.assertEqual(dish.image.name, 'dishes/command.png')
+        self.assertTrue(dish.image_url.endswith('dishes/command.png'))
+        # The cached menu moves on to the new URLs
+        response = self.client.get('/api/dishes/')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(response.json()['results'][0]['image'].endswith('dishes/command.png'))
+        etag = response['ETag']
+
+        call_command('images', 'regenerate-variants', '--model', 'dish', '--executor', 'thread', stdout=out)
+        dish.refresh_from_db()
+        self.assertEqual(set(dish.image_variants), {'thumb', 'card', 'full'})
+        self.assertNotEqual(self.client.get('/api/dishes/')['ETag'], etag)
+
+        orphan = dish.image.storage.save('dishes/orphan.png', io.BytesIO(b'x'))
+        out = io.StringIO()
+        call_command('images', 'find-orphans', '--model', 'dish', '--delete', stdout=out)
+        self.assertIn(f'orphan: {orphan}', out.getvalue())
+        self.assertFalse(dish.image.storage.exists(orphan))
+        self.assertTrue(dish.image.storage.exists(dish.image.name))
+
+
+REPLICA_DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'primary.sqlite3'},
+    'replica_1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'replica_1.sqlite3'},
+    'reporting': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'reporting.sqlite3'},
+}
+
+
+@override_settings(DATABASES=REPLICA_DATABASES)
+class ReplicaRouterTestCase(TestCase):
+    """اختبار توجيه القراءات إلى النسخ المتماثلة"""
+
+    def setUp(self):
+        from django.test import RequestFactory
+        from .db_routers import ReplicaRouter, ReplicaRoutingMiddleware
+
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+        self.middleware = ReplicaRoutingMiddleware
+
+    def _run(self, request, view):
+        from django.http import HttpResponse
+
+        def get_response(req):
+            view()
+            return HttpResponse()
+        return self.middleware(get_response)(request)
+
+    def test_safe_reads_use_replica(self):
+        """اختبار قراءة طلبات GET من النسخة المتماثلة"""
+        seen = {}
+        self._run(self.factory.get('/api/dishes/'), lambda: seen.update(
+            dish=self.router.db_for_read(Dish),
+            session=self.router.db_for_read(User),
+        ))
+        self.assertEqual(seen, {'dish': 'replica_1', 'session': 'default'})
+        # Outside a request (commands, shell) everything stays on the primary
+        self.assertEqual(self.router.db_for_read(Dish), 'default')
+
+    def test_writer_sticks_to_primary(self):
+        """اختبار بقاء الكاتب على قاعدة البيانات الأساسية بعد الكتابة"""
+        from .db_routers import STICKY_COOKIE
+
+        seen = {}
+
+        def write_then_read():
+            self.router.db_for_write(Order)
+            seen['same_request'] = self.router.db_for_read(Order)
+
+        response = self._run(self.factory.post('/api/add-rating/'), write_then_read)
+        self.assertEqual(seen['same_request'], 'default')
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        request = self.factory.get('/api/orders/')
+        request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        self._run(request, lambda: seen.update(next_request=self.router.db_for_read(Order)))
+        self.assertEqual(seen['next_request'], 'default')
+
+    def test_reporting_pin(self):
+        """اختبار تثبيت استعلامات التحليلات على قاعدة التقارير"""
+        from .db_routers import REPORTING, pin_reads
+
+        seen = {}
+
+        def analytics():
+            with pin_reads(REPORTING):
+                seen['pinned'] = self.router.db_for_read(Order)
+
+        self._run(self.factory.get('/api/admin/dashboard/'), analytics)
+        self.assertEqual(seen['pinned'], 'reporting')
+
+
+class AsyncPublicViewsTestCase(APITestCase):
+    """اختبار تطابق العروض غير المتزامنة مع عروض DRF"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Async Category")
+        self.dish = Dish.objects.create(
+            name="Async Dish",
+            description="Served without a worker thread",
+            price=Decimal('12.50'),
+            category=self.category,
+            stock_quantity=10
+        )
+        # A second category sorting first, with dishes whose names sort the other way
+        other = Category.objects.create(name="Aardvark Category")
+        for name in ("Banana", "Zucchini"):
+            Dish.objects.create(name=name, price=Decimal('3.00'), category=other, stock_quantity=5)
+        Dish.objects.create(name="Apple", price=Decimal('2.00'), category=self.category, stock_quantity=5)
+        user = User.objects.create_user(username='rater', password='x')
+        customer = Customer.objects.create(user=user, phone='0', address='addr')
+        DishRating.objects.create(dish=self.dish, customer=customer, rating=4)
+
+    def _async_response(self, view, path, **kwargs):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncRequestFactory
+
+        return async_to_sync(view)(AsyncRequestFactory().get(path), **kwargs)
+
+    def _async_get(self, view, path, **kwargs):
+        import json
+
+        response = self._async_response(view, path, **kwargs)
+        return response.status_code, json.loads(response.content)
+
+    def test_matches_drf_views(self):
+        """اختبار إرجاع نفس البيانات من المسارين"""
+        from . import async_views
+
+        cases = [
+            (async_views.dish_list, '/api/dishes/', {}),
+            (async_views.dish_detail, f'/api/dishes/{self.dish.id}/', {'pk': self.dish.id}),
+            (async_views.menu_overview, '/api/menu-overview/', {}),
+            (async_views.homepage_stats, '/api/homepage-stats/', {}),
+        ]
+        for view, path, kwargs in cases:
+            with self.subTest(path=path):
+                expected = self.client.get(path)
+                self.assertEqual(self._async_get(view, path, **kwargs), (expected.status_code, expected.json()))
+
+    def test_dish_list_order_and_etag_match(self):
+        """اختبار تطابق ترتيب الأطباق وETag بين المسارين عبر عدة أقسام"""
+        import json
+        from django.core.cache import cache
+        from . import async_views, response_cache
+
+        cache.clear()
+        expected = self.client.get('/api/dishes/')
+        names = [dish['name'] for dish in expected.json()['results']]
+        self.assertEqual(names, ['Banana', 'Zucchini', 'Apple', 'Async Dish'])
+        # Rendered by the async view itself, not served from the DRF view's cached body
+        cache.delete(response_cache._key(expected['ETag'].strip('"')))
+        response = self._async_response(async_views.dish_list, '/api/dishes/')
+        self.assertEqual(json.loads(response.content), expected.json())
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+    def test_not_found(self):
+        """اختبار الاستجابة 404 للطبق غير الموجود والصفحة غير الصالحة"""
+        from . import async_views
+
+        status_code, _ = self._async_get(async_views.dish_detail, '/api/dishes/0/', pk=0)
+        self.assertEqual(status_code, 404)
+        status_code, _ = self._async_get(async_views.dish_list, '/api/dishes/?page=9')
+        self.assertEqual(status_code, 404)
+
+
+class LiveEventsTestCase(APITestCase):
+    """اختبار بث تغييرات الطلبات والإشعارات"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='chef', email='chef@example.com', password='x')
+        user = User.objects.create_user(username='eater', password='x')
+        self.customer = Customer.objects.create(user=user, phone='0', address='addr')
+        self.order = Order.objects.create(
+            customer=self.customer, total_amount=Decimal('20.00'), delivery_address='addr'
+        )
+
+    def test_status_change_reaches_customer_and_admins(self):
+        """اختبار وصول تغيير الحالة إلى العميل والمدير"""
+        import asyncio
+        from .events import ADMIN_CHANNEL, broker, user_channel
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def subscribe(channels):
+            return broker.subscribe(channels)
+
+        customer_stream = loop.run_until_complete(subscribe([user_channel(self.customer.user_id)]))
+        admin_stream = loop.run_until_complete(subscribe([user_channel(self.admin.id), ADMIN_CHANNEL]))
+        self.addCleanup(broker.unsubscribe, customer_stream)
+        self.addCleanup(broker.unsubscribe, admin_stream)
+
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/admin/orders/{self.order.id}/update_status/', {'status': 'preparing'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+        for stream in (customer_stream, admin_stream):
+            payload = loop.run_until_complete(stream.get(1))
+            self.assertTrue(payload.startswith('event: order_status\n'))
+            self.assertIn('"status": "preparing"', payload)
+
+    @override_settings(SSE_HEARTBEAT_SECONDS=5)
+    def test_event_stream(self):
+        """اختبار فتح البث برمز مؤقت واستقبال إشعار جديد"""
+        import json
+        from asgiref.sync import async_to_sync, sync_to_async
+        from django.contrib.auth.models import AnonymousUser
+        from django.contrib.sessions.backends.db import SessionStore
+        from django.test import AsyncRequestFactory
+        from . import async_views
+        from .events import broker
+        from .utils import create_notification
+
+        session = SessionStore()
+        session['_auth_user_id'] = str(self.customer.user_id)
+        session.create()
+
+        def notify():
+            with self.captureOnCommitCallbacks(execute=True):
+                create_notification(self.customer.user, 'Ready', 'Your order is ready', 'order_ready')
+
+        async def anonymous_user():
+            return AnonymousUser()
+
+        async def scenario():
+            anonymous_request = AsyncRequestFactory().get('/api/events/')
+            anonymous_request.session = SessionStore()
+            anonymous_request.auser = anonymous_user
+            anonymous = await async_views.event_stream(anonymous_request)
+            self.assertEqual(anonymous.status_code, 401)
+
+            # The session key is not accepted in the URL, nor a forged or stale token
+            for query in (f'session_key={session.session_key}', 'token=forged'):
+                url_request = AsyncRequestFactory().get(f'/api/events/?{query}')
+                url_request.session = SessionStore()
+                url_request.auser = anonymous_user
+                self.assertEqual((await async_views.event_stream(url_request)).status_code, 401)
+
+            token_request = AsyncRequestFactory().post('/api/events/token/', headers={'X-Session-Key': session.session_key})
+            token = json.loads((await async_views.event_stream_token(token_request)).content)['token']
+            self.assertNotIn(session.session_key, token)
+            request = AsyncRequestFactory().get(f'/api/events/?token={token}')
+            response = await async_views.event_stream(request)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = aiter(response.streaming_content)
+            chunks = [await anext(stream), await anext(stream)]
+            await sync_to_async(notify)()
+            chunks.append(await anext(stream))
+            await stream.aclose()
+            return [chunk.decode() for chunk in chunks]
+
+        retry, ready, notification = async_to_sync(scenario)()
+        self.assertTrue(retry.startswith('retry:'))
+        self.assertIn('event: ready', ready)
+        self.assertIn('event: notification', notification)
+        self.assertIn('Your order is ready', notification)
+        self.assertEqual(broker.subscriber_count(), 0)
+
+
+class KitchenQueueTestCase(APITestCase):
+    """اختبار طابور المطبخ"""
+
+    def setUp(self):
+        from .kitchen import kitchen_queue
+
+        self.admin = User.objects.create_superuser(username='chef', email='chef@example.com', password='x')
+        user = User.objects.create_user(username='eater', password='x')
+        customer = Customer.objects.create(user=user, phone='0', address='addr')
+        category = Category.objects.create(name="Kitchen")
+        quick = Dish.objects.create(name="Salad", price=Decimal('5'), category=category, preparation_time=5)
+        slow = Dish.objects.create(name="Roast", price=Decimal('25'), category=category, preparation_time=40)
+
+        self.slow_order = Order.objects.create(customer=customer, total_amount=Decimal('25'), delivery_address='a')
+        OrderItem.objects.create(order=self.slow_order, dish=slow, quantity=1, price=slow.price)
+        self.quick_order = Order.objects.create(customer=customer, total_amount=Decimal('5'), delivery_address='a')
+        OrderItem.objects.create(order=self.quick_order, dish=quick, quantity=2, price=quick.price)
+        Order.objects.create(
+            customer=customer, total_amount=Decimal('5'), delivery_address='a', status='delivered'
+        )
+
+        kitchen_queue.load()
+        self.client.force_authenticate(self.admin)
+
+    def _set_status(self, order, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(
+                f'/api/admin/orders/{order.id}/update_status/', {'status': status}, format='json'
+            )
+
+    def test_snapshot_and_delta_feed(self):
+        """اختبار اللقطة الكاملة ثم التغييرات فقط"""
+        snapshot = self.client.get('/api/admin/kitchen/').json()
+        self.assertTrue(snapshot['reset'])
+        # Delivered orders are not in the kitchen; the quicker dish is due first
+        self.assertEqual(snapshot['queue'], [self.quick_order.id, self.slow_order.id])
+        self.assertEqual(snapshot['orders'][0]['items'], [['Salad', 2, '']])
+        self.assertEqual(snapshot['orders'][1]['prep_minutes'], 40)
+
+        self.assertEqual(self._set_status(self.slow_order, 'preparing').status_code, 200)
+        self._set_status(self.quick_order, 'cancelled')
+
+        delta = self.client.get(f"/api/admin/kitchen/?since={snapshot['version']}").json()
+        self.assertFalse(delta['reset'])
+        self.assertEqual([(t['id'], t['status']) for t in delta['orders']], [(self.slow_order.id, 'preparing')])
+        self.assertEqual(delta['removed'], [self.quick_order.id])
+        self.assertEqual(delta['queue'], [self.slow_order.id])
+
+        unchanged = self.client.get(f"/api/admin/kitchen/?since={delta['version']}").json()
+        self.assertEqual((unchanged['orders'], unchanged['removed']), ([], []))
+
+    @override_settings(KITCHEN_SYNC_INTERVAL=0)
+    def test_other_workers_changes_force_a_snapshot(self):
+        """اختبار إعادة التحميل عند تغيير عامل آخر للطلبات"""
+        from django.core.cache import cache
+        from .kitchen import SHARED_VERSION_KEY, _now_version
+
+        cache.delete(SHARED_VERSION_KEY)
+        snapshot = self.client.get('/api/admin/kitchen/').json()
+        # Another worker confirms an order: this process gets no message, only the shared version
+        Order.objects.filter(pk=self.slow_order.pk).update(status='confirmed')
+        cache.set(SHARED_VERSION_KEY, _now_version(), None)
+
+        feed = self.client.get(f"/api/admin/kitchen/?since={snapshot['version']}").json()
+        self.assertTrue(feed['reset'])
+        self.assertIn((self.slow_order.id, 'confirmed'), [(t['id'], t['status']) for t in feed['orders']])
+        # A version this worker never handed out (another worker's) also gets a snapshot
+        ahead = self.client.get(f"/api/admin/kitchen/?since={feed['version'] + 10 ** 6}").json()
+        self.assertTrue(ahead['reset'])
+        self.assertFalse(self.client.get(f"/api/admin/kitchen/?since={feed['version']}").json()['reset'])
+
+    def test_shared_version_is_stamped_at_commit(self):
+        """اختبار ختم الإصدار المشترك بعد الالتزام لا قبله"""
+        from django.core.cache import cache
+        from .kitchen import SHARED_VERSION_KEY, _now_version, kitchen_queue, publish_order
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.filter(pk=self.slow_order.pk).update(status='confirmed')
+            self.slow_order.status = 'confirmed'
+            publish_order(self.slow_order)
+            # Another worker reloading now cannot see the uncommitted row yet
+            other_worker_loaded = _now_version()
+        self.assertGreater(cache.get(SHARED_VERSION_KEY), other_worker_loaded)
+        self.assertEqual(kitchen_queue.version, cache.get(SHARED_VERSION_KEY))
+
+    def test_invalid_transition(self):
+        """اختبار رفض الانتقالات غير المسموحة"""
+        self._set_status(self.quick_order, 'ready')
+        response = self._set_status(self.quick_order, 'pending')
+        self.assertEqual(response.status_code, 400)
+        self.quick_order.refresh_from_db()
+        self.assertEqual(self.quick_order.status, 'ready')
+
+        # The plain order update follows the same flow
+        response = self.client.patch(f'/api/admin/orders/{self.quick_order.id}/', {'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.json())
+        self.quick_order.refresh_from_db()
+        self.assertEqual(self.quick_order.status, 'ready')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/admin/orders/{self.quick_order.id}/', {'status': 'delivered'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(KITCHEN_STATIONS=1, DELIVERY_MINUTES=30)
+class OrderETATestCase(APITestCase):
+    """اختبار تقدير وقت تجهيز الطلب وتوصيله"""
+
+    def setUp(self):
+        from .eta import eta_engine
+
+        self.admin = User.objects.create_superuser(username='expo', email='expo@example.com', password='x')
+        user = User.objects.create_user(username='hungry', password='x')
+        self.customer = Customer.objects.create(user=user, phone='0', address='addr')
+        category = Category.objects.create(name="Grill")
+        self.dish = Dish.objects.create(name="Kebab", price=Decimal('20'), category=category, preparation_time=20)
+        self.side = Dish.objects.create(name="Rice", price=Decimal('4'), category=category, preparation_time=10)
+
+        eta_engine.load()
+        self.client.force_authenticate(self.admin)
+
+    def _order(self, *dishes):
+        from .eta import update_order_eta
+
+        order = Order.objects.create(customer=self.customer, total_amount=Decimal('20'), delivery_address='a')
+        for dish in dishes:
+            OrderItem.objects.create(order=order, dish=dish, quantity=1, price=dish.price)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save(update_fields=update_order_eta(order))
+        return order
+
+    def test_orders_queue_on_busy_station(self):
+        """اختبار انتظار الطلب الثاني حتى تفرغ المحطة"""
+        from datetime import timedelta
+
+        first = self._order(self.dish, self.side)
+        second = self._order(self.side)
+
+        # The slowest dish decides; the only station is busy until the first is done
+        self.assertAlmostEqual(
+            (first.estimated_ready_time - first.order_date).total_seconds(), 1200, delta=1
+        )
+        self.assertAlmostEqual(
+            (second.estimated_ready_time - first.estimated_ready_time).total_seconds(), 600, delta=1
+        )
+        self.assertEqual(second.estimated_delivery_time - second.estimated_ready_time, timedelta(minutes=30))
+
+    def test_ready_order_frees_station(self):
+        """اختبار تقدم الطلبات المنتظرة عند جهوزية الطلب السابق"""
+        first = self._order(self.dish)
+        second = self._order(self.side)
+        queued_at = second.estimated_ready_time
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/admin/orders/{first.id}/update_status/', {'status': 'ready'}, format='json')
+            self.client.patch(f'/api/admin/orders/{second.id}/update_status/', {'status': 'preparing'}, format='json')
+
+        second.refresh_from_db()
+        self.assertLess(second.estimated_ready_time, queued_at)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/admin/orders/{first.id}/update_status/', {'status': 'delivered'}, format='json')
+        first.refresh_from_db()
+        self.assertIsNotNone(first.actual_delivery_time)
+
+        response = self.client.get(f'/api/admin/orders/{second.id}/')
+        self.assertEqual(response.json()['estimated_ready_time'][:19], second.estimated_ready_time.isoformat()[:19])
+
+
+    @override_settings(KITCHEN_SYNC_INTERVAL=0)
+    def test_other_workers_orders_are_loaded(self):
+        """اختبار إعادة تحميل المحطات عند إضافة عامل آخر لطلب"""
+        from django.core.cache import cache
+        from .eta import eta_engine
+        from .kitchen import SHARED_VERSION_KEY, _now_version
+
+        cache.delete(SHARED_VERSION_KEY)
+        self.assertEqual(eta_engine.load_minutes(), [0])
+        # Another worker takes an order: this process gets no message, only the shared version
+        order = Order.objects.create(customer=self.customer, total_amount=Decimal('20'), delivery_address='a')
+        OrderItem.objects.create(order=order, dish=self.dish, quantity=1, price=self.dish.price)
+        cache.set(SHARED_VERSION_KEY, _now_version(), None)
+        self.assertEqual(eta_engine.load_minutes(), [20])
+
+    def test_rolled_back_change_leaves_stations_alone(self):
+        """اختبار عدم حجز محطة لطلب أُلغيت معاملته"""
+        from django.db import transaction
+        from .eta import eta_engine, update_order_eta
+
+        order = Order.objects.create(customer=self.customer, total_amount=Decimal('20'), delivery_address='a')
+        OrderItem.objects.create(order=order, dish=self.dish, quantity=1, price=self.dish.price)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    order.save(update_fields=update_order_eta(order))
+                    raise ValueError('write failed')
+            except ValueError:
+                pass
+        self.assertEqual(callbacks, [])
+        # The estimate was made, but the station is still free
+        self.assertIsNotNone(order.estimated_ready_time)
+        self.assertEqual(eta_engine.load_minutes(), [0])
+
+
+class BulkAdminTestCase(APITestCase):
+    """اختبار عمليات الإدارة الجماعية"""
+
+    def setUp(self):
+        from .eta import eta_engine
+
+        self.admin = User.objects.create_superuser(username='boss', email='boss@example.com', password='x')
+        user = User.objects.create_user(username='diner', password='x')
+        self.customer = Customer.objects.create(user=user, phone='0', address='addr')
+        self.category = Category.objects.create(name="Bulk")
+        self.dishes = [
+            Dish.objects.create(
+                name=f"Dish {i}", price=Decimal('10'), category=self.category, stock_quantity=20
+            )
+            for i in range(3)
+        ]
+        self.orders = []
+        for _ in range(3):
+            order = Order.objects.create(customer=self.customer, total_amount=Decimal('10'), delivery_address='a')
+            OrderItem.objects.create(order=order, dish=self.dishes[0], quantity=1, price=Decimal('10'))
+            self.orders.append(order)
+
+        eta_engine.load()
+        self.client.force_authenticate(self.admin)
+
+    def test_bulk_dish_update(self):
+        """اختبار تحديث عدة أطباق في طلب واحد"""
+        from django.core.cache import cache
+        from .models import Notification
+
+        cache.set(f'category_available_dishes_count_{self.category.id}', 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/admin/dishes/bulk/', {'updates': [
+                {'id': self.dishes[0].id, 'is_available': False},
+                {'id': self.dishes[1].id, 'price': '12.50', 'stock_quantity': 1},
+            ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 2)
+
+        self.dishes[0].refresh_from_db()
+        self.dishes[1].refresh_from_db()
+        self.assertFalse(self.dishes[0].is_available)
+        self.assertEqual(self.dishes[1].price, Decimal('12.50'))
+        self.assertTrue(self.dishes[1].is_low_stock)
+        self.assertIsNone(cache.get(f'category_available_dishes_count_{self.category.id}'))
+        self.assertTrue(Notification.objects.filter(user=self.admin, notification_type='stock_low').exists())
+
+    def test_bulk_dish_update_rejects_unknown_ids(self):
+        """اختبار رفض الدفعة كاملة عند وجود معرف غير موجود"""
+        response = self.client.post('/api/admin/dishes/bulk/', {'updates': [
+            {'id': self.dishes[0].id, 'is_available': False},
+            {'id': 999999, 'is_available': False},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999999', response.json()['details'])
+        self.dishes[0].refresh_from_db()
+        self.assertTrue(self.dishes[0].is_available)
+
+    def test_bulk_order_status(self):
+        """اختبار تحديث حالة عدة طلبات مع إشعار كل عميل"""
+        from .models import Notification
+
+        ids = [order.id for order in self.orders]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/admin/orders/bulk-status/', {'ids': ids, 'status': 'confirmed'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertEqual(set(Order.objects.filter(id__in=ids).values_list('status', flat=True)), {'confirmed'})
+        self.assertEqual(Notification.objects.filter(notification_type='order_confirmed').count(), 3)
+        self.assertFalse(Order.objects.filter(id__in=ids, estimated_ready_time__isnull=True).exists())
+
+        # One invalid transition rejects the whole batch
+        response = self.client.post('/api/admin/orders/bulk-status/', {'updates': [
+            {'id': ids[0], 'status': 'preparing'},
+            {'id': ids[1], 'status': 'pending'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['details']), [str(ids[1])])
+        self.assertEqual(Order.objects.get(id=ids[0]).status, 'confirmed')
+
+
+class MenuImportExportTestCase(APITestCase):
+    """اختبار استيراد وتصدير القائمة"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='menu', email='menu@example.com', password='x')
+        self.client.force_authenticate(self.admin)
+
+    def test_command_round_trip(self):
+        """اختبار الاستيراد من CSV ثم التصدير إلى JSONL"""
+        import json
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(f'{tmp}/categories.csv', 'w') as f:
+                f.write("slug,name,description\nsoups,Soups,Hot\n")
+            with open(f'{tmp}/dishes.csv', 'w') as f:
+                f.write(
+                    "slug,name,category,price,stock_quantity\n"
+                    "lentil,Lentil Soup,soups,4.50,2\n"
+                    ",Tomato Soup,soups,3.00,\n"
+                    "bad,Bad Soup,soups,-1,\n"
+                    "lost,Lost Soup,nowhere,3.00,\n"
+                )
+            call_command('import_menu', 'categories', f'{tmp}/categories.csv', stdout=io.StringIO())
+            err = io.StringIO()
+            call_command('import_menu', 'dishes', f'{tmp}/dishes.csv', stdout=io.StringIO(), stderr=err)
+            self.assertIn('line 4', err.getvalue())
+            self.assertIn('line 5', err.getvalue())
+
+            out = f'{tmp}/dishes.jsonl'
+            call_command('export_menu', 'dishes', '--format', 'jsonl', '--output', out, stderr=io.StringIO())
+            with open(out) as f:
+                rows = [json.loads(line) for line in f]
+
+        self.assertEqual([row['slug'] for row in rows], ['lentil', 'tomato-soup'])
+        self.assertEqual(rows[0]['category'], 'soups')
+        self.assertEqual(rows[0]['price'], '4.50')
+        self.assertTrue(Dish.objects.get(slug='lentil').is_low_stock)
+
+    def test_endpoint_upserts_by_slug(self):
+        """اختبار تحديث الأطباق الموجودة عبر واجهة الاستيراد"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        category = Category.objects.create(name="Drinks", slug="drinks")
+        Dish.objects.create(name="Tea", slug="tea", price=Decimal('2'), category=category, description='old')
+
+        upload = SimpleUploadedFile(
+            'dishes.jsonl',
+            b'{"slug": "tea", "name": "Mint Tea", "category": "drinks", "price": "2.50"}\n'
+            b'{"name": "Coffee", "category": "drinks", "price": "3"}\n'
+            b'not json\n'
+        )
+        response = self.client.post('/api/admin/menu/import/', {'kind': 'dishes', 'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(response.json()['errors'][0]['line'], 3)
+        self.assertEqual(Dish.objects.get(slug='tea').name, 'Mint Tea')
+
+        response = self.client.get('/api/admin/menu/export/?kind=dishes&file_format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body.splitlines()[0].split(',')[:3], ['slug', 'name', 'category'])
+        self.assertIn('coffee,Coffee,drinks', body)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        """اختبار بث تصدير القائمة بمكرر غير متزامن تحت ASGI"""
+        import json
+        from asgiref.sync import sync_to_async
+
+        category = await sync_to_async(Category.objects.create)(name='Drinks', slug='drinks')
+        await sync_to_async(Dish.objects.create)(name='Coffee', slug='coffee', price=Decimal('2.00'), category=category)
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get('/api/admin/menu/export/?kind=dishes&file_format=jsonl')
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(json.loads(body.splitlines()[0])['slug'], 'coffee')
+
+    def test_non_utf8_upload_is_rejected(self):
+        """اختبار رفض الملفات غير المرمزة بـ UTF-8"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        Category.objects.create(name="Drinks", slug="drinks")
+        upload = SimpleUploadedFile(
+            'dishes.csv', 'slug,name,category,price\ntea,Tea,drinks,2\ncafe,Café,drinks,3\n'.encode('latin-1')
+        )
+        response = self.client.post('/api/admin/menu/import/', {'kind': 'dishes', 'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 3', response.json()['error'])
+        self.assertFalse(Dish.objects.exists())
+
+    def test_partial_import_keeps_other_fields(self):
+        """اختبار عدم تغيير الحقول غير المذكورة في ملف الاستيراد"""
+        from .menu_io import import_menu
+
+        category = Category.objects.create(name="Mains", slug="mains")
+        Dish.objects.create(
+            name="Stew", slug="stew", price=Decimal('9'), category=category, description='Slow cooked',
+            stock_quantity=50, preparation_time=30, is_spicy=True,
+        )
+        report = import_menu('dishes', ['slug,name,category,price,description\n', 'stew,Beef Stew,mains,11.50,\n'], 'csv')
+        self.assertEqual((report.updated, report.error_count), (1, 0))
+        dish = Dish.objects.get(slug='stew')
+        self.assertEqual((dish.name, dish.price), ('Beef Stew', Decimal('11.50')))
+        self.assertEqual(
+            (dish.description, dish.stock_quantity, dish.preparation_time, dish.is_spicy, dish.is_low_stock),
+            ('Slow cooked', 50, 30, True, False),
+        )
+
+        import_menu('dishes', ['{"slug": "stew", "stock_quantity": 2}\n'], 'jsonl')
+        dish.refresh_from_db()
+        self.assertEqual((dish.name, dish.stock_quantity, dish.is_low_stock), ('Beef Stew', 2, True))
+
+
+class OrderExportTestCase(APITestCase):
+    """اختبار تصدير الطلبات للمحاسبة"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='acct', email='acct@example.com', password='x')
+        user = User.objects.create_user(username='payer', email='payer@example.com', password='x')
+        customer = Customer.objects.create(user=user, phone='0', address='addr')
+        category = Category.objects.create(name="Export")
+        self.dish = Dish.objects.create(name="Falafel", price=Decimal('3.50'), category=category)
+        self.order = Order.objects.create(
+            customer=customer, total_amount=Decimal('10.50'), delivery_address='a', payment_status='paid'
+        )
+        OrderItem.objects.create(order=self.order, dish=self.dish, quantity=3, price=Decimal('3.50'))
+        # No items: still exported, with empty item columns
+        Order.objects.create(customer=customer, total_amount=Decimal('0'), delivery_address='a')
+        self.client.force_authenticate(self.admin)
+
+    def _export(self, **params):
+        from django.utils import timezone
+
+        today = timezone.localdate().isoformat()
+        params = {'start': today, 'end': today, **params}
+        return self.client.get('/api/admin/orders/export/', params)
+
+    def test_csv_rows_join_items(self):
+        """اختبار صف لكل عنصر مع بيانات الطلب"""
+        import csv
+
+        response = self._export()
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['order_id'], str(self.order.id))
+        self.assertEqual(rows[0]['dish_name'], 'Falafel')
+        self.assertEqual(Decimal(rows[0]['line_total']), Decimal('10.50'))
+        self.assertEqual(rows[1]['item_id'], '')
+
+    def test_columnar_and_filters(self):
+        """اختبار الصيغة العمودية وتصفية حالة الدفع والتواريخ"""
+        import json
+
+        response = self._export(file_format='columnar', payment_status='paid')
+        batches = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(batches[0]['rows'], 1)
+        self.assertEqual(batches[0]['columns']['quantity'], [3])
+
+        empty = self._export(start='2020-01-01', end='2020-01-31')
+        self.assertEqual(len(b''.join(empty.streaming_content).splitlines()), 1)
+        self.assertEqual(self._export(end='2020-02-30').status_code, 400)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        """اختبار بث التصدير بمكرر غير متزامن تحت ASGI بدلاً من جمعه في الذاكرة"""
+        from django.utils import timezone
+
+        await self.async_client.aforce_login(self.admin)
+        today = timezone.localdate().isoformat()
+        response = await self.async_client.get('/api/admin/orders/export/', {'start': today, 'end': today})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(body.splitlines()), 3)
+        self.assertIn('Falafel', body)
+
+
+class GenerateLoadDataTestCase(TestCase):
+    """اختبار توليد بيانات اختبار الحمل"""
+
+    def test_generates_consistent_rows(self):
+        """اختبار توليد العملاء والطلبات والتقييمات بأحجام دفعات صغيرة"""
+        from django.core.management import call_command
+        from django.db.models import Count, F, Sum
+        from django.utils import timezone
+        from .models import DishRating, Notification
+
+        call_command(
+            'generate_load_data', customers=30, orders=120, ratings=40, dishes=12,
+            days=7, batch_size=50, stdout=io.StringIO(),
+        )
+        self.assertEqual(Customer.objects.count(), 30)
+        self.assertEqual(Order.objects.count(), 120)
+        self.assertEqual(DishRating.objects.count(), 40)
+        self.assertEqual(Notification.objects.count(), 120)
+
+        # Every order has items adding up to its total, placed within the window
+        self.assertFalse(Order.objects.annotate(n=Count('orderitem')).filter(n=0).exists())
+        order = Order.objects.annotate(
+            items_total=Sum(F('orderitem__quantity') * F('orderitem__price'))
+        ).first()
+        self.assertEqual(order.items_total, order.total_amount)
+        self.assertLess(Order.objects.order_by('-order_date').first().order_date, timezone.now())
+        self.assertTrue(User.objects.get(username='load00000000').check_password('loadtest'))
+
+    def test_ids_do_not_depend_on_write_order(self):
+        """اختبار ثبات المعرفات وأرقام الطلبات في الإشعارات مهما كان ترتيب الكتابة"""
+        from datetime import date, datetime, timezone
+        from unittest import mock
+        from django.core.management import call_command
+        from .management.commands import generate_load_data
+        from .models import Notification
+
+        def generate():
+            call_command(
+                'generate_load_data', customers=20, orders=60, ratings=0, dishes=6,
+                days=7, batch_size=15, base_date=date(2026, 1, 15), stdout=io.StringIO(),
+            )
+            rows = (
+                list(User.objects.filter(username__startswith='load').order_by('pk').values_list('pk', 'username')),
+                list(Order.objects.order_by('pk').values_list('pk', 'customer_id', 'total_amount', 'order_date')),
+                sorted(Notification.objects.values_list('user_id', 'message')),
+            )
+            User.objects.filter(username__startswith='load').delete()
+            Category.objects.all().delete()
+            return rows
+
+        in_order = generate()
+        # Dated from the base date, not from the day the test runs
+        dates = [row[3] for row in in_order[1]]
+        self.assertGreaterEqual(min(dates), datetime(2026, 1, 8, tzinfo=timezone.utc))
+        self.assertLess(max(dates), datetime(2026, 1, 15, tzinfo=timezone.utc))
+        blocks = generate_load_data._blocks
+        with mock.patch.object(generate_load_data, '_blocks', lambda total, size: blocks(total, size)[::-1]):
+            self.assertEqual(generate(), in_order)
+
+
+class StructuredLoggingTestCase(TestCase):
+    """اختبار السجلات المنظمة والعينات والمعالج الخلفي"""
+
+    def test_event_sampling_keeps_warnings(self):
+        """اختبار أن العينة تسقط أحداث DEBUG ولا تسقط التحذيرات"""
+        from .log import EventLogger
+
+        with override_settings(LOG_SAMPLE_RATES={'restaurant.tests.sampled': 0}):
+            log = EventLogger('restaurant.tests.sampled')
+            with self.assertLogs('restaurant.tests.sampled', level='DEBUG') as captured:
+                log.debug('dish_saved', id=1)
+                log.warning('insufficient_stock', dish=1, available=0, requested=2)
+        self.assertEqual(captured.output, [
+            'WARNING:restaurant.tests.sampled:insufficient_stock dish=1 available=0 requested=2'
+        ])
+        self.assertEqual(captured.records[0].fields, {'dish': 1, 'available': 0, 'requested': 2})
+
+    def test_background_handler_writes_on_listener(self):
+        """اختبار أن المعالج الخلفي ينسق ويكتب السجلات في خيط المستمع"""
+        import logging
+        import threading
+        from .log import BackgroundHandler
+
+        formatted_on = []
+
+        class RecordingFormatter(logging.Formatter):
+            def format(self, record):
+                formatted_on.append(threading.current_thread())
+                return super().format(record)
+
+        stream = io.StringIO()
+        handler = BackgroundHandler('logging.StreamHandler', stream=stream)
+        handler.setFormatter(RecordingFormatter('%(levelname)s %(message)s'))
+        logger = logging.getLogger('restaurant.tests.background')
+        logger.addHandler(handler)
+        try:
+            logger.warning('order %s ready', 7)
+            handler.flush()
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+        self.assertEqual(stream.getvalue(), 'WARNING order 7 ready\n')
+        self.assertNotIn(threading.current_thread(), formatted_on)
+
+
+class ConditionalMenuTestCase(APITestCase):
+    """اختبار ETag والطلبات الشرطية لبيانات القائمة"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Conditional Category")
+        self.dish = Dish.objects.create(
+            name="Conditional Dish",
+            description="Served once per version",
+            price=Decimal('9.00'),
+            category=self.category,
+            stock_quantity=10
+        )
+
+    def test_not_modified_before_any_query(self):
+        """اختبار الاستجابة 304 دون أي استعلام عند تطابق ETag"""
+        for path in ['/api/dishes/', f'/api/dishes/{self.dish.id}/', '/api/categories/',
+                     '/api/restaurants/', '/api/menu-overview/']:
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['ETag'].startswith('"'))
+                self.assertIn('Last-Modified', response)
+                self.assertIn('no-cache', response['Cache-Control'])
+
+                with self.assertNumQueries(0):
+                    repeat = self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(repeat.status_code, 304)
+                self.assertEqual(repeat['ETag'], response['ETag'])
+                self.assertEqual(repeat.content, b'')
+
+    def test_writes_change_the_etag(self):
+        """اختبار تغير ETag بعد تعديل طبق أو إضافة تقييم"""
+        etag = self.client.get('/api/dishes/')['ETag']
+        self.assertNotEqual(self.client.get('/api/dishes/?page=1')['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dish.stock_quantity = 3
+            self.dish.save()
+        response = self.client.get('/api/dishes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        customer = Customer.objects.create(user=User.objects.create_user(username='c'), phone='0', address='a')
+        with self.captureOnCommitCallbacks(execute=True):
+            DishRating.objects.create(dish=self.dish, customer=customer, rating=5)
+        self.assertEqual(self.client.get('/api/dishes/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_async_views_share_etags(self):
+        """اختبار تطابق ETag بين العروض غير المتزامنة وعروض DRF"""
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncRequestFactory
+        from . import async_views
+
+        etag = self.client.get('/api/menu-overview/')['ETag']
+        request = AsyncRequestFactory().get('/api/menu-overview/', headers={'If-None-Match': etag})
+        response = async_to_sync(async_views.menu_overview)(request)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+
+class PrecompressedResponseTestCase(APITestCase):
+    """اختبار تخزين استجابات القائمة مضغوطة مسبقاً"""
+
+    def setUp(self):
+        category = Category.objects.create(name="Compressed Category")
+        for i in range(5):
+            Dish.objects.create(
+                name=f"Compressed Dish {i}",
+                description="Same bytes for every visitor " * 5,
+                price=Decimal('7.00'),
+                category=category,
+                stock_quantity=10
+            )
+
+    def test_serves_stored_encodings(self):
+        """اختبار تقديم gzip وbrotli المخزنين دون استعلامات أو ضغط لكل طلب"""
+        import gzip
+        from . import response_cache
+
+        plain = self.client.get('/api/dishes/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        for encoding, decode in [('gzip', gzip.decompress), ('br', getattr(response_cache.brotli, 'decompress', None))]:
+            if decode is None:
+                continue
+            with self.subTest(encoding=encoding):
+                with self.assertNumQueries(0):
+                    response = self.client.get('/api/dishes/', HTTP_ACCEPT_ENCODING=f'{encoding}, deflate')
+                self.assertEqual(response['Content-Encoding'], encoding)
+                self.assertEqual(decode(response.content), plain.content)
+                self.assertLess(len(response.content), len(plain.content))
+                self.assertEqual(response['ETag'], plain['ETag'][:-1] + f'-{encoding}"')
+
+        self.assertFalse(self.client.get('/api/dishes/', HTTP_ACCEPT_ENCODING='gzip;q=0').has_header('Content-Encoding'))
+
+    def test_new_version_is_rendered_again(self):
+        """اختبار إعادة بناء الاستجابة بعد تعديل القائمة"""
+        import gzip
+
+        before = self.client.get('/api/dishes/', HTTP_ACCEPT_ENCODING='gzip')
+        Dish.objects.filter(name="Compressed Dish 0").first().delete()
+        after = self.client.get('/api/dishes/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertNotIn(b"Compressed Dish 0", gzip.decompress(after.content))
+
+    def test_stock_changes_keep_the_menu_version(self):
+        """اختبار بقاء نسخة القائمة عند نقص المخزون ما لم ينفد الطبق أو يقل"""
+        dish = Dish.objects.get(name="Compressed Dish 0")
+        etag = self.client.get('/api/dishes/')['ETag']
+        self.assertTrue(dish.reduce_stock(2))
+        self.assertEqual(self.client.get('/api/dishes/')['ETag'], etag)
+        dish.refresh_from_db()
+        self.assertEqual(dish.stock_quantity, 8)
+        # Down to the low stock threshold: the menu shows it
+        self.assertTrue(dish.reduce_stock(3))
+        self.assertTrue(Dish.objects.get(pk=dish.pk).is_low_stock)
+        self.assertNotEqual(self.client.get('/api/dishes/')['ETag'], etag)
+
+    def test_concurrent_misses_render_once(self):
+        """اختبار انتظار الطلبات المتزامنة لاستجابة يبنيها طلب آخر"""
+        from unittest import mock
+        from . import response_cache
+
+        # The request that rendered the entry released its claim
+        digest = self.client.get('/api/dishes/?page=1')['ETag'].strip('"')
+        self.assertTrue(response_cache.claim(digest))
+        self.assertFalse(response_cache.claim(digest))
+
+        # Another worker holds the claim: wait for its entry instead of rendering
+        elsewhere = {'content_type': 'application/json', 'identity': b'{"from": "elsewhere"}'}
+        with mock.patch.object(response_cache, 'claim', return_value=False), \
+                mock.patch.object(response_cache, 'lookup', side_effect=[None, None, elsewhere]), \
+                self.assertNumQueries(0):
+            response = self.client.get('/api/dishes/?page=2')
+        self.assertEqual(response.content, b'{"from": "elsewhere"}')
+
+
+class FastJSONTestCase(APITestCase):
+    """اختبار تطابق مُصيّر ومحلل orjson مع مُصيّر DRF القياسي"""
+
+    def _payload(self):
+        import datetime
+        import uuid
+        from django.utils import timezone
+        from django.utils.translation import gettext_lazy
+
+        return {
+            'price': Decimal('12.50'),
+            'ordered_at': timezone.now(),
+            'naive': datetime.datetime(2024, 1, 2, 3, 4, 5, 678901),
+            'day': datetime.date(2024, 1, 1),
+            'at': datetime.time(10, 30, 1, 5),
+            'wait': datetime.timedelta(minutes=25),
+            'token': uuid.UUID(int=7),
+            'label': gettext_lazy('Menu'),
+            'name': 'طبق اليوم  ',
+            7: [0.1, 3.0, -0.0, 123456789.123, None, True, {'nested': 'x'}],
+        }
+
+    def test_renderer_matches_drf_bytes(self):
+        """اختبار إنتاج نفس البايتات مع orjson وبدونه"""
+        from unittest import mock
+        from rest_framework.renderers import JSONRenderer
+        from . import renderers
+
+        payload = self._payload()
+        expected = JSONRenderer().render(payload)
+        self.assertEqual(renderers.FastJSONRenderer().render(payload), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(payload), expected)
+        # Too large for orjson: falls back instead of failing
+        self.assertEqual(renderers.FastJSONRenderer().render({'n': 2 ** 70}), b'{"n":1180591620717411303424}')
+
+    def test_api_responses_match_drf_bytes(self):
+        """اختبار تطابق استجابات الأطباق والطلبات مع JSONRenderer"""
+        from rest_framework.renderers import JSONRenderer
+
+        category = Category.objects.create(name="JSON Category")
+        Dish.objects.create(name="JSON Dish", description="", price=Decimal('10.25'), category=category)
+        for path in ['/api/dishes/', '/api/categories/']:
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_parser_matches_json_module(self):
+        """اختبار تطابق نتائج التحليل والأخطاء مع JSONParser"""
+        from rest_framework.exceptions import ParseError
+        from rest_framework.parsers import JSONParser
+        from .renderers import FastJSONParser
+
+        for raw in [
+            '{"total": 1.10, "items": [1, {"name": "شاي"}]}'.encode(),
+            b'{"id": 123456789012345678901234567890}',
+        ]:
+            self.assertEqual(FastJSONParser().parse(io.BytesIO(raw)), JSONParser().parse(io.BytesIO(raw)))
+        for raw in [b'{"a": NaN}', b'{bad']:
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(raw))
+
+
+class CompiledSerializerTestCase(APITestCase):
+    """اختبار تطابق المسلسلات المُجمّعة مع مسلسلات DRF بايتاً ببايت"""
+
+    def setUp(self):
+        from .models import Notification
+
+        self.user = User.objects.create_user(username='compiled', password='pass12345', email='c@example.com')
+        self.customer = Customer.objects.create(user=self.user, phone='123', address='Street 1')
+        category = Category.objects.create(name="Compiled Category")
+        spicy = Dish.objects.create(
+            name="طبق حار", description="", price=Decimal('12.75'), category=category,
+            calories=450, is_spicy=True, stock_quantity=3,
+        )
+        plain = Dish.objects.create(name="Plain Dish", description="Line break", price=Decimal('8'), category=category)
+        DishRating.objects.create(dish=spicy, customer=self.customer, rating=4)
+        for status, payment in [('pending', 'pending'), ('delivered', 'paid')]:
+            order = Order.objects.create(
+                customer=self.customer, status=status, payment_status=payment,
+                total_amount=Decimal('21.50'), delivery_address='Street 1',
+            )
+            OrderItem.objects.create(order=order, dish=spicy, quantity=1, price=Decimal('12.75'))
+            OrderItem.objects.create(order=order, dish=plain, quantity=2, price=Decimal('4.38'))
+        Notification.objects.create(user=self.user, title="Ready", message="Your order is ready", notification_type='order_ready')
+
+    def test_compiled_output_matches_drf_bytes(self):
+        """اختبار تطابق مخرجات الأطباق والطلبات والإشعارات والفئات"""
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIRequestFactory
+        from .compiled import compiled
+        from .models import Notification
+        from .serializers import CategorySerializer, DishSerializer, NotificationSerializer, OrderSerializer
+
+        context = {'request': APIRequestFactory().get('/api/dishes/')}
+        cases = [
+            (DishSerializer, Dish.objects.select_related('category').prefetch_related('dishrating_set')),
+            (CategorySerializer, Category.objects.all()),
+            (OrderSerializer, Order.objects.select_related('customer__user').prefetch_related('orderitem_set__dish')),
+            (NotificationSerializer, Notification.objects.select_related('user')),
+        ]
+        for serializer_class, queryset in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                instances = list(queryset)
+                expected = JSONRenderer().render(serializer_class(instances, many=True, context=context).data)
+                self.assertEqual(JSONRenderer().render(compiled(serializer_class).many(instances, context)), expected)
+                self.assertEqual(
+                    JSONRenderer().render(compiled(serializer_class).one(instances[0], context)),
+                    JSONRenderer().render(serializer_class(instances[0], context=context).data),
+                )
+
+    def test_list_endpoints_match_drf_list(self):
+        """اختبار تطابق استجابات القوائم مع ListModelMixin الأصلي"""
+        from unittest import mock
+        from rest_framework.mixins import ListModelMixin
+        from .compiled import CompiledListMixin
+
+        self.client.force_authenticate(user=self.user)
+        for path in ['/api/dishes/', '/api/dishes/?ordering=-price', '/api/orders/', '/api/notifications/']:
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertGreater(response.data['count'], 0)
+                compiled_body = response.content
+                with mock.patch.object(CompiledListMixin, 'list', ListModelMixin.list):
+                    self.assertEqual(compiled_body, self.client.get(path).content)
+
+    def test_uncompilable_source_is_refused(self):
+        """اختبار رفض المصادر التي لا يمكن تجميعها بدلاً من مخرجات مختلفة"""
+        from django.core.exceptions import ImproperlyConfigured
+        from rest_framework import serializers
+        from .compiled import CompiledSerializer
+
+        class MissingSourceSerializer(serializers.ModelSerializer):
+            nickname = serializers.CharField(source='missing')
+
+            class Meta:
+                model = Dish
+                fields = ['id', 'nickname']
+
+        with self.assertRaises(ImproperlyConfigured):
+            CompiledSerializer(MissingSourceSerializer)
+
+
+class RateLimitTestCase(APITestCase):
+    """اختبار تحديد معدل الطلبات لنقاط الدخول والتسجيل والتواصل والدفع"""
+
+    def setUp(self):
+        from .ratelimit import local_store
+        local_store.clear()
+        self.addCleanup(local_store.clear)
+
+    def test_login_rejected_before_queries_and_hashing(self):
+        """اختبار رفض محاولات الدخول الزائدة قبل أي استعلام أو تجزئة"""
+        import json
+        from unittest import mock
+
+        User.objects.create_user(username='limited', password='right-password', email='limited@example.com')
+        body = json.dumps({'identity': 'Limited', 'password': 'wrong'})
+        with override_settings(RATE_LIMITS={'login-ip': '30/m', 'login-identity': '2/m'}):
+            for _ in range(2):
+                response = self.client.post('/api/login/', body, content_type='application/json')
+                self.assertEqual(response.status_code, 401)
+            with mock.patch.object(User, 'check_password') as check_password, self.assertNumQueries(0):
+                response = self.client.post('/api/login/', body.replace('Limited', ' limited '), content_type='application/json')
+            check_password.assert_not_called()
+            self.assertEqual(response.status_code, 429)
+            self.assertGreaterEqual(int(response['Retry-After']), 1)
+            # Other identities are counted separately
+            other = json.dumps({'identity': 'someone-else', 'password': 'wrong'})
+            self.assertEqual(self.client.post('/api/login/', other, content_type='application/json').status_code, 401)
+
+    def test_shared_store_is_keyed_by_ip(self):
+        """اختبار العدادات المشتركة بين العمال ومفتاح عنوان IP"""
+        import os
+
+        message = {'name': 'Visitor', 'email': 'v@example.com', 'subject': 'Hi', 'message': 'Hello'}
+        path = os.path.join(tempfile.mkdtemp(), 'ratelimit.sqlite3')
+        with override_settings(RATE_LIMIT_DB=path, RATE_LIMIT_STORE='shared', RATE_LIMITS={'contact': '1/m'}):
+            self.assertEqual(self.client.post('/api/contact/', message, format='json').status_code, 201)
+            self.assertEqual(self.client.post('/api/contact/', message, format='json').status_code, 429)
+            self.assertEqual(
+                self.client.post('/api/contact/', message, format='json', REMOTE_ADDR='10.0.0.2').status_code, 201
+            )
+            # Behind the proxy every request comes from its address; the forwarded-for header tells clients apart
+            forwarded = {'REMOTE_ADDR': '10.0.0.1', 'HTTP_X_FORWARDED_FOR': '203.0.113.9, 10.0.0.7'}
+            self.assertEqual(self.client.post('/api/contact/', message, format='json', **forwarded).status_code, 201)
+            self.assertEqual(self.client.post('/api/contact/', message, format='json', **forwarded).status_code, 429)
+            # Not counted in this process: the limit holds for every worker sharing the file
+            from .ratelimit import local_store
+            self.assertEqual(local_store._buckets, {})
+
+    def test_shared_store_counts_concurrent_hits_exactly(self):
+        """اختبار عدم ضياع أي زيادة عند تزامن الطلبات"""
+        import os
+        import threading
+        from .ratelimit import SharedStore
+
+        store, allowed = SharedStore(), []
+        path = os.path.join(tempfile.mkdtemp(), 'ratelimit.sqlite3')
+
+        def burst():
+            for _ in range(10):
+                # A fresh store per thread: its own connection, as in another worker
+                if SharedStore().hit('burst', 25, 60, 30) == 0:
+                    allowed.append(1)
+
+        with override_settings(RATE_LIMIT_DB=path):
+            threads = [threading.Thread(target=burst) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(allowed), 25)
+            # Waiting out the window lets the key through again
+            self.assertEqual(store.hit('burst', 25, 60, 150), 0)
+
+    def test_checkout_is_keyed_without_loading_the_session(self):
+        """اختبار تحديد مفتاح حد الدفع دون تحميل الجلسة"""
+        from django.conf import settings
+        from django.db import connection
+        from django.test import RequestFactory
+        from django.test.utils import CaptureQueriesContext
+        from .ratelimit import session_or_ip
+
+        self.client.force_login(User.objects.create_user(username='buyer', password='pass12345'))
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        request = RequestFactory().post('/api/checkout/', REMOTE_ADDR='10.0.0.3')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = cookie
+        with CaptureQueriesContext(connection) as queries:
+            key = session_or_ip(request)
+        self.assertEqual(len(queries), 0)
+        self.assertTrue(key.startswith('session:'))
+        self.assertNotIn(cookie, key)
+
+        # The header counts as the same session as the cookie
+        header_request = RequestFactory().post('/api/checkout/', HTTP_X_SESSION_KEY=cookie, REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(session_or_ip(header_request), key)
+        self.assertEqual(session_or_ip(RequestFactory().post('/api/checkout/', REMOTE_ADDR='10.0.0.3')), 'ip:10.0.0.3')
+
+        # Every request is also counted per address
+        with override_settings(RATE_LIMITS={'checkout': '', 'checkout-ip': '1/m'}):
+            self.client.post('/api/stripe/create-checkout-session/', {}, format='json', REMOTE_ADDR='10.0.0.4')
+            response = self.client.post('/api/stripe/create-checkout-session/', {}, format='json', REMOTE_ADDR='10.0.0.4')
+            self.assertEqual(response.status_code, 429)
+
+    def test_token_bucket_refills(self):
+        """اختبار إعادة ملء دلو الرموز مع مرور الوقت"""
+        from .ratelimit import LocalStore, parse_rate
+
+        self.assertEqual(parse_rate('5/10m'), (5, 600))
+        store = LocalStore()
+        self.assertEqual([store.hit('k', 2, 60, 0) for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(store.hit('k', 2, 60, 0), 30)
+        self.assertAlmostEqual(store.hit('k', 2, 60, 15), 15)
+        self.assertEqual(store.hit('k', 2, 60, 30), 0)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'admin-roles'}})
+class AdminRoleCacheTestCase(APITestCase):
+    """اختبار تخزين صلاحية المشرف مؤقتاً وإبطالها عند تعديل الملف"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import AdminProfile
+
+        cache.clear()
+        self.user = User.objects.create_user(username='boss', password='pass12345', email='boss@example.com')
+        self.profile = AdminProfile.objects.create(user=self.user, admin_email='boss@example.com', is_super_admin=True)
+
+    def test_admin_requests_add_no_authorization_queries(self):
+        """اختبار عدم إضافة استعلامات صلاحية بعد أول طلب"""
+        from .models import AdminProfile
+        from .views import IsRestaurantAdmin
+
+        self.assertEqual(AdminProfile.role_for_email('boss@example.com'), (True, True))
+        # A fresh user object per request, as authentication loads it
+        user = User.objects.get(pk=self.user.pk)
+        request = type('Request', (), {'user': user})()
+        with self.assertNumQueries(0):
+            for _ in range(12):
+                self.assertTrue(IsRestaurantAdmin().has_permission(request, None))
+        self.client.force_authenticate(user=user)
+        response = self.client.get('/api/check-user-type/')
+        self.assertTrue(response.json()['is_super_admin'])
+
+    def test_profile_changes_clear_the_cached_role(self):
+        """اختبار إبطال الصلاحية المخزنة عند تغيير البريد أو الحذف"""
+        from .models import AdminProfile
+
+        self.assertTrue(AdminProfile.is_admin_email('boss@example.com'))
+        self.profile.admin_email = 'chief@example.com'
+        self.profile.is_super_admin = False
+        self.profile.save()
+        self.assertEqual(AdminProfile.role_for_email('boss@example.com'), (False, False))
+        self.assertEqual(AdminProfile.role_for_email('chief@example.com'), (True, False))
+        # Cascades from the user skip AdminProfile.delete(); the signal still clears the role
+        self.user.delete()
+        self.assertEqual(AdminProfile.role_for_email('chief@example.com'), (False, False))
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class LoginEngineTestCase(APITestCase):
+    """اختبار البحث عن الهوية دون حساسية لحالة الأحرف وحدود التجزئة وإعادة التجزئة"""
+
+    def setUp(self):
+        from .ratelimit import local_store
+        local_store.clear()
+        self.addCleanup(local_store.clear)
+        self.user = User.objects.create_user(username='Layla', password='secret-pass', email='Layla@Example.com')
+        Customer.objects.create(user=self.user, phone='1', address='Street')
+
+    def _login(self, identity, password='secret-pass'):
+        import json
+        return self.client.post(
+            '/api/login/', json.dumps({'identity': identity, 'password': password}), content_type='application/json'
+        )
+
+    def test_identity_is_case_insensitive(self):
+        """اختبار الدخول بالبريد أو اسم المستخدم بأي حالة أحرف"""
+        from django.contrib.sessions.models import Session
+
+        for identity in ['layla@example.com', ' LAYLA@EXAMPLE.COM', 'layla', 'Layla']:
+            with self.subTest(identity=identity):
+                response = self._login(identity)
+                self.assertEqual(response.status_code, 200)
+                session = Session.objects.get(session_key=response.json()['session_key'])
+                self.assertEqual(session.get_decoded()['user_id'], self.user.id)
+        self.assertEqual(self._login('layla', 'wrong').status_code, 401)
+
+    def test_ambiguous_identity_prefers_exact_match(self):
+        """اختبار تفضيل المطابقة التامة عند تشابه الهويات"""
+        from .login import resolve_user
+
+        other = User.objects.create_user(username='layla', password='x', email='layla@example.com')
+        self.assertEqual(resolve_user('Layla@example.com'), self.user)
+        self.assertEqual(resolve_user('layla'), other)
+        self.assertIsNone(resolve_user('LAYLA@EXAMPLE.COM'))
+
+    def test_password_rehashed_when_cost_changes(self):
+        """اختبار إعادة تجزئة كلمة المرور عند الدخول بعد تغيير التكلفة"""
+        with override_settings(PASSWORD_HASH_ITERATIONS=1500):
+            self.assertEqual(self._login('layla').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1500$'))
+        self.assertTrue(self.user.check_password('secret-pass'))
+
+    def test_busy_hashing_returns_503(self):
+        """اختبار رفض الدخول عند انشغال جميع فتحات التجزئة"""
+        from . import login
+
+        with override_settings(LOGIN_HASH_CONCURRENCY=1, LOGIN_HASH_WAIT=0):
+            with login.hash_slot():
+                response = self._login('layla')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(self._login('layla').status_code, 200)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'}})
+class CachedSessionTestCase(APITestCase):
+    """اختبار الجلسات المخزنة مؤقتاً ودمج الكتابات وحذف الجلسات المنتهية"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .sessions import extensions, local_cache
+
+        cache.clear()
+        local_cache.clear()
+        extensions.flush()
+        self.addCleanup(local_cache.clear)
+
+    def _session_writes(self, queries):
+        return [q['sql'] for q in queries if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')]
+
+    def test_unchanged_sessions_are_not_written(self):
+        """اختبار عدم الكتابة في جدول الجلسات عند عدم تغير البيانات"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        user = User.objects.create_user(username='reader', password='pass12345')
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(5):
+                self.assertTrue(self.client.get('/api/check-user-type/').json()['is_authenticated'])
+        self.assertEqual(self._session_writes(queries.captured_queries), [])
+        self.assertFalse([q for q in queries.captured_queries if 'django_session' in q['sql']])
+
+    def test_changed_data_is_written_through(self):
+        """اختبار حفظ البيانات المتغيرة فوراً في قاعدة البيانات"""
+        from django.contrib.sessions.models import Session
+        from .sessions import SessionStore
+
+        session = SessionStore()
+        session['cart'] = [1, 2]
+        session.save()
+        loaded = SessionStore(session.session_key)
+        self.assertEqual(loaded['cart'], [1, 2])
+        loaded['cart'].append(3)
+        loaded.save()
+        self.assertEqual(Session.objects.get(session_key=session.session_key).get_decoded()['cart'], [1, 2, 3])
+        loaded.delete()
+        self.assertEqual(SessionStore(session.session_key).load(), {})
+
+    def test_expiry_extensions_are_batched(self):
+        """اختبار تجميع تمديدات انتهاء الصلاحية في تحديث واحد"""
+        import datetime
+        from django.contrib.sessions.models import Session
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.utils import timezone
+        from .sessions import SessionStore, local_cache
+
+        keys = []
+        for n in range(2):
+            session = SessionStore()
+            session['n'] = n
+            session.save()
+            keys.append(session.session_key)
+        stale = timezone.now() + datetime.timedelta(hours=2)
+        Session.objects.filter(session_key__in=keys).update(expire_date=stale)
+        from django.core.cache import cache
+        cache.clear()
+        local_cache.clear()
+
+        with override_settings(SESSION_EXTEND_BATCH=2), CaptureQueriesContext(connection) as queries:
+            for key in keys:
+                session = SessionStore(key)
+                session.load()
+                session.save()
+        self.assertEqual(len(self._session_writes(queries.captured_queries)), 1)
+        for expire_date in Session.objects.filter(session_key__in=keys).values_list('expire_date', flat=True):
+            self.assertGreater(expire_date, stale + datetime.timedelta(hours=20))
+
+    def test_sweep_deletes_expired_sessions_in_chunks(self):
+        """اختبار حذف الجلسات المنتهية على دفعات"""
+        import datetime
+        from django.contrib.sessions.models import Session
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .sessions import sweep_expired
+
+        past = timezone.now() - datetime.timedelta(days=1)
+        Session.objects.bulk_create([Session(session_key=f'expired{n}', session_data='', expire_date=past) for n in range(5)])
+        Session.objects.create(session_key='live', session_data='', expire_date=timezone.now() + datetime.timedelta(days=1))
+        self.assertEqual(sweep_expired(chunk_size=2), 5)
+        Session.objects.create(session_key='expired-again', session_data='', expire_date=past)
+        call_command('clearsessions')
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class ProfilingTestCase(APITestCase):
+    """اختبار تحليل أداء الطلبات للمشرفين عند الطلب"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        category = Category.objects.create(name='Grill', slug='grill')
+        Dish.objects.create(name='Kebab', slug='kebab', price=Decimal('30.00'), category=category)
+        self.staff = User.objects.create_user(username='ops', password='pass12345', is_staff=True)
+
+    def test_staff_request_is_profiled(self):
+        """اختبار حفظ تقرير يحوي الاستعلامات وخططها والتخزين المؤقت وزمن التسلسل"""
+        from .models import ProfileReport
+
+        self.client.force_login(self.staff)
+        # First request: the menu is not cached yet, so the report has its queries
+        response = self.client.get('/api/dishes/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.json(), self.client.get('/api/dishes/').json())
+        report = ProfileReport.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((report.user, report.method, report.status_code), (self.staff, 'GET', 200))
+        self.assertTrue(any('restaurant_dish' in s['sql'] for s in report.report['sql']['statements']))
+        self.assertTrue(report.report['explain'][0]['plan'])
+        self.assertGreater(report.report['cache']['count'], 0)
+        self.assertGreaterEqual(report.report['serializer_ms'], 0)
+        self.assertIn('function calls', report.report['profile'])
+
+        self.assertIn('X-Profile-Id', self.client.get('/api/dishes/?_profile=1'))
+        self.assertEqual(ProfileReport.objects.count(), 2)
+
+    async def test_asgi_request_profiles_the_sync_thread(self):
+        """اختبار تحليل خيط العرض المتزامن تحت ASGI"""
+        from asgiref.sync import sync_to_async
+        from .models import ProfileReport
+
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get('/api/dishes/', headers={'X-Profile': '1'})
+        report = await sync_to_async(ProfileReport.objects.get)(pk=response['X-Profile-Id'])
+        self.assertTrue(any('restaurant_dish' in s['sql'] for s in report.report['sql']['statements']))
+        self.assertGreater(report.report['serializer_ms'], 0)
+        self.assertIn('views.py', report.report['profile'])
+
+    def test_session_cache_keys_are_redacted(self):
+        """اختبار إخفاء مفاتيح الجلسات في تقارير التخزين المؤقت"""
+        from django.core.cache import cache
+        from .profiling import Recording
+        from .sessions import KEY_PREFIX
+
+        recording = Recording()
+        recording.start()
+        try:
+            cache.get(f'{KEY_PREFIX}:secret-session-key')
+            cache.get('menu_version')
+        finally:
+            recording.stop()
+        keys = [call['key'] for call in recording.cache_calls]
+        self.assertNotIn('secret-session-key', ' '.join(keys))
+        self.assertTrue(keys[0].startswith(f'{KEY_PREFIX}:<redacted '))
+        self.assertEqual(keys[1], 'menu_version')
+
+    def test_other_requests_are_not_profiled(self):
+        """اختبار عدم التحليل بدون الترويسة أو لغير المشرفين"""
+        from .models import ProfileReport
+
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/dishes/', HTTP_X_PROFILE='1'))
+        customer = User.objects.create_user(username='guest', password='pass12345')
+        self.client.force_login(customer)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/dishes/', HTTP_X_PROFILE='1'))
+        self.client.force_login(self.staff)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/dishes/'))
+        self.assertFalse(ProfileReport.objects.exists())
+
+    def test_admin_endpoint_lists_and_returns_reports(self):
+        """اختبار عرض التقارير عبر واجهة المشرف"""
+        from .models import AdminProfile
+
+        admin = User.objects.create_user(username='boss', password='pass12345', email='boss@example.com')
+        AdminProfile.objects.create(user=admin, admin_email='boss@example.com')
+        self.client.force_login(admin)
+        profile_id = self.client.get('/api/dishes/', HTTP_X_PROFILE='1')['X-Profile-Id']
+
+        listing = self.client.get('/api/admin/profiles/').json()
+        rows = listing['results'] if isinstance(listing, dict) else listing
+        self.assertEqual([row['id'] for row in rows], [int(profile_id)])
+        self.assertNotIn('report', rows[0])
+        detail = self.client.get(f'/api/admin/profiles/{profile_id}/').json()
+        self.assertEqual(detail['username'], 'boss')
+        self.assertIn('sql', detail['report'])
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/api/admin/profiles/').status_code, 403)
+
+
+@override_settings(SLOW_QUERY_MS=0)
+class SlowQueryLogTestCase(TestCase):
+    """اختبار تجميع الاستعلامات حسب البصمة واقتراح الفهارس"""
+
+    def setUp(self):
+        from django.db import connection
+        from .slow_queries import install, recorder, uninstall
+
+        recorder.clear()
+        install(connection)
+        self.addCleanup(recorder.clear)
+        self.addCleanup(uninstall, connection)
+        category = Category.objects.create(name='Grill', slug='grill')
+        self.dishes = [
+            Dish.objects.create(name=f'Dish {n}', slug=f'dish-{n}', price=Decimal('10.00'), category=category)
+            for n in range(2)
+        ]
+
+    def test_statements_are_fingerprinted(self):
+        """اختبار توحيد القيم وقوائم IN في البصمة"""
+        from .slow_queries import normalize, percentile
+
+        self.assertEqual(
+            normalize("SELECT a FROM t WHERE x IN (%s, %s, %s) AND y = 'o''k' AND \"t2\".z = 12  LIMIT 21"),
+            'SELECT a FROM t WHERE x IN (?) AND y = ? AND "t2".z = ? LIMIT ?',
+        )
+        self.assertEqual(normalize('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'), 'INSERT INTO t (a, b) VALUES (?)')
+        self.assertAlmostEqual(percentile({'100': 99, '300': 1}, 50), 0.01 * 2 ** 25.125)
+        self.assertGreater(percentile({'100': 99, '300': 1}, 100), percentile({'100': 99, '300': 1}, 99))
+
+    def test_statistics_and_plans_are_written(self):
+        """اختبار حفظ العدد والتوزيع وخطة التنفيذ لكل بصمة"""
+        from .models import QueryFingerprint
+        from .slow_queries import recorder
+
+        for dish in self.dishes:
+            list(DishRating.objects.filter(dish=dish).order_by('-created_at'))
+        recorder.flush()
+        list(DishRating.objects.filter(dish=self.dishes[0]).order_by('-created_at'))
+        recorder.flush()
+
+        row = QueryFingerprint.objects.get(sql__contains='FROM "restaurant_dishrating" WHERE')
+        self.assertEqual(row.calls, 3)
+        self.assertEqual(sum(row.histogram.values()), 3)
+        self.assertGreaterEqual(row.percentile(95), row.percentile(50))
+        self.assertIn('restaurant_dishrating', ' '.join(row.plan))
+        # The recorder's own statements are not recorded
+        self.assertFalse(QueryFingerprint.objects.filter(sql__contains='restaurant_queryfingerprint').exists())
+
+    def test_concurrent_insert_does_not_drop_the_batch(self):
+        """اختبار عدم ضياع الدفعة عند إدراج عامل آخر للبصمة نفسها"""
+        from unittest import mock
+        from django.db.models.query import QuerySet
+        from django.utils import timezone
+        from .models import QueryFingerprint
+        from .slow_queries import fingerprint, normalize, recorder
+
+        sql = 'SELECT 1 FROM "restaurant_dish" WHERE "restaurant_dish"."id" = 7'
+        recorder.clear()
+        recorder.add('default', sql, None, 1.0)
+        in_bulk = QuerySet.in_bulk
+
+        def in_bulk_then_other_worker_inserts(queryset, *args, **kwargs):
+            rows = in_bulk(queryset, *args, **kwargs)
+            if queryset.model is QueryFingerprint:
+                now = timezone.now()
+                QueryFingerprint.objects.bulk_create([QueryFingerprint(
+                    fingerprint=fingerprint('default', normalize(sql)), alias='default', sql=normalize(sql),
+                    first_seen=now, last_seen=now,
+                )], ignore_conflicts=True)
+            return rows
+
+        with mock.patch.object(QuerySet, 'in_bulk', in_bulk_then_other_worker_inserts):
+            self.assertEqual(recorder.flush(), 1)
+        self.assertEqual(QueryFingerprint.objects.get(sql=normalize(sql)).calls, 1)
+
+    def test_advisor_proposes_missing_indexes_only(self):
+        """اختبار اقتراح الفهارس الناقصة فقط والتنبيه على الشروط غير القابلة للفهرسة"""
+        from django.db.models import F
+        from django.utils import timezone
+        from .index_advisor import advise, build_migration, candidate_rows
+        from .models import QueryFingerprint
+        from .slow_queries import recorder
+
+        list(DishRating.objects.filter(dish=self.dishes[0]).order_by('-created_at'))
+        list(Dish.objects.filter(stock_quantity__lte=F('low_stock_threshold')))
+        Order.objects.filter(order_date__date=timezone.now().date()).count()
+        recorder.flush()
+        now = timezone.now()
+        QueryFingerprint.objects.create(
+            fingerprint='contact-by-email', alias='default', calls=40, total_ms=80, first_seen=now, last_seen=now,
+            sql='SELECT "restaurant_contactmessage"."id" FROM "restaurant_contactmessage" '
+                'WHERE "restaurant_contactmessage"."email" = ? ORDER BY "restaurant_contactmessage"."created_at" DESC',
+            plan=['SCAN restaurant_contactmessage', 'USE TEMP B-TREE FOR ORDER BY'],
+        )
+
+        proposals, advice = advise(candidate_rows())
+        # The reviews query is served by the (dish, created_at) index
+        self.assertEqual([(p.table, p.columns) for p in proposals], [('restaurant_contactmessage', ('email', 'created_at'))])
+        self.assertEqual(proposals[0].fields, ['email', 'created_at'])
+        self.assertIn(('restaurant_dish', 'stock_quantity <= low_stock_threshold'), advice)
+        self.assertIn(('restaurant_order', 'order_date'), advice)
+        migration = build_migration(proposals).as_string()
+        self.assertIn("migrations.AddIndex(", migration)
+        self.assertIn("fields=['email', 'created_at']", migration)
+
+    def test_on_day_matches_date_lookup(self):
+        """اختبار تطابق نطاق اليوم مع البحث بالتاريخ"""
+        import datetime
+        from django.utils import timezone
+        from .utils import on_day
+
+        customer = Customer.objects.create(user=User.objects.create_user(username='eater', password='x'), phone='0', address='addr')
+        day = datetime.date(2026, 3, 10)
+        for hour in (-1, 0, 12, 24):
+            order = Order.objects.create(customer=customer, total_amount=Decimal('5.00'), delivery_address='addr')
+            moment = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min)) + datetime.timedelta(hours=hour)
+            Order.objects.filter(pk=order.pk).update(order_date=moment)
+        self.assertEqual(
+            set(Order.objects.filter(**on_day('order_date', day))),
+            set(Order.objects.filter(order_date__date=day)),
+        )
+        self.assertEqual(Order.objects.filter(**on_day('order_date', day)).count(), 2)
@@ -1,8 +1,9 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from django.http import JsonResponse
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
-from . import views
+from . import async_views, views
 
 def api_root(request):
     """API Root - Welcome message and available endpoints"""
@@ -43,16 +44,31 @@ admin_router.register(r'customers', views.AdminCustomerViewSet, basename='admin-
 admin_router.register(r'restaurants', views.AdminRestaurantViewSet, basename='admin-restaurant')
 admin_router.register(r'analytics', views.OrderAnalyticsViewSet, basename='admin-analytics')
 admin_router.register(r'messages', views.ContactMessageViewSet, basename='admin-contact-message')
+admin_router.register(r'profiles', views.AdminProfileReportViewSet, basename='admin-profile-report')
 
-urlpatterns = [
+# Under uvicorn workers the hot public reads are served by native async views
+if settings.SERVER_MODE == 'asgi':
+    public_views = async_views
+    async_dish_urls = [
+        path('api/dishes/', async_views.dish_list, name='dish-list'),
+        path('api/dishes/<int:pk>/', async_views.dish_detail, name='dish-detail'),
+        # Long-lived stream: only served by the event loop, never by a sync worker
+        path('api/events/', async_views.event_stream, name='event-stream'),
+        path('api/events/token/', async_views.event_stream_token, name='event-stream-token'),
+    ]
+else:
+    public_views = views
+    async_dish_urls = []
+
+urlpatterns = async_dish_urls + [
     # 🏠 Root path
     path('', api_root, name='api-root'),
     
     # 🌟 Public & Customer API
     path('api/', include(router.urls)),
-    path('api/restaurant-info/', views.restaurant_info, name='restaurant-info'),
-    path('api/menu-overview/', views.menu_overview, name='menu-overview'),
-    path('api/homepage-stats/', views.homepage_stats, name='homepage-stats'),
+    path('api/restaurant-info/', public_views.restaurant_info, name='restaurant-info'),
+    path('api/menu-overview/', public_views.menu_overview, name='menu-overview'),
+    path('api/homepage-stats/', public_views.homepage_stats, name='homepage-stats'),
     path('api/contact/', views.submit_contact_form, name='submit-contact-form'),
     path('api/register/', views.register_user, name='register'),
     path('api/verify-email/<uidb64>/<token>/', views.verify_email, name='verify-email'),
@@ -64,18 +80,21 @@ urlpatterns = [
     # 🔐 Admin API
     path('api/admin/login/', views.admin_login, name='admin-login'),
     path('api/admin/dashboard/', views.admin_dashboard_stats, name='admin-dashboard'),
+    path('api/admin/kitchen/', views.kitchen_queue_feed, name='admin-kitchen-queue'),
+    path('api/admin/menu/export/', views.menu_export, name='admin-menu-export'),
+    path('api/admin/menu/import/', views.menu_import, name='admin-menu-import'),
     path('api/admin/', include(admin_router.urls)),
 
     # 🔐 Authentication
     path('api-auth/', include('rest_framework.urls')),
-    path('api/check-user-type/', views.check_user_type, name='check-user-type'),
+    path('api/check-user-type/', public_views.check_user_type, name='check-user-type'),
     path('api/csrf-token/', views.get_csrf_token, name='csrf-token'),
     path('api/submit-rating/', views.submit_rating_simple, name='submit-rating'),
     path('api/add-rating/', views.add_rating, name='add-rating'),
     path('api/update-rating/<int:rating_id>/', views.update_rating, name='update-rating'),
     
     # 💳 Payment endpoints
-    path('api/stripe/config/', views.get_stripe_config, name='stripe-config'),
+    path('api/stripe/config/', public_views.get_stripe_config, name='stripe-config'),
     path('api/stripe/create-checkout-session/', views.create_checkout_session, name='create-checkout-session'),
     path('api/stripe/success/', views.stripe_success, name='stripe-success'),
     path('api/stripe/cancel/', views.stripe_cancel, name='stripe-cancel'),
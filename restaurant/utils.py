@@ -1,5 +1,6 @@
 from django.core.cache import cache
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models import Count, Sum, Avg
 from django.utils import timezone
 from datetime import datetime, timedelta
@@ -15,6 +16,7 @@ import six
 
 
 from .models import Dish, Category, Order, OrderAnalytics, Notification
+from .events import publish_notification
 
 logger = logging.getLogger('restaurant')
 
@@ -148,6 +150,7 @@ def create_notification(user, title, message, notification_type):
             notification_type=notification_type
         )
         logger.info(f"Notification created for user {user.username}: {title}")
+        publish_notification(notification)
         return notification
     except Exception as e:
         logger.error(f"Error creating notification: {e}")
@@ -174,16 +177,56 @@ def send_order_notifications(order):
         )
 
 def send_stock_alert(dish):
-    """إرسال تنبيه انخفاض المخزون"""
+    """إرسال تنبيه انخفاض المخزون (يُدمج في ملخص واحد لكل مدير)"""
     if dish.is_low_stock:
-        admin_users = User.objects.filter(is_staff=True)
-        for admin in admin_users:
-            create_notification(
-                user=admin,
-                title="تنبيه: مخزون منخفض",
-                message=f"الطبق '{dish.name}' مخزونه منخفض ({dish.stock_quantity} قطعة)",
-                notification_type="stock_low"
+        return send_low_stock_digest(Dish.objects.filter(pk=dish.pk))
+    return 0
+
+def send_low_stock_digest(dishes=None):
+    """
+    Coalesce every pending low stock crossing into one notification per admin.
+
+    A dish is pending when its stored ``is_low_stock`` flag is set and it has not
+    been reported since it last dropped below its threshold. Notifications are
+    bulk-inserted and the reported dishes are stamped in a single UPDATE, so the
+    write cost does not grow with the number of stock changes.
+    Returns the number of dishes reported.
+    """
+    if dishes is None:
+        dishes = Dish.objects.all()
+
+    pending = list(
+        dishes
+        .filter(is_low_stock=True, low_stock_alerted_at__isnull=True)
+        .order_by('stock_quantity', 'name')
+        .values_list('id', 'name', 'stock_quantity')
+    )
+    if not pending:
+        return 0
+
+    lines = [f"- {name}: {quantity}" for _, name, quantity in pending]
+    title = f"تنبيه: مخزون منخفض ({len(pending)} أطباق)"
+    message = "الأطباق التالية مخزونها منخفض:\n" + "\n".join(lines)
+
+    with transaction.atomic():
+        admin_ids = User.objects.filter(is_staff=True).values_list('id', flat=True)
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                user_id=admin_id,
+                title=title,
+                message=message,
+                notification_type='stock_low'
             )
+            for admin_id in admin_ids
+        ])
+        for notification in notifications:
+            publish_notification(notification)
+        Dish.objects.filter(pk__in=[dish_id for dish_id, _, _ in pending]).update(
+            low_stock_alerted_at=timezone.now()
+        )
+
+    logger.info("Low stock digest sent for %d dishes", len(pending))
+    return len(pending)
 
 def send_notification_to_admins(title, message, notification_type):
     """Helper to send a notification to all staff users."""
@@ -198,6 +241,16 @@ def send_notification_to_admins(title, message, notification_type):
 
 # ===== ANALYTICS UTILITIES =====
 
+def on_day(field, date):
+    """
+    Lookups selecting ``field`` values on ``date`` in the current time zone,
+    like ``{field}__date=date`` but as a half-open range on the bare column:
+    ``__date`` wraps the column in a function no index on it can serve.
+    """
+    start = timezone.make_aware(datetime.combine(date, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(date + timedelta(days=1), datetime.min.time()))
+    return {f'{field}__gte': start, f'{field}__lt': end}
+
 def calculate_daily_analytics(date=None):
     """حساب إحصائيات اليوم"""
     if not date:
@@ -205,7 +258,7 @@ def calculate_daily_analytics(date=None):
     
     # الطلبات اليومية
     daily_orders = Order.objects.filter(
-        order_date__date=date,
+        **on_day('order_date', date),
         payment_status='paid'
     )
     
@@ -1,8 +1,9 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth import login, authenticate
 from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, parser_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django.contrib.auth.models import User
@@ -13,24 +14,45 @@ from django.utils.decorators import method_decorator
 from django.middleware.csrf import get_token
 from django.conf import settings
 import stripe
+import io
 import json
 import logging
 import time
 
-from .utils import account_activation_token_generator, send_verification_email
+from .utils import (
+    account_activation_token_generator, create_notification, on_day, send_notification_to_admins,
+    send_verification_email
+)
+from .bulk import BulkUpdateError, apply_dish_changes, apply_order_statuses
+from .compiled import CompiledListMixin
+from .conditional import MenuConditionalMixin, menu_conditional
+from .eta import update_order_eta
+from .order_export import export_orders
+from .menu_io import KINDS as MENU_KINDS, export_menu, import_menu
+from .tabular import (
+    READERS as TABULAR_READERS, WRITERS as TABULAR_WRITERS, aiter_chunks, format_from_filename, undecodable_line,
+)
+from .events import publish_order_status
+from .kitchen import InvalidTransition, kitchen_queue, publish_order, publish_order_removed, validate_transition
+from .images import schedule_image_variants
+from .db_routers import REPORTING, pin_reads
+from .login import HashingBusy, check_password, login_busy, resolve_user
+from .ratelimit import client_ip, json_field, rate_limit, session_or_ip
+from django.utils.dateparse import parse_date
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
 from django.shortcuts import redirect
 
 from .models import (
     Category, Dish, Customer, Order, OrderItem, DishRating, 
-    Restaurant, AdminProfile, Notification, OrderAnalytics, ContactMessage
+    Restaurant, AdminProfile, Notification, OrderAnalytics, ContactMessage, ProfileReport
 )
 from .serializers import (
     CategorySerializer, DishSerializer, CustomerSerializer,
     OrderSerializer, OrderCreateSerializer, DishRatingSerializer,
     RestaurantSerializer, UserSerializer, NotificationSerializer,
-    OrderAnalyticsSerializer, EnhancedOrderCreateSerializer, AdminDishSerializer
+    OrderAnalyticsSerializer, EnhancedOrderCreateSerializer, AdminDishSerializer,
+    BulkDishUpdateSerializer, BulkOrderStatusSerializer
 )
 from .filters import DishFilter, CategoryFilter, OrderFilter, DishRatingFilter
 from django.db.models import Count, Avg, Sum
@@ -39,7 +61,7 @@ from django.contrib.auth.hashers import make_password
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth import logout
 from django.shortcuts import redirect
-from .serializers import ContactMessageSerializer
+from .serializers import ContactMessageSerializer, ProfileReportDetailSerializer, ProfileReportSerializer
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
 # Configure logging
@@ -62,14 +84,14 @@ class IsRestaurantAdmin(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        # Check if user has admin profile with valid admin email
-        return AdminProfile.is_admin_email(request.user.email) or request.user.is_superuser
+        # Check if user has admin profile with valid admin email (cached, resolved once per request)
+        return request.user.is_superuser or AdminProfile.role_for_user(request.user)[0]
 
 # ========================================
 # 🎯 CUSTOMER VIEWS (Public & Customer)
 # ========================================
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(MenuConditionalMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.filter(is_active=True).prefetch_related('dish_set')
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
@@ -78,7 +100,7 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
-class DishViewSet(viewsets.ReadOnlyModelViewSet):
+class DishViewSet(MenuConditionalMixin, CompiledListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = (
         Dish.objects
         .filter(is_available=True)
@@ -120,9 +142,7 @@ class DishViewSet(viewsets.ReadOnlyModelViewSet):
         if not request.user.is_staff:
             return Response({'error': 'Permission denied'}, status=403)
         
-        low_stock_dishes = Dish.objects.filter(
-            stock_quantity__lte=models.F('low_stock_threshold')
-        ).select_related('category')
+        low_stock_dishes = Dish.objects.filter(is_low_stock=True).select_related('category')
         serializer = self.get_serializer(low_stock_dishes, many=True)
         return Response(serializer.data)
     
@@ -170,19 +190,19 @@ class DishViewSet(viewsets.ReadOnlyModelViewSet):
             else:
                 return Response(serializer.errors, status=400)
 
-class RestaurantViewSet(viewsets.ReadOnlyModelViewSet):
+class RestaurantViewSet(MenuConditionalMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Restaurant.objects.filter(is_active=True)
     serializer_class = RestaurantSerializer
     permission_classes = [AllowAny]
 
 # ViewSets جديدة للميزات المتقدمة
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(CompiledListMixin, viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         """عرض إشعارات المستخدم فقط"""
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return Notification.objects.filter(user=self.request.user).select_related('user').order_by('-created_at')
     
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
@@ -198,6 +218,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
         self.get_queryset().update(is_read=True)
         return Response({'status': 'all notifications marked as read'})
 
+@method_decorator(pin_reads(REPORTING), name='dispatch')
 class OrderAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = OrderAnalyticsSerializer
     permission_classes = [IsAdminUser]
@@ -227,7 +248,7 @@ class OrderAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(analytics)
         return Response(serializer.data)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(CompiledListMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [AllowAny]  # Changed to handle session authentication manually
     
@@ -246,7 +267,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                     user_id = session_data.get('_auth_user_id')
                     if user_id:
                         current_user = User.objects.get(id=user_id)
-                        logger.info(f"Found user via session: {current_user.username}")
+                        logger.debug("Orders: user %s found via session", current_user.pk)
                 except Exception as e:
                     logger.warning(f"Session authentication failed: {e}")
                     return Order.objects.none()
@@ -260,7 +281,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         try:
             customer = current_user.customer
             orders = Order.objects.filter(customer=customer).order_by('-order_date')
-            logger.info(f"Found {orders.count()} orders for user {current_user.username}")
+            logger.debug("Orders for user %s", current_user.pk)
             return orders
         except Customer.DoesNotExist:
             logger.warning(f"No customer found for user {current_user.username}")
@@ -291,7 +312,10 @@ class OrderViewSet(viewsets.ModelViewSet):
                 'address': serializer.validated_data.get('delivery_address', '')
             }
         )
-        serializer.save(customer=customer)
+        order = serializer.save(customer=customer)
+        with transaction.atomic():
+            order.save(update_fields=update_order_eta(order))
+        publish_order(order)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class DishRatingViewSet(viewsets.ModelViewSet):
@@ -323,6 +347,25 @@ class AdminCategoryViewSet(viewsets.ModelViewSet):
         kwargs['partial'] = True
         return super().update(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        _save_with_image_variants(self.request, serializer)
+
+    def perform_update(self, serializer):
+        _save_with_image_variants(self.request, serializer)
+
+
+def _save_with_image_variants(request, serializer):
+    """Save an admin upload and hand any new image to the background variant pipeline."""
+    if 'image' in request.data:
+        # The recorded variants belong to the previous image
+        instance = serializer.save(image_variants={})
+    else:
+        instance = serializer.save()
+
+    if 'image' in request.FILES:
+        transaction.on_commit(lambda: schedule_image_variants(instance))
+    return instance
+
 class AdminDishViewSet(viewsets.ModelViewSet):
     queryset = Dish.objects.all()
     permission_classes = [IsRestaurantAdmin]
@@ -337,12 +380,15 @@ class AdminDishViewSet(viewsets.ModelViewSet):
             return AdminDishSerializer
         return DishSerializer
 
+    def perform_create(self, serializer):
+        _save_with_image_variants(self.request, serializer)
+
+    def perform_update(self, serializer):
+        _save_with_image_variants(self.request, serializer)
+
     @transaction.atomic
     def create(self, request, *args, **kwargs):
-        logger.info(f"Admin creating dish. Content-Type: {request.content_type}")
-        logger.info(f"Admin creating dish. POST data: {request.POST}")
-        logger.info(f"Admin creating dish. FILES data: {request.FILES}")
-        logger.info(f"Admin creating dish. Raw request.data: {request.data}")
+        logger.debug("Admin creating dish (%s): %s", request.content_type, request.data)
         
         try:
             serializer = self.get_serializer(data=request.data)
@@ -354,7 +400,7 @@ class AdminDishViewSet(viewsets.ModelViewSet):
             self.perform_create(serializer)
             headers = self.get_success_headers(serializer.data)
             
-            logger.info(f"✅ Dish created successfully: {serializer.data}")
+            logger.info("Dish created: %s", serializer.data.get('id'))
             return Response(serializer.data, status=201, headers=headers)
             
         except Exception as e:
@@ -364,16 +410,14 @@ class AdminDishViewSet(viewsets.ModelViewSet):
     @transaction.atomic
     def update(self, request, *args, **kwargs):
         """Override update to add debugging and atomic transactions for PATCH requests"""
-        logger.info(f"📝 AdminDishViewSet PATCH request data: {request.data}")
-        logger.info(f"📝 Content-Type: {request.content_type}")
-        logger.info(f"📝 Files: {request.FILES}")
+        logger.debug("Admin updating dish (%s): %s", request.content_type, request.data)
         
         try:
             partial = kwargs.pop('partial', False)
             instance = self.get_object()
             
             # Log current instance data
-            logger.info(f"📝 Current dish: {instance.name} (ID: {instance.id})")
+            logger.debug("Updating dish %s", instance.pk)
             
             serializer = self.get_serializer(instance, data=request.data, partial=partial)
             
@@ -387,7 +431,7 @@ class AdminDishViewSet(viewsets.ModelViewSet):
             if getattr(instance, '_prefetched_objects_cache', None):
                 instance._prefetched_objects_cache = {}
 
-            logger.info(f"✅ Dish updated successfully: {serializer.data}")
+            logger.info("Dish updated: %s", instance.pk)
             return Response(serializer.data)
             
         except Exception as e:
@@ -429,6 +473,18 @@ class AdminDishViewSet(viewsets.ModelViewSet):
             logger.error(f"❌ Error updating dish availability: {str(e)}")
             return Response({'error': 'Failed to update availability'}, status=500)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Change availability, price, stock or preparation time of many dishes at once"""
+        serializer = BulkDishUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        try:
+            dishes = apply_dish_changes(serializer.validated_data['updates'])
+        except BulkUpdateError as e:
+            return Response({'error': 'No dishes were updated', 'details': e.errors}, status=400)
+        return Response({'updated': len(dishes), 'ids': [dish.id for dish in dishes]})
+
     @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         """Override destroy to add atomic transaction and logging"""
@@ -447,12 +503,31 @@ class AdminDishViewSet(viewsets.ModelViewSet):
             logger.error(f"❌ Error deleting dish: {str(e)}")
             return Response({'error': 'Failed to delete dish'}, status=500)
 
-class AdminOrderViewSet(viewsets.ModelViewSet):
+def export_response(request, chunks, content_type, filename):
+    """Download of the text ``chunks``, streamed a chunk at a time under WSGI and ASGI alike"""
+    if isinstance(request._request, ASGIRequest):
+        chunks = aiter_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+class AdminOrderViewSet(CompiledListMixin, viewsets.ModelViewSet):
     queryset = Order.objects.prefetch_related(
         'orderitem_set__dish'
     ).select_related('customer__user').all()
     serializer_class = OrderSerializer
     permission_classes = [IsRestaurantAdmin]
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            order = serializer.save()
+            order.save(update_fields=update_order_eta(order))
+        publish_order(order)
+
+    def perform_destroy(self, instance):
+        order_id = instance.id
+        instance.delete()
+        publish_order_removed(order_id)
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
@@ -488,12 +563,60 @@ class AdminOrderViewSet(viewsets.ModelViewSet):
         new_status = request.data.get('status')
         
         if new_status in dict(Order.ORDER_STATUS_CHOICES):
+            try:
+                validate_transition(order.status, new_status)
+            except InvalidTransition as e:
+                return Response({'error': str(e)}, status=400)
             order.status = new_status
-            order.save()
+            with transaction.atomic():
+                update_order_eta(order)
+                order.save()
+            publish_order_status(order, order.customer.user_id)
+            publish_order(order)
             return Response({'message': 'Order status updated successfully'})
         
         return Response({'error': 'Invalid status'}, status=400)
 
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request):
+        """Update the status of many orders at once"""
+        serializer = BulkOrderStatusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        updates = serializer.validated_data['updates']
+        try:
+            orders = apply_order_statuses(updates)
+        except BulkUpdateError as e:
+            return Response({'error': 'No orders were updated', 'details': e.errors}, status=400)
+        return Response({
+            'updated': len(orders),
+            'unchanged': len(updates) - len(orders),
+            'ids': [order.id for order in orders],
+        })
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream orders joined with their items for accounting.
+
+        ?start=YYYY-MM-DD&end=YYYY-MM-DD (inclusive), optional payment_status,
+        file_format csv (default), jsonl or columnar.
+        """
+        try:
+            start = parse_date(request.query_params.get('start') or '')
+            end = parse_date(request.query_params.get('end') or '')
+        except ValueError:
+            start = end = None
+        file_format = request.query_params.get('file_format', 'csv')
+        if start is None or end is None or start > end:
+            return Response({'error': 'start and end dates (YYYY-MM-DD) are required'}, status=400)
+        if file_format not in TABULAR_WRITERS:
+            return Response({'error': f'file_format must be one of {list(TABULAR_WRITERS)}'}, status=400)
+
+        content_type, extension, _ = TABULAR_WRITERS[file_format]
+        chunks = export_orders(start, end, file_format, request.query_params.get('payment_status'))
+        return export_response(request, chunks, content_type, f'orders-{start}-{end}.{extension}')
+
 class AdminCustomerViewSet(viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
@@ -526,12 +649,33 @@ class ContactMessageViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsRestaurantAdmin]
 
 
+class AdminProfileReportViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Reports of requests profiled with ``X-Profile: 1`` (see restaurant/profiling.py).
+    The list gives summaries; retrieve returns the full report.
+    """
+    queryset = ProfileReport.objects.select_related('user')
+    permission_classes = [IsRestaurantAdmin]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.defer('report')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return ProfileReportDetailSerializer
+        return ProfileReportSerializer
+
+
 # ========================================
 # 🌟 PUBLIC API FUNCTIONS
 # ========================================
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@menu_conditional
 def restaurant_info(request):
     """Get basic restaurant information"""
     restaurant = Restaurant.objects.filter(is_active=True).first()
@@ -542,6 +686,7 @@ def restaurant_info(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@menu_conditional
 def menu_overview(request):
     """Get menu overview with categories and featured dishes"""
     categories = Category.objects.filter(is_active=True)
@@ -552,6 +697,7 @@ def menu_overview(request):
         'featured_dishes': DishSerializer(featured_dishes, many=True).data
     })
 
+@rate_limit('register', key=client_ip)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_user(request):
@@ -625,6 +771,7 @@ def register_user(request):
         )
 
 
+@rate_limit('contact', key=client_ip)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def submit_contact_form(request):
@@ -632,7 +779,7 @@ def submit_contact_form(request):
     Handles submission of the contact form.
     Creates a new ContactMessage instance.
     """
-    logger.info(f"Contact form submission received. Data: {request.data}")
+    logger.debug("Contact form submission received")
     serializer = ContactMessageSerializer(data=request.data)
     if serializer.is_valid():
         serializer.save()
@@ -807,6 +954,7 @@ def update_user_profile(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Temporarily allow any for testing
+@pin_reads(REPORTING)
 def admin_dashboard_stats(request):
     """Get comprehensive admin dashboard statistics - optimized version"""
     from django.db.models import Count, Sum, Avg, Case, When, Q
@@ -821,14 +969,14 @@ def admin_dashboard_stats(request):
     # Optimize multiple queries into single aggregations
     order_stats = Order.objects.aggregate(
         total_orders=Count('id'),
-        today_orders=Count('id', filter=Q(order_date__date=today)),
-        yesterday_orders=Count('id', filter=Q(order_date__date=yesterday)),
+        today_orders=Count('id', filter=Q(**on_day('order_date', today))),
+        yesterday_orders=Count('id', filter=Q(**on_day('order_date', yesterday))),
         recent_orders=Count('id', filter=Q(order_date__gte=week_ago)),
         pending_orders=Count('id', filter=Q(status='pending')),
         delivered_orders=Count('id', filter=Q(status='delivered')),
         total_revenue=Sum('total_amount', filter=Q(payment_status='paid')),
-        today_revenue=Sum('total_amount', filter=Q(order_date__date=today, payment_status='paid')),
-        yesterday_revenue=Sum('total_amount', filter=Q(order_date__date=yesterday, payment_status='paid')),
+        today_revenue=Sum('total_amount', filter=Q(**on_day('order_date', today), payment_status='paid')),
+        yesterday_revenue=Sum('total_amount', filter=Q(**on_day('order_date', yesterday), payment_status='paid')),
         recent_revenue=Sum('total_amount', filter=Q(order_date__gte=week_ago, payment_status='paid')),
         avg_order_value=Avg('total_amount', filter=Q(payment_status='paid'))
     )
@@ -886,6 +1034,57 @@ def admin_dashboard_stats(request):
         'top_dishes': list(top_dishes)
     })
 
+@api_view(['GET'])
+@permission_classes([IsRestaurantAdmin])
+def kitchen_queue_feed(request):
+    """Active orders for kitchen screens; pass the last ``version`` as ``since`` for changes only"""
+    since = request.query_params.get('since')
+    try:
+        since = int(since) if since else None
+    except ValueError:
+        return Response({'error': 'since must be a version number'}, status=400)
+    return Response(kitchen_queue.feed(since))
+
+@api_view(['GET'])
+@permission_classes([IsRestaurantAdmin])
+def menu_export(request):
+    """Stream all categories or dishes as CSV or JSONL (?kind=dishes&file_format=csv)"""
+    kind = request.query_params.get('kind', 'dishes')
+    file_format = request.query_params.get('file_format', 'csv')
+    if kind not in MENU_KINDS or file_format not in TABULAR_WRITERS:
+        return Response({'error': f'kind must be one of {list(MENU_KINDS)}, '
+                                  f'file_format one of {list(TABULAR_WRITERS)}'}, status=400)
+
+    content_type, extension, _ = TABULAR_WRITERS[file_format]
+    return export_response(request, export_menu(kind, file_format), content_type, f'menu-{kind}.{extension}')
+
+@api_view(['POST'])
+@permission_classes([IsRestaurantAdmin])
+@parser_classes([MultiPartParser])
+def menu_import(request):
+    """Create or update categories or dishes from an uploaded CSV/JSONL ``file`` (matched by slug)"""
+    kind = request.data.get('kind', 'dishes')
+    upload = request.FILES.get('file')
+    if kind not in MENU_KINDS:
+        return Response({'error': f'kind must be one of {list(MENU_KINDS)}'}, status=400)
+    if upload is None:
+        return Response({'error': 'file is required'}, status=400)
+    file_format = request.data.get('file_format') or format_from_filename(upload.name)
+    if file_format not in TABULAR_READERS:
+        return Response({'error': f'file_format must be one of {list(TABULAR_READERS)}'}, status=400)
+
+    # Check the encoding first: a bad byte halfway through would otherwise stop the import midway
+    bad_line = undecodable_line(upload.chunks())
+    if bad_line is not None:
+        return Response({'error': f'The file is not UTF-8 encoded (first invalid byte on line {bad_line})'}, status=400)
+    upload.seek(0)
+    # Read line by line from the uploaded file (spooled to disk when large)
+    lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    report = import_menu(kind, lines, file_format)
+    logger.info("Menu import by %s: %d rejected rows", request.user.username, report.error_count)
+    rejected_all = report.error_count and not report.created + report.updated
+    return Response(report.as_dict(), status=400 if rejected_all else 200)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def homepage_stats(request):
@@ -900,7 +1099,7 @@ def homepage_stats(request):
     # Today's dishes served (total order items for today)
     today = timezone.now().date()
     dishes_served_today = OrderItem.objects.filter(
-        order__order_date__date=today,
+        **on_day('order__order_date', today),
         order__status__in=['confirmed', 'preparing', 'ready', 'delivered']
     ).aggregate(total=Sum('quantity'))['total'] or 0
     
@@ -939,6 +1138,8 @@ def get_csrf_token(request):
     
     return response
 
+@rate_limit('login-ip', key=client_ip)
+@rate_limit('login-identity', key=json_field('identity'))
 @csrf_exempt
 def customer_login(request):
     """Customer login endpoint"""
@@ -952,31 +1153,20 @@ def customer_login(request):
         identity = data.get('identity')
         password = data.get('password')
         
-        logger.info(f"🔐 Customer login attempt: {identity}")
+        logger.debug("Customer login attempt: %s", identity)
         
         if not identity or not password:
             return JsonResponse({'error': 'Identity and password are required'}, status=400)
         
-        # Try to find user by username or email
-        user = None
-        if '@' in identity:
-            try:
-                user = User.objects.get(email=identity)
-                logger.info(f"📧 Found user by email: {user.username}")
-            except User.DoesNotExist:
-                logger.warning(f"❌ No user found with email: {identity}")
-        else:
-            try:
-                user = User.objects.get(username=identity)
-                logger.info(f"👤 Found user by username: {user.username}")
-            except User.DoesNotExist:
-                logger.warning(f"❌ No user found with username: {identity}")
-        
+        # Find user by username or email, case-insensitively
+        user = resolve_user(identity)
         if not user:
+            logger.warning("No user found for identity: %s", identity)
             return JsonResponse({'error': 'Invalid credentials'}, status=401)
+        logger.debug("Login: found user %s", user.pk)
         
-        # Check password
-        if not user.check_password(password):
+        # Check password (bounded hashing, rehashed on success if the cost changed)
+        if not check_password(user, password):
             logger.warning(f"❌ Invalid password for user: {user.username}")
             return JsonResponse({'error': 'Invalid credentials'}, status=401)
         
@@ -992,11 +1182,9 @@ def customer_login(request):
         request.session['user_id'] = user.id
         request.session['is_customer'] = True
         request.session['customer_email'] = user.email
-        request.session.save()
         
         session_key = request.session.session_key
-        logger.info(f"✅ User logged in successfully: {user.username}, session: {session_key}")
-        logger.info(f"🔍 Session data: {dict(request.session)}")
+        logger.info("User logged in: %s", user.pk)
         
         response_data = {
             'message': 'Login successful',
@@ -1031,10 +1219,14 @@ def customer_login(request):
     except json.JSONDecodeError as e:
         logger.error(f"JSON decode error: {str(e)}")
         return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    except HashingBusy:
+        return login_busy()
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return JsonResponse({'error': 'Login failed'}, status=500)
 
+@rate_limit('login-ip', key=client_ip)
+@rate_limit('login-identity', key=json_field('email'))
 @csrf_exempt
 def admin_login(request):
     """Admin login endpoint"""
@@ -1048,26 +1240,25 @@ def admin_login(request):
         email = data.get('email')
         password = data.get('password')
         
-        logger.info(f"🔐 Admin login attempt: {email}")
+        logger.debug("Admin login attempt: %s", email)
         
         if not email or not password:
             return JsonResponse({'error': 'Email and password are required'}, status=400)
         
-        # Check if email is admin
-        if not AdminProfile.is_admin_email(email):
+        # Find user (case-insensitive) and check if its email is admin
+        user = resolve_user(email) if '@' in email else None
+        is_admin, is_super_admin = AdminProfile.role_for_email(user.email if user else email)
+        if not is_admin:
             logger.warning(f"❌ Not an admin email: {email}")
             return JsonResponse({'error': 'Unauthorized: Not an admin email'}, status=403)
         
-        # Find user
-        try:
-            user = User.objects.get(email=email)
-            logger.info(f"📧 Found admin user: {user.username}")
-        except User.DoesNotExist:
+        if not user:
             logger.warning(f"❌ No user found with email: {email}")
             return JsonResponse({'error': 'Invalid credentials'}, status=401)
+        logger.debug("Admin login: found user %s", user.pk)
         
-        # Check password
-        if not user.check_password(password):
+        # Check password (bounded hashing, rehashed on success if the cost changed)
+        if not check_password(user, password):
             logger.warning(f"❌ Invalid password for admin: {user.username}")
             return JsonResponse({'error': 'Invalid credentials'}, status=401)
         
@@ -1076,21 +1267,16 @@ def admin_login(request):
         
         # Check if admin also has customer profile
         has_customer = hasattr(user, 'customer')
-        logger.info(f"🔍 Admin user has customer profile: {has_customer}")
+        logger.debug("Admin user %s has customer profile: %s", user.pk, has_customer)
         
         # Session is automatically created by login(), no need to force it
         request.session['user_id'] = user.id
         request.session['is_admin'] = True
         request.session['is_customer'] = has_customer  # Add customer flag for dual-role users
-        request.session['admin_email'] = email
-        request.session.save()
+        request.session['admin_email'] = user.email
         
         session_key = request.session.session_key
-        logger.info(f"✅ Admin logged in successfully: {user.username}, session: {session_key}")
-        logger.info(f"🔍 Session data: {dict(request.session)}")
-        
-        # Get admin profile
-        admin_profile = AdminProfile.objects.get(admin_email=email)
+        logger.info("Admin logged in: %s", user.pk)
         
         response_data = {
             'message': 'Login successful',
@@ -1102,7 +1288,7 @@ def admin_login(request):
                 'last_name': user.last_name,
                 'is_admin': True,
                 'is_customer': has_customer,
-                'is_super_admin': admin_profile.is_super_admin
+                'is_super_admin': is_super_admin
             },
             'session_key': session_key
         }
@@ -1126,38 +1312,43 @@ def admin_login(request):
     except json.JSONDecodeError as e:
         logger.error(f"JSON decode error: {str(e)}")
         return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    except HashingBusy:
+        return login_busy()
     except Exception as e:
         logger.error(f"Admin login error: {str(e)}")
         return JsonResponse({'error': 'Admin login failed'}, status=500)
 
+def _add_super_admin_status(user, response_data):
+    is_admin, is_super_admin = AdminProfile.role_for_user(user)
+    if is_admin:
+        response_data['is_super_admin'] = is_super_admin
+        logger.debug("Super admin status: %s", is_super_admin)
+    else:
+        logger.warning("AdminProfile not found for %s", user.email)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def check_user_type(request):
     """Check if current user is admin or customer"""
     logger = logging.getLogger(__name__)
     
-    logger.info(f"🔍 Checking user type for request")
-    logger.info(f"🔍 Session key: {request.session.session_key}")
-    logger.info(f"🔍 Session data: {dict(request.session)}")
-    logger.info(f"🔍 User authenticated: {request.user.is_authenticated}")
-    logger.info(f"🔍 User: {request.user}")
+    logger.debug("Checking user type (authenticated: %s)", request.user.is_authenticated)
     
     # Check for X-Session-Key header first
     session_key_header = request.headers.get('X-Session-Key')
     if session_key_header:
-        logger.info(f"🔑 Found X-Session-Key header: {session_key_header[:10]}...")
+        logger.debug("Checking user type from X-Session-Key")
         
         try:
             from django.contrib.sessions.models import Session
             session = Session.objects.get(session_key=session_key_header)
             session_data = session.get_decoded()
-            logger.info(f"🔍 Session data from header: {session_data}")
             
             user_id = session_data.get('user_id')
             if user_id:
                 try:
                     user = User.objects.get(id=user_id)
-                    logger.info(f"✅ Found user from X-Session-Key: {user.username}")
+                    logger.debug("Found user %s from X-Session-Key", user.pk)
                     
                     # Get admin/customer status from session
                     is_admin = session_data.get('is_admin', False)
@@ -1175,14 +1366,9 @@ def check_user_type(request):
                     }
                     
                     if is_admin:
-                        try:
-                            admin_profile = AdminProfile.objects.get(admin_email=user.email)
-                            response_data['is_super_admin'] = admin_profile.is_super_admin
-                            logger.info(f"✅ Super admin status: {admin_profile.is_super_admin}")
-                        except AdminProfile.DoesNotExist:
-                            logger.warning(f"⚠️ AdminProfile not found for {user.email}")
+                        _add_super_admin_status(user, response_data)
                     
-                    logger.info(f"✅ Final response data from X-Session-Key: {response_data}")
+                    logger.debug("User type from X-Session-Key: %s", response_data)
                     return Response(response_data)
                     
                 except User.DoesNotExist:
@@ -1198,13 +1384,13 @@ def check_user_type(request):
         if user_id:
             try:
                 user = User.objects.get(id=user_id)
-                logger.info(f"🔍 Found user from Django session: {user.username}")
+                logger.debug("Found user %s from Django session", user.pk)
             except User.DoesNotExist:
                 logger.warning(f"❌ User not found in Django session: {user_id}")
                 user = None
     
     if not user or not user.is_authenticated:
-        logger.info("❌ User not authenticated")
+        logger.debug("User not authenticated")
         return Response({
             'user_id': None,
             'username': None,
@@ -1221,12 +1407,12 @@ def check_user_type(request):
     # Check if admin from session first
     if request.session.get('is_admin'):
         is_admin = True
-        logger.info(f"✅ Admin status from Django session: {is_admin}")
+        logger.debug("Admin status from Django session: %s", is_admin)
     else:
         # Fallback to email check
         try:
-            is_admin = AdminProfile.is_admin_email(user.email)
-            logger.info(f"✅ Admin check result for {user.email}: {is_admin}")
+            is_admin = AdminProfile.role_for_user(user)[0]
+            logger.debug("Admin check result for %s: %s", user.pk, is_admin)
         except Exception as e:
             logger.warning(f"⚠️ Admin check failed: {e}")
     
@@ -1234,11 +1420,11 @@ def check_user_type(request):
     has_customer = False
     if request.session.get('is_customer'):
         has_customer = True
-        logger.info(f"✅ Customer status from Django session: {has_customer}")
+        logger.debug("Customer status from Django session: %s", has_customer)
     else:
         # Fallback to model check
         has_customer = hasattr(user, 'customer')
-        logger.info(f"✅ Customer check result for {user.username}: {has_customer}")
+        logger.debug("Customer check result for %s: %s", user.pk, has_customer)
     
     response_data = {
         'user_id': user.id,
@@ -1252,14 +1438,9 @@ def check_user_type(request):
     }
     
     if is_admin:
-        try:
-            admin_profile = AdminProfile.objects.get(admin_email=user.email)
-            response_data['is_super_admin'] = admin_profile.is_super_admin
-            logger.info(f"✅ Super admin status: {admin_profile.is_super_admin}")
-        except AdminProfile.DoesNotExist:
-            logger.warning(f"⚠️ AdminProfile not found for {user.email}")
+        _add_super_admin_status(user, response_data)
     
-    logger.info(f"✅ Final response data from Django session: {response_data}")
+    logger.debug("User type from Django session: %s", response_data)
     return Response(response_data)
 
 @csrf_exempt
@@ -1433,6 +1614,8 @@ def update_rating(request, rating_id):
 # 💳 STRIPE PAYMENT VIEWS
 # ========================================
 
+@rate_limit('checkout-ip', key=client_ip)
+@rate_limit('checkout', key=session_or_ip)
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -1442,27 +1625,24 @@ def create_checkout_session(request):
     setattr(request, '_dont_enforce_csrf_checks', True)
     
     try:
-        logger.info(f"Checkout session request received from user: {request.user}")
-        logger.info(f"Request headers: {dict(request.headers)}")
+        logger.debug("Checkout session requested by %s", request.user.pk)
         
         data = request.data
         items = data.get('items', [])
         delivery_address = data.get('delivery_address', '')
         special_instructions = data.get('special_instructions', '')
         
-        logger.info(f"Checkout data: items={len(items)}, address={delivery_address}")
+        logger.debug("Checkout data: %s items", len(items))
         
         if not items:
             return Response({'error': 'No items provided'}, status=400)
         
         # Get authenticated user
         current_user = request.user
-        logger.info(f"Initial user: {current_user}, authenticated: {current_user.is_authenticated}")
         
         # If user is not authenticated, check cookies
         if not current_user.is_authenticated:
             sessionid = request.COOKIES.get('sessionid')
-            logger.info(f"Checking sessionid cookie: {sessionid}")
             if sessionid:
                 try:
                     from django.contrib.sessions.models import Session
@@ -1471,7 +1651,7 @@ def create_checkout_session(request):
                     user_id = session_data.get('_auth_user_id')
                     if user_id:
                         current_user = User.objects.get(id=user_id)
-                        logger.info(f"Found user via sessionid cookie: {current_user}")
+                        logger.debug("Checkout: user %s found via sessionid cookie", current_user.pk)
                 except Exception as e:
                     logger.warning(f"Sessionid cookie error: {e}")
         
@@ -1485,14 +1665,14 @@ def create_checkout_session(request):
             return Response({'error': 'User authentication required for checkout.'}, status=401)
 
         else:
-            logger.info(f"Using authenticated user: {current_user} (ID: {current_user.id})")
+            logger.debug("Checkout for user %s", current_user.pk)
         
         # Get or create customer for authenticated user
         customer, created = Customer.objects.get_or_create(
             user=current_user,
             defaults={'phone': '', 'address': delivery_address}
         )
-        logger.info(f"Customer: {customer} (ID: {customer.id}, created: {created})")
+        logger.debug("Checkout customer %s (created: %s)", customer.pk, created)
         
         # Build line items for Stripe
         line_items = []
@@ -1750,11 +1930,15 @@ def _create_order_from_stripe_session(session):
             continue
             
     logger.info(f"Order #{order.id} created successfully for customer {customer.user.username}.")
+    with transaction.atomic():
+        order.save(update_fields=update_order_eta(order))
+    publish_order_status(order, customer.user_id)
+    publish_order(order)
     
     # Send notifications
     try:
         # To customer
-        Notification.objects.create(
+        create_notification(
             user=customer.user,
             title="Order Received",
             message=f"Your order #{order.id} has been received and is now pending confirmation. Total: ${order.total_amount}",